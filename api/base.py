@@ -1,8 +1,15 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 
 class ModelResponse:
-    """Container for model responses."""
+    """
+    Container for model responses.
+    
+    `prompt_tokens` and `cached_tokens` are the prompt's share of
+    `tokens_used` and the part of it the provider served from its prompt
+    cache, when the provider reports them.
+    """
     
     def __init__(
         self,
@@ -10,13 +17,17 @@ class ModelResponse:
         model_name: str,
         tokens_used: int,
         latency: float,
-        raw_response: Optional[Dict[str, Any]] = None
+        raw_response: Optional[Dict[str, Any]] = None,
+        prompt_tokens: int = 0,
+        cached_tokens: int = 0
     ):
         self.text = text
         self.model_name = model_name
         self.tokens_used = tokens_used
         self.latency = latency
         self.raw_response = raw_response or {}
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens
 
 class BaseModelClient(ABC):
     """Abstract base class for model API clients."""
@@ -32,6 +43,7 @@ class BaseModelClient(ABC):
         max_tokens: int,
         temperature: float = 0.7,
         stop: Optional[List[str]] = None,
+        json_mode: bool = False,
         **kwargs
     ) -> ModelResponse:
         """
@@ -43,13 +55,52 @@ class BaseModelClient(ABC):
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
             stop: Optional stop sequences
+            json_mode: Ask the provider to return a JSON object, where the
+                provider and model support it
             **kwargs: Additional model-specific parameters
-            
+        
         Returns:
             ModelResponse object containing the generated text and metadata
         """
         pass
     
+    def supports_n(self, model: str) -> bool:
+        """Whether one request to the model can return several samples."""
+        return False
+    
+    async def generate_samples(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        n: int,
+        temperature: float = 0.7,
+        stop: Optional[List[str]] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> List[ModelResponse]:
+        """
+        Generate several independent samples for one prompt.
+        
+        The default makes `n` concurrent `generate` calls; clients whose
+        provider accepts an `n` parameter override this to make one request.
+        
+        Returns:
+            One ModelResponse per sample, each carrying its share of the tokens
+        """
+        return list(await asyncio.gather(*(
+            self.generate(
+                prompt=prompt,
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stop=stop,
+                json_mode=json_mode,
+                **kwargs
+            )
+            for _ in range(n)
+        )))
+    
     @abstractmethod
     async def get_token_count(self, text: str) -> int:
         """
@@ -57,7 +108,7 @@ class BaseModelClient(ABC):
         
         Args:
             text: Input text
-            
+        
         Returns:
             Number of tokens
         """
@@ -70,8 +121,30 @@ class BaseModelClient(ABC):
         
         Args:
             response: Raw response from the API
-            
+        
         Returns:
             True if response is valid, False otherwise
         """
-        pass 
\ No newline at end of file
+        pass
+    
+    def open_connections(self) -> Optional[int]:
+        """
+        Number of HTTP connections the client currently holds open.
+        
+        Returns:
+            Connection count, or None if the client can't report it
+        """
+        return None
+    
+    async def aclose(self) -> None:
+        """Close the client's connection pool."""
+        pass
+    
+    def batch_endpoint(self) -> Optional[Any]:
+        """
+        The provider's batch API, for offline runs.
+        
+        Returns:
+            A BatchEndpoint, or None if the provider has no batch API
+        """
+        return None
\ No newline at end of file
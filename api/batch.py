@@ -0,0 +1,480 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .base import ModelResponse
+from ..utils.metrics import metrics
+
+# Batch states after which nothing more will be processed
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+# Per-item HTTP statuses worth resubmitting in a later batch
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+@dataclass
+class BatchRequest:
+    """One model call in a batch."""
+    custom_id: str
+    model: str
+    prompt: str
+    max_tokens: int
+    temperature: float = 0.7
+    json_mode: bool = False
+    params: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class BatchStatus:
+    """Progress of a submitted batch."""
+    batch_id: str
+    status: str
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+class BatchItemError(RuntimeError):
+    """A batch item that produced no usable response."""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+    
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is None or self.status_code in RETRYABLE_STATUSES
+
+class BatchStillRunning(RuntimeError):
+    """
+    A batch outlived `max_wait` and could not be cancelled.
+    
+    Its items aren't resubmitted, or they would be paid for twice; the
+    batch stays in the state file, so rerunning resumes it.
+    """
+    pass
+
+class BatchEndpoint(ABC):
+    """
+    A provider's batch API.
+    
+    Requests are serialized into the provider's JSONL batch-file format,
+    submitted as one batch, and polled until the batch reaches a terminal
+    state; output lines are matched back to requests by `custom_id`. The
+    default line format is OpenAI's chat completions batch format.
+    """
+    
+    url = "/v1/chat/completions"
+    # Provider label for metrics
+    provider = ""
+    
+    def to_line(self, request: BatchRequest) -> Dict[str, Any]:
+        """Serialize a request into one line of a batch input file."""
+        body = {
+            "model": request.model,
+            "messages": [{"role": "user", "content": request.prompt}],
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            **request.params
+        }
+        if request.json_mode:
+            body.setdefault("response_format", {"type": "json_object"})
+        return {"custom_id": request.custom_id, "method": "POST", "url": self.url, "body": body}
+    
+    def from_line(self, line: Dict[str, Any], model: str, latency: float) -> ModelResponse:
+        """
+        Map one line of a batch output or error file to a response.
+        
+        Raises:
+            BatchItemError: If the line carries an error instead of a completion
+        """
+        if line.get("error"):
+            error = line["error"]
+            raise BatchItemError(error.get("message", str(error)) if isinstance(error, dict) else str(error))
+        
+        response = line.get("response") or {}
+        status_code = response.get("status_code")
+        body = response.get("body") or {}
+        if status_code != 200:
+            message = (body.get("error") or {}).get("message", f"status {status_code}")
+            raise BatchItemError(message, status_code)
+        try:
+            usage = body["usage"]
+            return ModelResponse(
+                text=body["choices"][0]["message"]["content"],
+                model_name=model,
+                tokens_used=usage["total_tokens"],
+                latency=latency,
+                raw_response=body,
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+            )
+        except (KeyError, IndexError, TypeError):
+            raise BatchItemError("malformed completion in batch output")
+    
+    @abstractmethod
+    async def submit(self, lines: List[Dict[str, Any]]) -> str:
+        """Upload a batch input file and start the batch; returns its ID."""
+        pass
+    
+    @abstractmethod
+    async def status(self, batch_id: str) -> BatchStatus:
+        """Current state of a batch."""
+        pass
+    
+    @abstractmethod
+    async def results(self, batch_id: str) -> List[Dict[str, Any]]:
+        """Every output and error line the batch has produced so far."""
+        pass
+    
+    @abstractmethod
+    async def cancel(self, batch_id: str) -> None:
+        """Ask the provider to stop a batch; it ends "cancelled" once stopped."""
+        pass
+
+def _parse_jsonl(text: str) -> List[Dict[str, Any]]:
+    lines = []
+    for line in text.splitlines():
+        if line.strip():
+            try:
+                lines.append(json.loads(line))
+            except ValueError:
+                print("Warning: Skipping unreadable batch output line")
+    return lines
+
+class OpenAIBatchEndpoint(BatchEndpoint):
+    """OpenAI's Batch API, driven through an AsyncOpenAI client."""
+    
+    provider = "openai"
+    
+    def __init__(self, client: Any, completion_window: str = "24h"):
+        """
+        Initialize the endpoint.
+        
+        Args:
+            client: AsyncOpenAI client
+            completion_window: Time the provider has to finish the batch
+        """
+        self.client = client
+        self.completion_window = completion_window
+    
+    async def submit(self, lines: List[Dict[str, Any]]) -> str:
+        content = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+        input_file = await self.client.files.create(file=("batch.jsonl", content), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=self.url,
+            completion_window=self.completion_window
+        )
+        return batch.id
+    
+    async def status(self, batch_id: str) -> BatchStatus:
+        batch = await self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return BatchStatus(
+            batch_id=batch.id,
+            status=batch.status,
+            total=counts.total if counts else 0,
+            completed=counts.completed if counts else 0,
+            failed=counts.failed if counts else 0
+        )
+    
+    async def results(self, batch_id: str) -> List[Dict[str, Any]]:
+        batch = await self.client.batches.retrieve(batch_id)
+        lines = []
+        # Expired and cancelled batches still have output for the items they finished
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                lines.extend(_parse_jsonl(content.text))
+        return lines
+    
+    async def cancel(self, batch_id: str) -> None:
+        await self.client.batches.cancel(batch_id)
+
+class LocalBatchEndpoint(BatchEndpoint):
+    """
+    Local stand-in for a provider batch API, for tests and dry runs.
+    
+    Input, output and error files are written to `directory` in the same
+    format the provider uses, and batch state is kept there too, so runs
+    can be interrupted and resumed like real ones. A batch is processed
+    on the first poll after `processing_delay` seconds by calling
+    `responder` with each request body; exceptions become per-item errors.
+    """
+    
+    provider = "local"
+    
+    def __init__(
+        self,
+        responder: Callable[[Dict[str, Any]], str],
+        directory: str,
+        processing_delay: float = 0.0,
+        expire_after: Optional[int] = None
+    ):
+        """
+        Initialize the endpoint.
+        
+        Args:
+            responder: Returns the completion text for a request body
+            directory: Directory for batch files and state
+            processing_delay: Seconds before a submitted batch is processed
+            expire_after: Process only this many items per batch, then mark
+                the batch expired (to exercise partial-result recovery)
+        """
+        self.responder = responder
+        self.directory = directory
+        self.processing_delay = processing_delay
+        self.expire_after = expire_after
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, batch_id: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}.{kind}")
+    
+    def _load(self, batch_id: str) -> Dict[str, Any]:
+        with open(self._path(batch_id, "state.json"), "r") as f:
+            return json.load(f)
+    
+    def _save(self, state: Dict[str, Any]) -> None:
+        with open(self._path(state["id"], "state.json"), "w") as f:
+            json.dump(state, f)
+    
+    async def submit(self, lines: List[Dict[str, Any]]) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex[:16]}"
+        with open(self._path(batch_id, "input.jsonl"), "w") as f:
+            f.write("\n".join(json.dumps(line) for line in lines) + "\n")
+        self._save({
+            "id": batch_id,
+            "status": "validating",
+            "submitted_at": time.time(),
+            "total": len(lines),
+            "completed": 0,
+            "failed": 0
+        })
+        return batch_id
+    
+    def _process(self, state: Dict[str, Any]) -> None:
+        with open(self._path(state["id"], "input.jsonl"), "r") as f:
+            lines = _parse_jsonl(f.read())
+        if self.expire_after is not None:
+            lines = lines[:self.expire_after]
+        
+        outputs, errors = [], []
+        for line in lines:
+            body = line["body"]
+            try:
+                text = self.responder(body)
+            except Exception as e:
+                errors.append({
+                    "id": f"req_{uuid.uuid4().hex[:12]}",
+                    "custom_id": line["custom_id"],
+                    "response": {"status_code": 500, "body": {"error": {"message": str(e)}}},
+                    "error": None
+                })
+                continue
+            prompt_tokens = sum(len(m["content"].split()) for m in body.get("messages", []))
+            completion_tokens = len(text.split())
+            outputs.append({
+                "id": f"req_{uuid.uuid4().hex[:12]}",
+                "custom_id": line["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": {
+                        "model": body.get("model"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens
+                        }
+                    }
+                },
+                "error": None
+            })
+        
+        for kind, records in (("output.jsonl", outputs), ("errors.jsonl", errors)):
+            if records:
+                with open(self._path(state["id"], kind), "w") as f:
+                    f.write("\n".join(json.dumps(record) for record in records) + "\n")
+        state.update(
+            status="expired" if len(lines) < state["total"] else "completed",
+            completed=len(outputs),
+            failed=len(errors)
+        )
+    
+    async def status(self, batch_id: str) -> BatchStatus:
+        state = self._load(batch_id)
+        if state["status"] not in TERMINAL_STATES:
+            if time.time() - state["submitted_at"] >= self.processing_delay:
+                self._process(state)
+            else:
+                state["status"] = "in_progress"
+            self._save(state)
+        return BatchStatus(
+            batch_id=batch_id,
+            status=state["status"],
+            total=state["total"],
+            completed=state["completed"],
+            failed=state["failed"]
+        )
+    
+    async def cancel(self, batch_id: str) -> None:
+        state = self._load(batch_id)
+        if state["status"] not in TERMINAL_STATES:
+            state["status"] = "cancelled"
+            self._save(state)
+    
+    async def results(self, batch_id: str) -> List[Dict[str, Any]]:
+        lines = []
+        for kind in ("output.jsonl", "errors.jsonl"):
+            path = self._path(batch_id, kind)
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    lines.extend(_parse_jsonl(f.read()))
+        return lines
+
+class BatchExecutor:
+    """
+    Runs a set of requests through a batch endpoint.
+    
+    Submitted batch IDs are recorded in a state file before polling starts,
+    so a run that is interrupted resumes polling its batches instead of
+    paying for them again. The state file is keyed by the models and
+    custom IDs, so callers resuming a run must send the same items (the
+    pipeline persists its example set for this). Items that a batch didn't
+    finish (it expired, was cancelled, or outlived `max_wait` and was
+    cancelled) or that failed with a retryable status are resubmitted in a
+    new batch, up to `max_resubmits` times; everything else is returned as
+    soon as it is known. A batch that outlives `max_wait` but can't be
+    cancelled raises `BatchStillRunning` instead of being resubmitted.
+    """
+    
+    def __init__(
+        self,
+        endpoint: BatchEndpoint,
+        state_dir: str,
+        poll_interval: float = 30.0,
+        max_wait: Optional[float] = None,
+        max_resubmits: int = 1
+    ):
+        """
+        Initialize the executor.
+        
+        Args:
+            endpoint: Batch API to submit to
+            state_dir: Directory for the state files of submitted batches
+            poll_interval: Seconds between status checks
+            max_wait: Seconds to wait for one batch before cancelling it
+            max_resubmits: Times unfinished or retryable items are resubmitted
+        """
+        self.endpoint = endpoint
+        self.state_dir = state_dir
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.max_resubmits = max_resubmits
+        os.makedirs(state_dir, exist_ok=True)
+    
+    def _state_path(self, name: str, requests: List[BatchRequest]) -> str:
+        # Keyed by what is being asked of whom, so a rerun over the same items
+        # resumes these batches even if it renders prompts differently
+        digest = hashlib.sha1(
+            json.dumps(sorted((r.model, r.custom_id) for r in requests)).encode("utf-8")
+        ).hexdigest()[:12]
+        return os.path.join(self.state_dir, f"{name}_{digest}.json")
+    
+    async def run(
+        self,
+        requests: List[BatchRequest],
+        name: str = "batch"
+    ) -> Dict[str, Union[ModelResponse, Exception]]:
+        """
+        Run requests through the batch endpoint.
+        
+        Args:
+            requests: Requests with unique custom IDs
+            name: Label for the run's state file
+        
+        Returns:
+            Mapping of custom ID to its response, or to the exception
+            explaining why it has none
+        
+        Raises:
+            BatchStillRunning: If a batch past `max_wait` can't be cancelled
+        """
+        by_id = {request.custom_id: request for request in requests}
+        state_path = self._state_path(name, requests)
+        state: Dict[str, Any] = {"batches": []}
+        if os.path.exists(state_path):
+            with open(state_path, "r") as f:
+                state = json.load(f)
+            print(f"Resuming {len(state['batches'])} submitted batches for {name}")
+        
+        results: Dict[str, Union[ModelResponse, Exception]] = {}
+        pending = dict(by_id)
+        
+        for batch in state["batches"]:
+            await self._collect(batch, by_id, pending, results)
+        
+        while pending and len(state["batches"]) <= self.max_resubmits:
+            if state["batches"]:
+                metrics.record_retry(self.endpoint.provider, "batch_resubmit")
+            batch_id = await self.endpoint.submit([self.endpoint.to_line(r) for r in pending.values()])
+            batch = {"id": batch_id, "submitted_at": time.time()}
+            state["batches"].append(batch)
+            with open(state_path, "w") as f:
+                json.dump(state, f)
+            print(f"Submitted batch {batch_id} with {len(pending)} requests for {name}")
+            await self._collect(batch, by_id, pending, results)
+        
+        for custom_id in pending:
+            results.setdefault(custom_id, BatchItemError("no result from any batch"))
+        return results
+    
+    async def _collect(
+        self,
+        batch: Dict[str, Any],
+        by_id: Dict[str, BatchRequest],
+        pending: Dict[str, BatchRequest],
+        results: Dict[str, Union[ModelResponse, Exception]]
+    ) -> None:
+        """Wait for a batch to finish and move its finished items out of `pending`."""
+        status = await self.endpoint.status(batch["id"])
+        cancelled = False
+        while not status.done:
+            if not cancelled and self.max_wait is not None and time.time() - batch["submitted_at"] > self.max_wait:
+                # Cancel before anything is resubmitted, or both batches would be billed;
+                # items finished before the cancellation still come back
+                print(f"Warning: Cancelling batch {batch['id']} after waiting {self.max_wait:.0f}s ({status.status})")
+                try:
+                    await self.endpoint.cancel(batch["id"])
+                    cancelled = True
+                except Exception as e:
+                    raise BatchStillRunning(
+                        f"Could not cancel batch {batch['id']} ({status.status}), "
+                        f"not resubmitting its items: {str(e)}"
+                    ) from e
+            await asyncio.sleep(self.poll_interval)
+            status = await self.endpoint.status(batch["id"])
+        
+        latency = time.time() - batch["submitted_at"]
+        for line in await self.endpoint.results(batch["id"]):
+            request = by_id.get(line.get("custom_id"))
+            if request is None or request.custom_id not in pending:
+                continue
+            try:
+                results[request.custom_id] = self.endpoint.from_line(line, request.model, latency)
+                del pending[request.custom_id]
+            except BatchItemError as e:
+                results[request.custom_id] = e
+                if not e.retryable:
+                    del pending[request.custom_id]
+        
+        if status.status != "completed":
+            print(f"Batch {batch['id']} ended {status.status} with {len(pending)} items unfinished")
\ No newline at end of file
@@ -8,9 +8,29 @@ from ..utils.config import config
 class DeepSeekClient(BaseModelClient):
     """Client for interacting with DeepSeek's API."""
     
-    def __init__(self):
+    def __init__(self, max_connections: Optional[int] = None):
+        """
+        Initialize the client.
+        
+        Args:
+            max_connections: Size of the HTTP connection pool (default: 32)
+        """
         super().__init__(config.get("models.deepseek.api_key"))
         self.api_base = "https://api.deepseek.com/v1"  # Example API base URL
+        self.max_connections = max_connections or 32
+        # Created on first use, inside the event loop that makes the calls
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                }
+            )
+        return self._session
     
     async def generate(
         self,
@@ -19,17 +39,18 @@ class DeepSeekClient(BaseModelClient):
         max_tokens: int,
         temperature: float = 0.7,
         stop: Optional[List[str]] = None,
+        json_mode: bool = False,
         **kwargs
     ) -> ModelResponse:
-        """Generate a response using DeepSeek's API."""
+        """
+        Generate a response using DeepSeek's API.
+        
+        The completions endpoint has no JSON mode, so `json_mode` is ignored
+        and callers rely on tolerant parsing instead.
+        """
         try:
             start_time = time.time()
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             payload = {
                 "model": model,
                 "prompt": prompt,
@@ -39,14 +60,12 @@ class DeepSeekClient(BaseModelClient):
                 **kwargs
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_base}/completions",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    response_json = await response.json()
-                    
+            async with self._get_session().post(
+                f"{self.api_base}/completions",
+                json=payload
+            ) as response:
+                response_json = await response.json()
+            
             end_time = time.time()
             
             if not self.validate_response(response_json):
@@ -57,9 +76,12 @@ class DeepSeekClient(BaseModelClient):
                 model_name=model,
                 tokens_used=response_json["usage"]["total_tokens"],
                 latency=end_time - start_time,
-                raw_response=response_json
+                raw_response=response_json,
+                prompt_tokens=response_json["usage"].get("prompt_tokens", 0),
+                # DeepSeek's context cache reports hits as prompt_cache_hit_tokens
+                cached_tokens=response_json["usage"].get("prompt_cache_hit_tokens", 0)
             )
-            
+        
         except Exception as e:
             print(f"Error generating response from DeepSeek: {str(e)}")
             raise
@@ -73,6 +95,22 @@ class DeepSeekClient(BaseModelClient):
         # For now, using a simple approximation
         return len(text.split())
     
+    def open_connections(self) -> Optional[int]:
+        """Idle plus in-use connections (relies on aiohttp's connector internals)."""
+        if self._session is None or self._session.closed:
+            return 0
+        connector = self._session.connector
+        idle = getattr(connector, "_conns", None)
+        acquired = getattr(connector, "_acquired", None)
+        if idle is None or acquired is None:
+            return None
+        return len(acquired) + sum(len(conns) for conns in idle.values())
+    
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
     def validate_response(self, response: Any) -> bool:
         """Validate the DeepSeek API response."""
         try:
@@ -0,0 +1,348 @@
+import asyncio
+import json
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Type
+
+from .base import BaseModelClient, ModelResponse
+from .deepseek_client import DeepSeekClient
+from .openai_client import OpenAIClient
+from ..utils.config import config
+from ..utils.rate_limit import AsyncRateLimiter
+from ..utils.single_flight import SingleFlight
+from ..utils.tracing import tracer
+
+# Client class for each provider the manager can serve
+PROVIDERS: Dict[str, Type[BaseModelClient]] = {
+    "openai": OpenAIClient,
+    "deepseek": DeepSeekClient
+}
+
+@dataclass
+class ProviderStats:
+    """Counters for the calls made to one provider."""
+    requests: int = 0
+    errors: int = 0
+    tokens: int = 0
+    # Prompt tokens sent, and how many of them the provider served from its prompt cache
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    latency: float = 0.0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    # Calls waiting for a slot or the rate limiter
+    queued: int = 0
+    # Calls answered by joining an identical call already in flight
+    deduplicated: int = 0
+
+def _ratio(part: int, whole: int) -> float:
+    return part / whole if whole else 0.0
+
+class ManagedClient(BaseModelClient):
+    """
+    A provider client whose calls go through its ClientManager.
+    
+    Every call waits for the manager's in-flight limit and the provider's
+    rate limiter, and is counted in the manager's stats. Anything else
+    (supports_json_mode, the tokenizer, ...) comes from the wrapped client.
+    """
+    
+    def __init__(self, provider: str, client: BaseModelClient, manager: "ClientManager"):
+        super().__init__(client.api_key)
+        self.provider = provider
+        self.client = client
+        self.manager = manager
+    
+    async def generate(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float = 0.7,
+        stop: Optional[List[str]] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> ModelResponse:
+        return await self.manager.call(
+            self.provider,
+            self.client.generate,
+            prompt=prompt,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stop=stop,
+            json_mode=json_mode,
+            **kwargs
+        )
+    
+    def supports_n(self, model: str) -> bool:
+        return self.client.supports_n(model)
+    
+    async def generate_samples(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        n: int,
+        temperature: float = 0.7,
+        stop: Optional[List[str]] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> List[ModelResponse]:
+        if n > 1 and self.client.supports_n(model):
+            return await self.manager.call(
+                self.provider,
+                self.client.generate_samples,
+                prompt=prompt,
+                model=model,
+                max_tokens=max_tokens,
+                n=n,
+                temperature=temperature,
+                stop=stop,
+                json_mode=json_mode,
+                **kwargs
+            )
+        # Fanned-out samples each go through generate, so each is limited and counted
+        return await super().generate_samples(
+            prompt, model, max_tokens, n, temperature, stop, json_mode, **kwargs
+        )
+    
+    async def get_token_count(self, text: str) -> int:
+        return await self.client.get_token_count(text)
+    
+    def validate_response(self, response: Any) -> bool:
+        return self.client.validate_response(response)
+    
+    def open_connections(self) -> Optional[int]:
+        return self.client.open_connections()
+    
+    async def aclose(self) -> None:
+        await self.client.aclose()
+    
+    def batch_endpoint(self) -> Optional[Any]:
+        return self.client.batch_endpoint()
+    
+    def __getattr__(self, name: str) -> Any:
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+class ClientManager(Mapping):
+    """
+    One pooled client per provider, shared by everything in the process.
+    
+    The pipeline, tasks (model and judge calls) and synthetic data
+    generators all receive the same manager, so they share HTTP connection
+    pools, the tokenizer, a global in-flight limit and one rate limiter per
+    provider, and their calls add up in one set of stats. Identical
+    deterministic calls (temperature 0 or an explicit seed) that overlap
+    in time are sent once and the response is shared. Clients are
+    created on first use; the manager behaves as a read-only mapping from
+    provider name to client, so it can be injected wherever a dict of
+    clients is expected.
+    """
+    
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        requests_per_minute: Optional[Dict[str, float]] = None,
+        max_connections: Optional[Dict[str, int]] = None,
+        single_flight: Optional[bool] = None
+    ):
+        """
+        Initialize the manager. Settings not given are read from the config.
+        
+        Args:
+            max_in_flight: Maximum concurrent model calls across all providers
+            requests_per_minute: Sustained request rate per provider
+            max_connections: HTTP connection pool size per provider
+            single_flight: Whether to coalesce identical deterministic calls
+        """
+        self.max_in_flight = max_in_flight or config.get("clients.max_in_flight", 16)
+        if single_flight is None:
+            single_flight = config.get("clients.single_flight", True)
+        self._flights = SingleFlight() if single_flight else None
+        self._requests_per_minute = requests_per_minute or {}
+        self._max_connections = max_connections or {}
+        self._clients: Dict[str, ManagedClient] = {}
+        self._limiters: Dict[str, AsyncRateLimiter] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.provider_stats: Dict[str, ProviderStats] = {}
+    
+    def _setting(self, overrides: Dict[str, Any], provider: str, key: str, default: Any) -> Any:
+        """A per-provider limit: explicit override, then models.<provider>, then clients.*"""
+        if provider in overrides:
+            return overrides[provider]
+        return config.get(f"models.{provider}.{key}") or config.get(f"clients.{key}", default)
+    
+    def __getitem__(self, provider: str) -> ManagedClient:
+        if provider not in self._clients:
+            if provider not in PROVIDERS:
+                raise KeyError(f"Unknown provider: {provider}")
+            client = PROVIDERS[provider](
+                max_connections=self._setting(self._max_connections, provider, "max_connections", 32)
+            )
+            self._limiters[provider] = AsyncRateLimiter(
+                self._setting(self._requests_per_minute, provider, "requests_per_minute", 500)
+            )
+            self.provider_stats.setdefault(provider, ProviderStats())
+            self._clients[provider] = ManagedClient(provider, client, self)
+        return self._clients[provider]
+    
+    def __contains__(self, provider: object) -> bool:
+        return provider in PROVIDERS
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(PROVIDERS)
+    
+    def __len__(self) -> int:
+        return len(PROVIDERS)
+    
+    @staticmethod
+    def _flight_key(provider: str, kwargs: Dict[str, Any]) -> Optional[Hashable]:
+        """Identity of a deterministic request; None if repeats may differ."""
+        if kwargs.get("temperature") != 0 and kwargs.get("seed") is None:
+            return None
+        return provider, json.dumps(kwargs, sort_keys=True, default=str)
+    
+    async def call(
+        self,
+        provider: str,
+        fn: Callable[..., Awaitable[Any]],
+        **kwargs: Any
+    ) -> Any:
+        """
+        Make a model call within the shared limits and record it.
+        
+        Args:
+            provider: Provider the call goes to
+            fn: Coroutine function making the call
+            **kwargs: Request parameters for `fn`
+        
+        Returns:
+            The model response (a list for multi-sample calls), possibly
+            shared with identical concurrent calls
+        """
+        key = self._flight_key(provider, kwargs) if self._flights is not None else None
+        if key is None:
+            return await self._call(provider, fn, kwargs)
+        
+        response, shared = await self._flights.do(key, lambda: self._call(provider, fn, kwargs))
+        if shared:
+            self.provider_stats[provider].deduplicated += 1
+        return response
+    
+    async def _call(
+        self,
+        provider: str,
+        fn: Callable[..., Awaitable[Any]],
+        kwargs: Dict[str, Any]
+    ) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        stats = self.provider_stats.setdefault(provider, ProviderStats())
+        
+        # Time spent waiting for a slot and the rate limiter is traced apart from the call
+        with tracer.span("queue", provider=provider):
+            stats.queued += 1
+            try:
+                await self._slots.acquire()
+                try:
+                    await self._limiters[provider].acquire()
+                except BaseException:
+                    self._slots.release()
+                    raise
+            finally:
+                stats.queued -= 1
+        
+        stage = "judge_call" if tracer.within("grade") else "model_call"
+        try:
+            with tracer.span(stage, provider=provider, model=kwargs.get("model")) as span:
+                stats.requests += 1
+                stats.in_flight += 1
+                stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+                try:
+                    response = await fn(**kwargs)
+                except Exception:
+                    stats.errors += 1
+                    raise
+                finally:
+                    stats.in_flight -= 1
+                
+                # Multi-sample requests return one response per sample
+                responses = response if isinstance(response, list) else [response]
+                tokens = sum(r.tokens_used for r in responses)
+                prompt_tokens = sum(r.prompt_tokens for r in responses)
+                cached_tokens = sum(r.cached_tokens for r in responses)
+                span.set(tokens=tokens, prompt_tokens=prompt_tokens, cached_tokens=cached_tokens)
+        finally:
+            self._slots.release()
+        
+        stats.tokens += tokens
+        stats.prompt_tokens += prompt_tokens
+        stats.cached_tokens += cached_tokens
+        stats.latency += max((r.latency for r in responses), default=0.0)
+        return response
+    
+    @property
+    def in_flight(self) -> int:
+        """Model calls currently being made, across all providers."""
+        return sum(stats.in_flight for stats in self.provider_stats.values())
+    
+    def open_connections(self) -> int:
+        """HTTP connections currently open across all providers' pools."""
+        return sum(client.open_connections() or 0 for client in self._clients.values())
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the shared metrics.
+        
+        Returns:
+            Totals for in-flight calls, open connections, deduplicated calls
+            and prompt-cache use, plus each provider's counters
+        """
+        providers = {}
+        for provider, stats in self.provider_stats.items():
+            client = self._clients.get(provider)
+            providers[provider] = {
+                **asdict(stats),
+                "cache_hit_ratio": _ratio(stats.cached_tokens, stats.prompt_tokens),
+                "open_connections": client.open_connections() if client else 0
+            }
+        prompt_tokens = sum(stats.prompt_tokens for stats in self.provider_stats.values())
+        cached_tokens = sum(stats.cached_tokens for stats in self.provider_stats.values())
+        return {
+            "in_flight": self.in_flight,
+            "open_connections": self.open_connections(),
+            "deduplicated": sum(stats.deduplicated for stats in self.provider_stats.values()),
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "cache_hit_ratio": _ratio(cached_tokens, prompt_tokens),
+            "providers": providers
+        }
+    
+    async def aclose(self) -> None:
+        """
+        Close every provider's connection pool.
+        
+        Clients are recreated on next use, so the manager can be reused
+        from a later event loop.
+        """
+        clients = list(self._clients.values())
+        self._clients.clear()
+        self._limiters.clear()
+        self._slots = None
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"Warning: Could not close {client.provider} client: {str(e)}")
+
+_manager: Optional[ClientManager] = None
+
+def get_client_manager() -> ClientManager:
+    """The process-wide client manager, used wherever none is injected."""
+    global _manager
+    if _manager is None:
+        _manager = ClientManager()
+    return _manager
\ No newline at end of file
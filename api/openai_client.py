@@ -1,19 +1,70 @@
 import time
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
 
+import httpx
 from openai import AsyncOpenAI
 import tiktoken
 
 from .base import BaseModelClient, ModelResponse
+from .batch import OpenAIBatchEndpoint
 from ..utils.config import config
+from ..utils.metrics import metrics
+
+# Model prefixes that accept response_format={"type": "json_object"}
+DEFAULT_JSON_MODE_MODELS = [
+    "gpt-4o", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-4.1",
+    "gpt-3.5-turbo-1106", "gpt-3.5-turbo-0125", "o1", "o3", "o4"
+]
+
+@lru_cache(maxsize=None)
+def _encoding(name: str = "cl100k_base") -> Any:
+    """Tokenizer shared by every client in the process."""
+    return tiktoken.get_encoding(name)
+
+async def _count_retry(request: httpx.Request) -> None:
+    """The SDK retries failed requests itself and numbers each attempt in a header."""
+    if request.headers.get("x-stainless-retry-count", "0") != "0":
+        metrics.record_retry("openai", "http")
+
+def _cached_tokens(usage: Any) -> int:
+    """Prompt tokens served from OpenAI's prompt cache (0 when not reported)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
 
 class OpenAIClient(BaseModelClient):
     """Client for interacting with OpenAI's API."""
     
-    def __init__(self):
+    def __init__(self, max_connections: Optional[int] = None):
+        """
+        Initialize the client.
+        
+        Args:
+            max_connections: Size of the HTTP connection pool (default: 32)
+        """
         super().__init__(config.get("models.openai.api_key"))
-        self.client = AsyncOpenAI(api_key=self.api_key)
-        self.encoding = tiktoken.get_encoding("cl100k_base")
+        max_connections = max_connections or 32
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=httpx.Timeout(600.0, connect=5.0),
+            event_hooks={"request": [_count_retry]}
+        )
+        self.client = AsyncOpenAI(api_key=self.api_key, http_client=self._http_client)
+        self.encoding = _encoding()
+        self.json_mode_models = config.get("models.openai.json_mode_models", DEFAULT_JSON_MODE_MODELS)
+        # Models that reject n > 1; samples for these are fanned out instead
+        self.single_choice_models = config.get("models.openai.single_choice_models", [])
+    
+    def supports_json_mode(self, model: str) -> bool:
+        """Whether a model accepts OpenAI's JSON response format."""
+        return any(model.startswith(prefix) for prefix in self.json_mode_models)
+    
+    def supports_n(self, model: str) -> bool:
+        """Whether a model returns several choices per request."""
+        return not any(model.startswith(prefix) for prefix in self.single_choice_models)
     
     async def generate(
         self,
@@ -22,9 +73,14 @@ class OpenAIClient(BaseModelClient):
         max_tokens: int,
         temperature: float = 0.7,
         stop: Optional[List[str]] = None,
+        json_mode: bool = False,
         **kwargs
     ) -> ModelResponse:
         """Generate a response using OpenAI's API."""
+        # Models without JSON mode reject response_format, so only send it when supported
+        if json_mode and self.supports_json_mode(model):
+            kwargs.setdefault("response_format", {"type": "json_object"})
+        
         try:
             start_time = time.time()
             
@@ -47,18 +103,92 @@ class OpenAIClient(BaseModelClient):
                 model_name=model,
                 tokens_used=response.usage.total_tokens,
                 latency=end_time - start_time,
-                raw_response=response.model_dump()
+                raw_response=response.model_dump(),
+                prompt_tokens=response.usage.prompt_tokens,
+                cached_tokens=_cached_tokens(response.usage)
             )
-            
+        
         except Exception as e:
             # Log the error and re-raise
             print(f"Error generating response from OpenAI: {str(e)}")
             raise
     
+    async def generate_samples(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        n: int,
+        temperature: float = 0.7,
+        stop: Optional[List[str]] = None,
+        json_mode: bool = False,
+        **kwargs
+    ) -> List[ModelResponse]:
+        """Generate `n` samples in a single request using the `n` parameter."""
+        if n == 1 or not self.supports_n(model):
+            return await super().generate_samples(
+                prompt, model, max_tokens, n, temperature, stop, json_mode, **kwargs
+            )
+        if json_mode and self.supports_json_mode(model):
+            kwargs.setdefault("response_format", {"type": "json_object"})
+        
+        try:
+            start_time = time.time()
+            
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stop=stop,
+                n=n,
+                **kwargs
+            )
+            
+            latency = time.time() - start_time
+            
+            if not self.validate_response(response):
+                raise ValueError("Invalid response from OpenAI API")
+            
+            # Usage covers the prompt once plus every choice; split it evenly
+            raw_response = response.model_dump()
+            samples = len(response.choices)
+            share, remainder = divmod(response.usage.total_tokens, samples)
+            prompt_share, prompt_remainder = divmod(response.usage.prompt_tokens, samples)
+            cached_share, cached_remainder = divmod(_cached_tokens(response.usage), samples)
+            return [
+                ModelResponse(
+                    text=choice.message.content,
+                    model_name=model,
+                    tokens_used=share + (1 if i < remainder else 0),
+                    latency=latency,
+                    raw_response=raw_response,
+                    prompt_tokens=prompt_share + (1 if i < prompt_remainder else 0),
+                    cached_tokens=cached_share + (1 if i < cached_remainder else 0)
+                )
+                for i, choice in enumerate(response.choices)
+            ]
+        
+        except Exception as e:
+            print(f"Error generating samples from OpenAI: {str(e)}")
+            raise
+    
     async def get_token_count(self, text: str) -> int:
         """Get the number of tokens in the text using tiktoken."""
         return len(self.encoding.encode(text))
     
+    def open_connections(self) -> Optional[int]:
+        """Connections in the httpx pool (relies on httpcore's pool internals)."""
+        pool = getattr(getattr(self._http_client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return None if connections is None else len(connections)
+    
+    async def aclose(self) -> None:
+        await self.client.close()
+    
+    def batch_endpoint(self) -> OpenAIBatchEndpoint:
+        return OpenAIBatchEndpoint(self.client)
+    
     def validate_response(self, response: Any) -> bool:
         """Validate the OpenAI API response."""
         try:
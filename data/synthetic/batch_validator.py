@@ -0,0 +1,109 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+Verdict = Tuple[bool, float, str]
+BatchFunction = Callable[[List[Dict[str, Any]]], Awaitable[List[Optional[Verdict]]]]
+
+class BatchValidator:
+    """
+    Micro-batcher that validates concurrent candidates in shared requests.
+    
+    Callers await `validate` for a single example; pending examples are
+    flushed to `validate_batch` once `batch_size` are waiting or `max_wait`
+    seconds after the first one arrived. Items the batch response has no
+    usable verdict for are re-queued on their own, so a malformed reply only
+    costs a retry of the affected candidates rather than the whole batch.
+    """
+    
+    def __init__(
+        self,
+        validate_batch: BatchFunction,
+        batch_size: int = 8,
+        max_wait: float = 0.5,
+        max_retries: int = 2
+    ):
+        """
+        Initialize the batcher.
+        
+        Args:
+            validate_batch: Coroutine mapping a list of examples to one verdict
+                per example, or None where no verdict could be read
+            batch_size: Maximum number of examples per request
+            max_wait: Seconds to wait for a batch to fill before flushing
+            max_retries: Times an example without a verdict is re-queued
+        """
+        self.validate_batch = validate_batch
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.stats = {"requests": 0, "validated": 0, "retried": 0, "unresolved": 0}
+        
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future, int]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+    
+    async def validate(self, example: Dict[str, Any]) -> Verdict:
+        """
+        Validate an example as part of the next batch.
+        
+        Args:
+            example: The example to validate
+        
+        Returns:
+            Tuple of (is_valid, quality_score, feedback)
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(example, future, 0)
+        return await future
+    
+    def _enqueue(self, example: Dict[str, Any], future: asyncio.Future, attempts: int) -> None:
+        self._pending.append((example, future, attempts))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+    
+    def _flush(self) -> None:
+        """Send every full batch, plus any partial batch that has waited long enough."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        # Callers that were cancelled while queued don't need a verdict
+        self._pending = [item for item in self._pending if not item[1].done()]
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            if len(self._pending) < self.batch_size:
+                break
+        
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+    
+    async def _run(self, batch: List[Tuple[Dict[str, Any], asyncio.Future, int]]) -> None:
+        self.stats["requests"] += 1
+        try:
+            verdicts = await self.validate_batch([example for example, _, _ in batch])
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            print(f"Error validating batch of {len(batch)}: {str(e)}")
+            verdicts = []
+        verdicts = list(verdicts)[:len(batch)] + [None] * (len(batch) - len(verdicts))
+        
+        for (example, future, attempts), verdict in zip(batch, verdicts):
+            if future.done():
+                continue
+            if verdict is not None:
+                self.stats["validated"] += 1
+                future.set_result(verdict)
+            elif attempts < self.max_retries:
+                self.stats["retried"] += 1
+                self._enqueue(example, future, attempts + 1)
+            else:
+                self.stats["unresolved"] += 1
+                future.set_result((False, 0.0, "No validation verdict returned for example"))
\ No newline at end of file
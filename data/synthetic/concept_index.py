@@ -0,0 +1,123 @@
+import hashlib
+import os
+import pickle
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+Pair = Tuple[str, str]
+
+class ConceptIndex:
+    """
+    TF-IDF index over generated problems for choosing concept-connection pairs.
+    
+    Pairs are selected with max-marginal-relevance: each pick balances how
+    much common ground two cross-category problems share against how
+    similar the pair is to the pairs already chosen, so connection prompts
+    cover diverse combinations instead of repeating the same one.
+    """
+    
+    def __init__(
+        self,
+        examples: List[Dict[str, Any]],
+        cache_dir: Optional[str] = None
+    ):
+        """
+        Build (or load from cache) the index.
+        
+        Args:
+            examples: Examples with "id", "problem" and a category, either as
+                a "category" field or in metadata
+            cache_dir: Optional directory for caching the fitted index
+        """
+        self.examples = [example for example in examples if example.get("problem")]
+        self.ids = [str(example.get("id")) for example in self.examples]
+        self.categories = [self._category(example) for example in self.examples]
+        
+        corpus_key = hashlib.sha256(
+            "\x1e".join(f"{i}\x1f{e['problem']}" for i, e in zip(self.ids, self.examples)).encode("utf-8")
+        ).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, f"concept_index_{corpus_key}.pkl") if cache_dir else None
+        
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                self.similarity = pickle.load(f)
+        else:
+            self.similarity = self._fit()
+            if cache_path:
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(cache_path, "wb") as f:
+                    pickle.dump(self.similarity, f)
+    
+    @staticmethod
+    def _category(example: Dict[str, Any]) -> Optional[str]:
+        metadata = example.get("metadata") or {}
+        return example.get("category") or metadata.get("category") or metadata.get("template_id")
+    
+    def _fit(self) -> np.ndarray:
+        """Compute the cosine similarity matrix of the problems."""
+        if not self.examples:
+            return np.zeros((0, 0))
+        vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True)
+        matrix = vectorizer.fit_transform([example["problem"] for example in self.examples])
+        # Rows are L2-normalized, so the dot product is the cosine similarity
+        return (matrix @ matrix.T).toarray()
+    
+    def select_pairs(
+        self,
+        num_pairs: int,
+        diversity: float = 0.5,
+        exclude: Optional[Set[Pair]] = None
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Select diverse, complementary cross-category example pairs.
+        
+        Args:
+            num_pairs: Number of pairs to select
+            diversity: Weight in [0, 1] of novelty versus shared common ground
+            exclude: Pairs of example IDs that must not be selected again
+        
+        Returns:
+            List of (example, example) pairs
+        """
+        exclude = {tuple(sorted(pair)) for pair in (exclude or set())}
+        n = len(self.examples)
+        first, second = np.triu_indices(n, k=1)
+        
+        # Prefer pairs from different categories when there are any
+        categories = np.array(self.categories, dtype=object)
+        cross = categories[first] != categories[second]
+        if cross.any():
+            first, second = first[cross], second[cross]
+        
+        keep = np.array([
+            tuple(sorted((self.ids[i], self.ids[j]))) not in exclude
+            for i, j in zip(first, second)
+        ], dtype=bool)
+        first, second = first[keep], second[keep]
+        if len(first) == 0:
+            return []
+        
+        S = self.similarity
+        relevance = S[first, second]
+        # Norm of the sum of two unit vectors, used for pair-to-pair cosine
+        norms = np.sqrt(np.maximum(2 + 2 * relevance, 1e-12))
+        redundancy = np.zeros(len(first))
+        available = np.ones(len(first), dtype=bool)
+        
+        selected = []
+        for _ in range(min(num_pairs, len(first))):
+            scores = (1 - diversity) * relevance - diversity * redundancy
+            scores[~available] = -np.inf
+            best = int(np.argmax(scores))
+            available[best] = False
+            selected.append(best)
+            
+            a, b = first[best], second[best]
+            pair_similarity = (
+                S[first, a] + S[first, b] + S[second, a] + S[second, b]
+            ) / (norms * norms[best])
+            redundancy = np.maximum(redundancy, pair_similarity)
+        
+        return [(self.examples[first[k]], self.examples[second[k]]) for k in selected]
\ No newline at end of file
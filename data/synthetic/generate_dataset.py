@@ -5,92 +5,204 @@ import os
 from typing import Dict, List
 
 from ...utils.config import config
+from ...utils.parsing import parse_stats
+from ...utils.profiling import profiler
+from ...utils.templates import Template, get_registry
+from .concept_index import ConceptIndex
 from .stem_generator import STEMDataGenerator
 
-async def load_templates(category: str) -> List[Dict]:
-    """Load templates for a category."""
-    template_path = os.path.join(
-        config.get("synthetic_data.templates_dir"),
+async def load_templates(category: str) -> List[Template]:
+    """Look up a category's templates in the shared registry."""
+    templates = get_registry(config.get("synthetic_data.templates_dir", "data/templates")).templates(
         "stem",
-        f"{category}.json"
+        category
     )
-    
-    try:
-        with open(template_path, "r") as f:
-            data = json.load(f)
-            return data.get("templates", [])
-    except FileNotFoundError:
+    if not templates:
         print(f"No templates found for category: {category}")
-        return []
+    return templates
+
+def load_jsonl(path: str) -> List[Dict]:
+    """Load records from a JSONL checkpoint, ignoring a truncated last line."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"Warning: Skipping unreadable line in {path}")
+    return records
+
+def append_jsonl(path: str, records: List[Dict]) -> None:
+    """Append records to a JSONL checkpoint."""
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
 
 async def generate_stem_dataset(
     categories: List[str],
     num_base_examples: int,
     num_variations: int,
     num_connections: int,
-    output_dir: str
+    output_dir: str,
+    profile: bool = False
 ) -> None:
     """
     Generate a comprehensive STEM dataset.
     
+    Generation runs as a graph of concurrent jobs sharing the generator's
+    concurrency and rate budget: every category's base examples are
+    generated at once, each base example's variations start as soon as it
+    is accepted, and cross-category connections start once all bases exist.
+    
+    Every accepted item is checkpointed to JSONL in `output_dir`, so an
+    interrupted run picks up where it stopped when rerun with the same
+    arguments. Every candidate, accepted or rejected, is also recorded in
+    an append-only generation log; reruns use it to balance templates,
+    to show the model earlier rejections, and to skip concept pairs that
+    already failed.
+    
     Args:
         categories: List of STEM categories
         num_base_examples: Number of base examples per category
         num_variations: Number of variations per example
         num_connections: Number of concept connections to generate
         output_dir: Directory to save generated data
+        profile: Whether to profile CPU, event loop and memory use
+            (written to the profile directory inside `output_dir`)
     """
     # Initialize generator
     generator = STEMDataGenerator("stem", config.config)
     
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
+    if profile:
+        profiler.start(output_dir)
     
-    all_examples = []
+    log_config = config.get("synthetic_data.generation_log", {}) or {}
+    generation_log = generator.attach_log(
+        os.path.join(output_dir, log_config.get("filename", "generation_log.jsonl"))
+    )
     
-    # Generate base examples for each category
-    for category in categories:
-        print(f"\nGenerating examples for {category}...")
-        
+    async def generate_variations(category: str, example: Dict, done: int) -> List[Dict]:
+        """Generate the variations an example is still missing."""
+        if done >= num_variations:
+            return []
+        variations = await generator.generate_variations_with_difficulty(
+            example=example,
+            num_variations=num_variations - done,
+            target_difficulties=["easy", "medium", "hard"],
+            start_index=done
+        )
+        append_jsonl(os.path.join(output_dir, f"{category}_variations.jsonl"), variations)
+        return variations
+    
+    async def generate_category(category: str) -> List[Dict]:
+        """Generate a category's base examples and their variations."""
         # Load templates
         templates = await load_templates(category)
         if not templates:
-            continue
-        
-        # Generate base examples
-        examples = await generator.generate_dataset(
-            num_examples=num_base_examples,
-            templates=templates,
-            output_path=os.path.join(output_dir, f"{category}_base.json")
-        )
+            return []
         
-        print(f"Generated {len(examples)} base examples")
-        all_examples.extend(examples)
+        base_path = os.path.join(output_dir, f"{category}_base.json")
+        variations_path = os.path.join(output_dir, f"{category}_variations.jsonl")
         
-        # Generate variations with different difficulties
-        all_variations = []
+        # Resume from checkpoints
+        examples = load_jsonl(os.path.splitext(base_path)[0] + ".jsonl")[:num_base_examples]
         for example in examples:
-            variations = await generator.generate_variations_with_difficulty(
-                example=example,
-                num_variations=num_variations,
-                target_difficulties=["easy", "medium", "hard"]
+            example.setdefault("category", category)
+        existing_variations = load_jsonl(variations_path)
+        generator.register_examples(examples + existing_variations)
+        done_variations: Dict[str, int] = {}
+        for variation in existing_variations:
+            original_id = variation.get("metadata", {}).get("original_id")
+            done_variations[original_id] = done_variations.get(original_id, 0) + 1
+        
+        if examples:
+            print(f"Resuming {category} with {len(examples)} base examples")
+        
+        # Variations of already-accepted examples start right away
+        variation_jobs = [
+            asyncio.create_task(
+                generate_variations(category, example, done_variations.get(example.get("id"), 0))
+            )
+            for example in examples
+        ]
+        
+        def on_example(example: Dict) -> None:
+            example.setdefault("category", category)
+            variation_jobs.append(asyncio.create_task(generate_variations(category, example, 0)))
+        
+        # Generate missing base examples; each one starts its variations when accepted
+        remaining = num_base_examples - len(examples)
+        if remaining > 0:
+            new_examples = await generator.generate_dataset(
+                num_examples=remaining,
+                templates=templates,
+                output_path=base_path,
+                on_example=on_example
             )
-            all_variations.extend(variations)
+            examples.extend(new_examples)
         
-        print(f"Generated {len(all_variations)} variations")
+        with open(base_path, "w") as f:
+            json.dump(examples, f, indent=2)
+        print(f"Generated {len(examples)} base examples for {category}")
+        
+        await asyncio.gather(*variation_jobs)
+        all_variations = load_jsonl(variations_path)
+        print(f"Generated {len(all_variations)} variations for {category}")
+        profiler.checkpoint(f"{category}: variations generated")
         
         # Save variations
         if all_variations:
             with open(os.path.join(output_dir, f"{category}_variations.json"), "w") as f:
                 json.dump(all_variations, f, indent=2)
+        
+        return examples
     
-    # Generate concept connections across categories
-    if len(all_examples) >= 2:
-        print("\nGenerating concept connections...")
-        connections = await generator.generate_concept_connections(
-            examples=all_examples,
-            num_connections=num_connections
-        )
+    async def generate_connections(all_examples: List[Dict]) -> None:
+        """Generate the concept connections that are still missing."""
+        connections_path = os.path.join(output_dir, "concept_connections.jsonl")
+        connections = load_jsonl(connections_path)
+        generator.register_examples(connections)
+        
+        remaining = num_connections - len(connections)
+        if remaining > 0:
+            print("\nGenerating concept connections...")
+            
+            # Pick diverse cross-category pairs that haven't been combined yet
+            index_config = config.get("synthetic_data.concept_index", {}) or {}
+            index = ConceptIndex(
+                all_examples,
+                cache_dir=index_config.get("cache_dir", os.path.join(output_dir, ".cache"))
+            )
+            # Skip pairs already combined, including ones whose connection was rejected
+            used_pairs = {
+                tuple(connection["metadata"]["source_examples"])
+                for connection in connections
+                if len(connection.get("metadata", {}).get("source_examples", [])) == 2
+            }
+            used_pairs.update(
+                tuple(record["key"].split("|"))
+                for record in generation_log.records
+                if record.get("kind") == "connection" and record.get("status") == "rejected"
+            )
+            pairs = index.select_pairs(
+                remaining,
+                diversity=index_config.get("diversity", 0.5),
+                exclude=used_pairs
+            )
+            
+            new_connections = await generator.generate_concept_connections(
+                examples=all_examples,
+                num_connections=remaining,
+                start_index=len(connections),
+                pairs=pairs
+            )
+            append_jsonl(connections_path, new_connections)
+            connections.extend(new_connections)
         
         print(f"Generated {len(connections)} concept connections")
         
@@ -99,6 +211,22 @@ async def generate_stem_dataset(
             with open(os.path.join(output_dir, "concept_connections.json"), "w") as f:
                 json.dump(connections, f, indent=2)
     
+    # Generate every category concurrently
+    category_examples = await asyncio.gather(*(generate_category(c) for c in categories))
+    all_examples = [example for examples in category_examples for example in examples]
+    
+    # Generate concept connections across categories
+    if len(all_examples) >= 2:
+        await generate_connections(all_examples)
+        profiler.checkpoint("connections generated")
+    
+    print(f"\nCandidates logged: {generation_log.summary()}")
+    for name, counts in parse_stats.summary().items():
+        print(f"Parsed {name} responses: {counts} ({parse_stats.failure_rate(name):.1%} failed)")
+    await generator.clients.aclose()
+    report_path = profiler.stop()
+    if report_path:
+        print(f"Profile written to {report_path}")
     print("\nDataset generation complete!")
 
 def main():
@@ -138,6 +266,12 @@ def main():
         help="Directory to save generated data"
     )
     
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile CPU, event loop and memory use; written to <output-dir>/profile"
+    )
+    
     args = parser.parse_args()
     
     # Run generation
@@ -146,7 +280,8 @@ def main():
         num_base_examples=args.num_base,
         num_variations=args.num_variations,
         num_connections=args.num_connections,
-        output_dir=args.output_dir
+        output_dir=args.output_dir,
+        profile=args.profile
     ))
 
 if __name__ == "__main__":
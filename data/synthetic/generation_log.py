@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+ACCEPTED = "accepted"
+REJECTED = "rejected"
+ERROR = "error"
+
+def prompt_hash(prompt: str) -> str:
+    """Stable short hash of a generation prompt, ignoring indentation."""
+    normalized = "\n".join(line.strip() for line in prompt.strip().splitlines())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+class GenerationLog:
+    """
+    Append-only JSONL record of every candidate a generation run paid for.
+    
+    Each record holds the candidate's kind ("base", "variation",
+    "connection", "augmentation"), a grouping key (template ID, original
+    example ID, ...), its status, the hash of the prompt that produced it,
+    and the validation verdict. The log is loaded into memory on open and
+    every new record is flushed to disk immediately, so a crashed run loses
+    at most the candidate that was in flight.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open a log, loading any records already on disk.
+        
+        Args:
+            path: Path of the JSONL log file
+        """
+        self.path = path
+        self.records: List[Dict[str, Any]] = []
+        self._counts: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        self._rejected: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        self._index(json.loads(line))
+                    except ValueError:
+                        print(f"Warning: Skipping unreadable line in {path}")
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    
+    def _index(self, record: Dict[str, Any]) -> None:
+        self.records.append(record)
+        group = (record.get("kind"), str(record.get("key")))
+        self._counts[group][record.get("status")] += 1
+        if record.get("status") == REJECTED and record.get("candidate"):
+            self._rejected[group].append(record)
+    
+    def append(
+        self,
+        kind: str,
+        key: Any,
+        status: str,
+        candidate: Optional[Dict[str, Any]] = None,
+        prompt_hash: Optional[str] = None,
+        validation: Optional[Tuple[bool, float, str]] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        Record a candidate and flush it to disk.
+        
+        Args:
+            kind: Kind of candidate
+            key: Grouping key, e.g. the template ID
+            status: One of "accepted", "rejected" or "error"
+            candidate: The generated candidate, if one was produced
+            prompt_hash: Hash of the prompt that produced the candidate
+            validation: Validation verdict as (is_valid, quality_score, feedback)
+            error: Error message for failed generations
+        """
+        record = {
+            "kind": kind,
+            "key": key,
+            "status": status,
+            "prompt_hash": prompt_hash,
+            "timestamp": time.time()
+        }
+        if validation is not None:
+            is_valid, quality_score, feedback = validation
+            record["validation"] = {
+                "is_valid": is_valid,
+                "quality_score": quality_score,
+                "feedback": feedback
+            }
+        if candidate is not None:
+            record["candidate"] = candidate
+        if error is not None:
+            record["error"] = error
+        
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        self._index(record)
+    
+    def count(self, kind: str, key: Any, status: str = ACCEPTED) -> int:
+        """Number of logged candidates of a kind and key with a given status."""
+        return self._counts[(kind, str(key))][status]
+    
+    def rejected(self, kind: str, key: Any, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Most recent rejected candidates of a kind and key.
+        
+        Args:
+            kind: Kind of candidate
+            key: Grouping key
+            limit: Maximum number of records to return
+        
+        Returns:
+            Rejected records, newest first
+        """
+        records = self._rejected[(kind, str(key))][::-1]
+        return records[:limit] if limit is not None else records
+    
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """Candidate counts per kind and status."""
+        totals: Dict[str, Counter] = defaultdict(Counter)
+        for (kind, _), counts in self._counts.items():
+            totals[kind].update(counts)
+        return {kind: dict(counts) for kind, counts in totals.items()}
\ No newline at end of file
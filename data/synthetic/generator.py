@@ -1,36 +1,153 @@
+import asyncio
 import json
 import os
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
 
-from ...api.openai_client import OpenAIClient
+from ...api.base import ModelResponse
+from ...api.manager import get_client_manager
+from ...tasks.example_pool import NearDuplicateIndex
 from ...utils.config import config
+from ...utils.parsing import extract_json
+from ...utils.profiling import profiler
+from ...utils.templates import Template
+from ...utils.tracing import tracer
+from .batch_validator import BatchValidator
+from .generation_log import ACCEPTED, ERROR, REJECTED, GenerationLog, prompt_hash
 
 class SyntheticDataGenerator(ABC):
     """Base class for synthetic data generation."""
     
-    def __init__(self, task_name: str, config: Dict[str, Any]):
+    # Fields a candidate must have before it is worth validating with a model
+    required_fields: Tuple[str, ...] = ()
+    
+    def __init__(
+        self,
+        task_name: str,
+        config: Dict[str, Any],
+        clients: Optional[Mapping[str, Any]] = None
+    ):
         """
         Initialize the generator.
         
         Args:
             task_name: Name of the task
             config: Configuration dictionary
+            clients: Client manager shared with the rest of the process
+                (default: the process-wide manager)
         """
         self.task_name = task_name
         self.config = config
-        self.openai_client = OpenAIClient()
-        self.validator_model = config.get("synthetic_data.validation.validator_model", "gpt-4")
-        self.quality_threshold = config.get("synthetic_data.validation.quality_threshold", 0.8)
+        self.clients = clients if clients is not None else get_client_manager()
+        self.openai_client = self.clients["openai"]
+        self.last_run_stats: Dict[str, Any] = {}
+        
+        # This generator's share of the client manager's global limits
+        synthetic_config = config.get("synthetic_data", {})
+        self.max_concurrency = synthetic_config.get("max_concurrency", 8)
+        self._call_semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        validation_config = synthetic_config.get("validation", {})
+        self.validator_model = validation_config.get("validator_model", "gpt-4")
+        self.validator_temperature = validation_config.get("temperature", 0.0)
+        self.quality_threshold = validation_config.get("quality_threshold", 0.8)
+        self.prefilter_stats: Dict[str, int] = {"passed": 0, "rejected": 0}
+        self.near_duplicates = NearDuplicateIndex(
+            threshold=validation_config.get("near_duplicate_threshold", 0.9)
+        )
+        
+        # Concurrent candidates share validation requests
+        self.batch_validator = None
+        if validation_config.get("batch_size", 8) > 1:
+            self.batch_validator = BatchValidator(
+                self.validate_batch,
+                batch_size=validation_config.get("batch_size", 8),
+                max_wait=validation_config.get("batch_max_wait", 0.5),
+                max_retries=validation_config.get("batch_max_retries", 2)
+            )
+        
+        # Optional append-only record of every candidate; see attach_log
+        self.generation_log: Optional[GenerationLog] = None
+        self.max_negative_examples = synthetic_config.get("generation_log", {}).get(
+            "max_negative_examples", 3
+        )
+    
+    async def _generate(self, **kwargs: Any) -> ModelResponse:
+        """Call the model within the generator's concurrency budget (rate limits are global)."""
+        with tracer.span("generate", task=self.task_name, model=kwargs.get("model")):
+            async with self._call_semaphore:
+                return await self.openai_client.generate(**kwargs)
+    
+    def attach_log(self, path: str) -> GenerationLog:
+        """
+        Record every candidate this generator produces in an append-only log.
+        
+        Once attached, reruns balance base generation towards templates that
+        are still short of accepted examples, and rejected candidates are
+        shown to the model as examples to avoid.
+        
+        Args:
+            path: Path of the JSONL log file
+        
+        Returns:
+            The opened log
+        """
+        self.generation_log = GenerationLog(path)
+        return self.generation_log
+    
+    def _log(
+        self,
+        kind: str,
+        key: Any,
+        status: str,
+        candidate: Optional[Dict[str, Any]] = None,
+        validation: Optional[Tuple[bool, float, str]] = None,
+        error: Optional[str] = None
+    ) -> None:
+        if self.generation_log is None:
+            return
+        self.generation_log.append(
+            kind,
+            key,
+            status,
+            candidate=candidate,
+            prompt_hash=(candidate or {}).get("metadata", {}).get("prompt_hash"),
+            validation=validation,
+            error=error
+        )
+    
+    def negative_examples_prompt(self, kind: str, key: Any) -> str:
+        """
+        Prompt section listing earlier rejected candidates to steer away from.
+        
+        Args:
+            kind: Kind of candidate being generated
+            key: Grouping key, e.g. the template ID
+        
+        Returns:
+            Prompt text, or an empty string when there is nothing to avoid
+        """
+        if self.generation_log is None or self.max_negative_examples <= 0:
+            return ""
+        rejected = self.generation_log.rejected(kind, key, limit=self.max_negative_examples)
+        if not rejected:
+            return ""
+        lines = [
+            f"- {record['candidate'].get('problem', '')} "
+            f"(Rejected: {record.get('validation', {}).get('feedback', 'failed validation')})"
+            for record in rejected
+        ]
+        return "Earlier attempts that failed validation (do not repeat their mistakes):\n" + "\n".join(lines)
     
     @abstractmethod
-    async def generate_example(self, template: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_example(self, template: Template) -> Dict[str, Any]:
         """
         Generate a single example from a template.
         
         Args:
-            template: Template dictionary containing structure and constraints
-            
+            template: Template containing structure and constraints
+        
         Returns:
             Generated example dictionary
         """
@@ -43,64 +160,226 @@ class SyntheticDataGenerator(ABC):
         
         Args:
             example: The generated example to validate
-            
+        
         Returns:
             Tuple of (is_valid, quality_score, feedback)
         """
         pass
     
+    async def validate_batch(
+        self,
+        examples: List[Dict[str, Any]]
+    ) -> List[Optional[Tuple[bool, float, str]]]:
+        """
+        Validate several examples at once.
+        
+        The default validates each example separately; generators that can
+        score many candidates in one request should override this.
+        
+        Args:
+            examples: The examples to validate
+        
+        Returns:
+            One (is_valid, quality_score, feedback) tuple per example, or None
+            where no verdict could be obtained
+        """
+        return await asyncio.gather(*(self.validate_example(example) for example in examples))
+    
+    def prefilter_example(self, example: Dict[str, Any]) -> Optional[str]:
+        """
+        Cheap local checks run before any model validation.
+        
+        Args:
+            example: The generated example
+        
+        Returns:
+            Reason the example is rejected, or None if it may be validated
+        """
+        for field in self.required_fields:
+            value = example.get(field)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                return f"Missing required field: {field}"
+        
+        text = example.get("problem")
+        if isinstance(text, str):
+            duplicate = self.near_duplicates.find(text)
+            if duplicate is not None:
+                return f"Near-duplicate of example {duplicate}"
+        return None
+    
+    def register_examples(self, examples: List[Dict[str, Any]]) -> None:
+        """
+        Add existing examples to the duplicate check, e.g. when resuming a run.
+        
+        Args:
+            examples: Previously accepted examples
+        """
+        for example in examples:
+            self._remember(example)
+    
+    def _remember(self, example: Dict[str, Any]) -> None:
+        if isinstance(example.get("problem"), str):
+            key = str(example.get("id") or f"candidate-{len(self.near_duplicates)}")
+            self.near_duplicates.add(key, example["problem"])
+    
+    async def validate(self, example: Dict[str, Any]) -> Tuple[bool, float, str]:
+        """
+        Pre-filter an example locally, then validate it with the model.
+        
+        Candidates that pass the pre-filter are registered for the duplicate
+        check straight away, so concurrent near-identical candidates don't
+        both reach the validator. Model validation goes through the batch
+        validator when batching is enabled.
+        
+        Args:
+            example: The generated example to validate
+        
+        Returns:
+            Tuple of (is_valid, quality_score, feedback)
+        """
+        reason = self.prefilter_example(example)
+        if reason is not None:
+            self.prefilter_stats["rejected"] += 1
+            return False, 0.0, reason
+        self.prefilter_stats["passed"] += 1
+        
+        self._remember(example)
+        
+        if self.batch_validator is not None:
+            return await self.batch_validator.validate(example)
+        return await self.validate_example(example)
+    
     async def generate_dataset(
         self,
         num_examples: int,
-        templates: List[Dict[str, Any]],
-        output_path: Optional[str] = None
+        templates: List[Template],
+        output_path: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        on_example: Optional[Callable[[Dict[str, Any]], None]] = None
     ) -> List[Dict[str, Any]]:
         """
         Generate a dataset of examples.
         
+        Keeps up to `max_concurrency` generate+validate pipelines in flight
+        and stops as soon as `num_examples` valid examples have been
+        accepted, cancelling any surplus in-flight work. Accepted examples
+        are appended to a JSONL file next to `output_path` as they arrive.
+        
+        Each pipeline picks the template with the fewest examples so far,
+        counting accepted examples in the generation log (if attached), so
+        a rerun fills templates that are still short first.
+        
         Args:
             num_examples: Number of examples to generate
             templates: List of templates to use
             output_path: Optional path to save the dataset
-            
+            max_concurrency: Number of concurrent pipelines
+                (default: synthetic_data.max_concurrency)
+            on_example: Optional callback invoked with each accepted example,
+                so dependent work can start before the dataset is complete
+        
         Returns:
             List of generated examples
         """
-        examples = []
-        failed_attempts = 0
-        max_attempts = num_examples * 2  # Allow for some failures
+        concurrency = max_concurrency or self.max_concurrency
+        max_failures = num_examples * 2  # Allow for some failures
         
-        while len(examples) < num_examples and failed_attempts < max_attempts:
-            # Select template (can be random or based on distribution)
-            template = templates[len(examples) % len(templates)]
-            
-            try:
-                # Generate example
-                example = await self.generate_example(template)
+        examples: List[Dict[str, Any]] = []
+        stats = {"attempts": 0, "accepted": 0, "rejected": 0, "errors": 0}
+        template_load = [
+            self.generation_log.count("base", template.id) if self.generation_log else 0
+            for template in templates
+        ]
+        done = asyncio.Event()
+        start_time = time.time()
+        
+        stream = None
+        if output_path:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            stream = open(os.path.splitext(output_path)[0] + ".jsonl", "a")
+        
+        async def pipeline() -> None:
+            while not done.is_set() and stats["rejected"] + stats["errors"] < max_failures:
+                # Select the least-used template
+                index = min(range(len(templates)), key=template_load.__getitem__)
+                template_load[index] += 1
+                template = templates[index]
+                stats["attempts"] += 1
                 
-                # Validate example
-                is_valid, quality_score, feedback = await self.validate_example(example)
+                try:
+                    # Generate example
+                    example = await self.generate_example(template)
+                    
+                    # Validate example
+                    verdict = await self.validate(example)
+                    is_valid, quality_score, feedback = verdict
+                except Exception as e:
+                    stats["errors"] += 1
+                    self._log("base", template.id, ERROR, error=str(e))
+                    print(f"Error generating example: {str(e)}")
+                    continue
                 
-                if is_valid and quality_score >= self.quality_threshold:
-                    example["metadata"] = {
-                        "template_id": template.get("id"),
-                        "quality_score": quality_score,
-                        "validation_feedback": feedback
-                    }
-                    examples.append(example)
-                    print(f"Generated valid example {len(examples)}/{num_examples}")
-                else:
-                    failed_attempts += 1
+                if not (is_valid and quality_score >= self.quality_threshold):
+                    stats["rejected"] += 1
+                    self._log("base", template.id, REJECTED, example, verdict)
                     print(f"Example failed validation: {feedback}")
-            
-            except Exception as e:
-                failed_attempts += 1
-                print(f"Error generating example: {str(e)}")
+                    continue
+                
+                if done.is_set():
+                    return
+                
+                example["metadata"] = {
+                    **example.get("metadata", {}),
+                    "template_id": template.id,
+                    "quality_score": quality_score,
+                    "validation_feedback": feedback
+                }
+                examples.append(example)
+                stats["accepted"] += 1
+                self._log("base", template.id, ACCEPTED, example, verdict)
+                if stream:
+                    stream.write(json.dumps(example) + "\n")
+                    stream.flush()
+                print(f"Generated valid example {len(examples)}/{num_examples}")
+                if on_example:
+                    on_example(example)
+                
+                if len(examples) >= num_examples:
+                    done.set()
+        
+        workers = [asyncio.create_task(pipeline()) for _ in range(max(1, concurrency))]
+        all_workers = asyncio.gather(*workers, return_exceptions=True)
+        finished = asyncio.create_task(done.wait())
+        try:
+            await asyncio.wait([finished, all_workers], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Cancel surplus in-flight pipelines
+            for worker in workers:
+                worker.cancel()
+            finished.cancel()
+            await all_workers
+            if stream:
+                stream.close()
+        
+        elapsed = time.time() - start_time
+        completed = stats["accepted"] + stats["rejected"] + stats["errors"]
+        self.last_run_stats = {
+            **stats,
+            "cancelled": stats["attempts"] - completed,
+            "acceptance_rate": stats["accepted"] / completed if completed else 0.0,
+            "examples_per_second": stats["accepted"] / elapsed if elapsed > 0 else 0.0,
+            "elapsed_seconds": elapsed
+        }
+        print(
+            f"Accepted {stats['accepted']}/{completed} candidates "
+            f"({self.last_run_stats['acceptance_rate']:.1%}) in {elapsed:.1f}s "
+            f"({self.last_run_stats['examples_per_second']:.2f} examples/s)"
+        )
         
         if output_path:
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
             with open(output_path, "w") as f:
                 json.dump(examples, f, indent=2)
+        profiler.checkpoint(f"{self.task_name}: generated {len(examples)} examples")
         
         return examples
     
@@ -115,7 +394,7 @@ class SyntheticDataGenerator(ABC):
         Args:
             example: The example to augment
             augmentation_type: Type of augmentation to apply
-            
+        
         Returns:
             Augmented example
         """
@@ -131,33 +410,40 @@ class SyntheticDataGenerator(ABC):
         3. Has a valid solution
         4. Follows the same format
         
+        {self.negative_examples_prompt("augmentation", example.get("id"))}
+        
         Return the augmented example in the same JSON format.
         """
         
-        response = await self.openai_client.generate(
+        response = await self._generate(
             prompt=prompt,
             model="gpt-4",
-            max_tokens=500
+            max_tokens=500,
+            json_mode=True
         )
         
         try:
-            augmented = json.loads(response.text)
-            is_valid, quality_score, feedback = await self.validate_example(augmented)
-            
-            if is_valid and quality_score >= self.quality_threshold:
-                augmented["metadata"] = {
-                    **example.get("metadata", {}),
-                    "augmentation_type": augmentation_type,
-                    "original_id": example.get("id"),
-                    "quality_score": quality_score,
-                    "validation_feedback": feedback
-                }
-                return augmented
-            else:
-                raise ValueError(f"Augmented example failed validation: {feedback}")
-        
+            augmented = extract_json(response.text, required={"problem": str}, name="augmentation")
+            augmented["metadata"] = {
+                **example.get("metadata", {}),
+                "augmentation_type": augmentation_type,
+                "original_id": example.get("id"),
+                "prompt_hash": prompt_hash(prompt)
+            }
+            verdict = await self.validate(augmented)
+            is_valid, quality_score, feedback = verdict
         except Exception as e:
+            self._log("augmentation", example.get("id"), ERROR, error=str(e))
             raise ValueError(f"Error augmenting example: {str(e)}")
+        
+        if not (is_valid and quality_score >= self.quality_threshold):
+            self._log("augmentation", example.get("id"), REJECTED, augmented, verdict)
+            raise ValueError(f"Error augmenting example: Augmented example failed validation: {feedback}")
+        
+        augmented["metadata"]["quality_score"] = quality_score
+        augmented["metadata"]["validation_feedback"] = feedback
+        self._log("augmentation", example.get("id"), ACCEPTED, augmented, verdict)
+        return augmented
     
     async def generate_variations(
         self,
@@ -172,18 +458,17 @@ class SyntheticDataGenerator(ABC):
             example: Base example to create variations from
             num_variations: Number of variations to generate
             augmentation_types: List of augmentation types to use
-            
+        
         Returns:
             List of variations
         """
-        variations = []
-        
-        for _ in range(num_variations):
-            augmentation_type = augmentation_types[_ % len(augmentation_types)]
+        async def generate_variation(index: int) -> Optional[Dict[str, Any]]:
+            augmentation_type = augmentation_types[index % len(augmentation_types)]
             try:
-                variation = await self.augment_example(example, augmentation_type)
-                variations.append(variation)
+                return await self.augment_example(example, augmentation_type)
             except Exception as e:
                 print(f"Error generating variation: {str(e)}")
+                return None
         
-        return variations 
\ No newline at end of file
+        variations = await asyncio.gather(*(generate_variation(i) for i in range(num_variations)))
+        return [variation for variation in variations if variation is not None]
\ No newline at end of file
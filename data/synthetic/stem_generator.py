@@ -1,18 +1,28 @@
-import json
+import asyncio
+import re
 import uuid
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+from .generation_log import ACCEPTED, ERROR, REJECTED, prompt_hash
+from ...utils.parsing import extract_json
+from ...utils.templates import Template
 from .generator import SyntheticDataGenerator
 
+# Fields a generated problem must have to be usable
+EXAMPLE_FIELDS = {"problem": str, "solution": str, "answer": object}
+VERDICT_FIELDS = {"is_valid": bool, "overall_score": (int, float)}
+
 class STEMDataGenerator(SyntheticDataGenerator):
     """Synthetic data generator for STEM problems."""
     
-    async def generate_example(self, template: Dict[str, Any]) -> Dict[str, Any]:
+    required_fields = ("problem", "solution", "answer")
+    
+    async def generate_example(self, template: Template) -> Dict[str, Any]:
         """Generate a STEM problem from a template."""
         # Create a detailed prompt for GPT-4 to generate a problem
         prompt = f"""
         Generate a STEM problem based on this template:
-        {json.dumps(template['structure'], indent=2)}
+        {template.structure_json}
         
         Requirements:
         1. Follow the pattern exactly
@@ -21,6 +31,8 @@ class STEMDataGenerator(SyntheticDataGenerator):
         4. Include a detailed step-by-step solution
         5. Provide a clear, unambiguous answer
         
+        {self.negative_examples_prompt("base", template.id)}
+        
         The response should be a JSON object with these fields:
         - problem: The problem statement
         - solution: Detailed step-by-step solution
@@ -29,18 +41,20 @@ class STEMDataGenerator(SyntheticDataGenerator):
         - difficulty: One of [easy, medium, hard]
         """
         
-        response = await self.openai_client.generate(
+        response = await self._generate(
             prompt=prompt,
             model="gpt-4",
-            max_tokens=1000
+            max_tokens=1000,
+            json_mode=True
         )
         
         try:
-            generated = json.loads(response.text)
+            generated = extract_json(response.text, required=EXAMPLE_FIELDS, name="stem_example")
             return {
                 "id": str(uuid.uuid4()),
                 **generated,
-                "template_id": template.get("id")
+                "template_id": template.id,
+                "metadata": {"prompt_hash": prompt_hash(prompt)}
             }
         except Exception as e:
             raise ValueError(f"Error parsing generated example: {str(e)}")
@@ -68,42 +82,139 @@ class STEMDataGenerator(SyntheticDataGenerator):
         - feedback: Detailed feedback explaining the scores
         """
         
-        response = await self.openai_client.generate(
+        response = await self._generate(
             prompt=validation_prompt,
             model=self.validator_model,
-            max_tokens=500
+            max_tokens=500,
+            temperature=self.validator_temperature,
+            json_mode=True
         )
         
         try:
-            validation = json.loads(response.text)
+            validation = extract_json(response.text, required=VERDICT_FIELDS, name="stem_validation")
             return (
                 validation["is_valid"],
-                validation["overall_score"],
-                validation["feedback"]
+                float(validation["overall_score"]),
+                str(validation.get("feedback", ""))
             )
         except Exception as e:
             return False, 0.0, f"Error validating example: {str(e)}"
     
+    async def validate_batch(
+        self,
+        examples: List[Dict[str, Any]]
+    ) -> List[Optional[Tuple[bool, float, str]]]:
+        """
+        Validate several STEM problems in one request.
+        
+        Each problem is listed under a candidate ID and the model returns one
+        verdict per ID. Candidates whose verdict is missing or malformed get
+        None, so only those are retried.
+        """
+        if len(examples) == 1:
+            return [await self.validate_example(examples[0])]
+        
+        candidates = "\n".join(
+            f"""
+        Candidate {i}:
+        Problem: {example['problem']}
+        Solution: {example['solution']}
+        Answer: {example['answer']}
+        """
+            for i, example in enumerate(examples)
+        )
+        validation_prompt = f"""
+        Validate each of these {len(examples)} STEM problem candidates independently:
+        {candidates}
+        For each candidate, evaluate the following aspects and provide a score (0-1) for each:
+        1. Clarity: Is the problem clearly stated?
+        2. Completeness: Are all necessary details provided?
+        3. Correctness: Is the solution mathematically correct?
+        4. Step-by-Step: Is the solution well explained?
+        5. Answer Format: Is the answer properly formatted?
+        
+        Return your evaluation as a JSON object with a "verdicts" list containing
+        one object per candidate with:
+        - id: The candidate number
+        - overall_score: Weighted average of scores
+        - is_valid: Boolean indicating if the candidate meets minimum quality
+        - feedback: Brief feedback explaining the scores
+        """
+        
+        response = await self._generate(
+            prompt=validation_prompt,
+            model=self.validator_model,
+            max_tokens=150 * len(examples) + 100,
+            temperature=self.validator_temperature,
+            json_mode=True
+        )
+        
+        verdicts: List[Optional[Tuple[bool, float, str]]] = [None] * len(examples)
+        try:
+            items = extract_json(
+                response.text,
+                required={"verdicts": list},
+                name="stem_batch_validation"
+            )["verdicts"]
+        except Exception as e:
+            print(f"Error parsing batch validation: {str(e)}")
+            return verdicts
+        
+        for item in items if isinstance(items, list) else []:
+            try:
+                index = int(item["id"])
+                is_valid, score = item["is_valid"], item["overall_score"]
+                # bool("false") is True; leave malformed verdicts as None so they're retried
+                if not isinstance(is_valid, bool):
+                    continue
+                if isinstance(score, bool) or not isinstance(score, (int, float)):
+                    continue
+                if 0 <= index < len(examples):
+                    verdicts[index] = (
+                        is_valid,
+                        float(score),
+                        str(item.get("feedback", ""))
+                    )
+            except (KeyError, TypeError, ValueError):
+                continue
+        return verdicts
+    
+    def prefilter_example(self, example: Dict[str, Any]) -> Optional[str]:
+        """Also reject answers that can't be compared against a model's output."""
+        reason = super().prefilter_example(example)
+        if reason is not None:
+            return reason
+        
+        answer = str(example["answer"]).strip()
+        if len(answer) > 200 or not re.search(r"[0-9A-Za-z]", answer):
+            return f"Unparseable answer: {answer[:50]!r}"
+        if answer.count("(") != answer.count(")"):
+            return f"Unbalanced parentheses in answer: {answer[:50]!r}"
+        return None
+    
     async def generate_variations_with_difficulty(
         self,
         example: Dict[str, Any],
         num_variations: int,
-        target_difficulties: List[str]
+        target_difficulties: List[str],
+        start_index: int = 0
     ) -> List[Dict[str, Any]]:
         """
         Generate variations of a STEM problem with specific difficulties.
         
+        Variations are generated concurrently within the generator's budget.
+        
         Args:
             example: Base example to create variations from
             num_variations: Number of variations to generate
             target_difficulties: List of desired difficulty levels
+            start_index: Index of the first variation, so resumed runs keep
+                cycling through difficulties where they left off
             
         Returns:
             List of variations
         """
-        variations = []
-        
-        for i in range(num_variations):
+        async def generate_variation(i: int) -> Optional[Dict[str, Any]]:
             target_difficulty = target_difficulties[i % len(target_difficulties)]
             
             prompt = f"""
@@ -118,66 +229,98 @@ class STEMDataGenerator(SyntheticDataGenerator):
             3. Provide complete solution and answer
             4. Follow the same format
             
+            {self.negative_examples_prompt("variation", example.get("id"))}
+            
             Return the variation as a JSON object with the same structure.
             """
             
             try:
-                response = await self.openai_client.generate(
+                response = await self._generate(
                     prompt=prompt,
                     model="gpt-4",
-                    max_tokens=1000
+                    max_tokens=1000,
+                    json_mode=True
                 )
                 
-                variation = json.loads(response.text)
+                variation = extract_json(response.text, required=EXAMPLE_FIELDS, name="stem_variation")
                 variation["id"] = str(uuid.uuid4())
                 variation["metadata"] = {
                     **example.get("metadata", {}),
                     "variation_type": "difficulty_adjustment",
                     "original_id": example.get("id"),
-                    "target_difficulty": target_difficulty
+                    "variation_index": i,
+                    "target_difficulty": target_difficulty,
+                    "prompt_hash": prompt_hash(prompt)
                 }
                 
                 # Validate the variation
-                is_valid, quality_score, feedback = await self.validate_example(variation)
+                verdict = await self.validate(variation)
+                is_valid, quality_score, feedback = verdict
                 if is_valid and quality_score >= self.quality_threshold:
                     variation["metadata"]["quality_score"] = quality_score
                     variation["metadata"]["validation_feedback"] = feedback
-                    variations.append(variation)
+                    self._log("variation", example.get("id"), ACCEPTED, variation, verdict)
+                    return variation
+                self._log("variation", example.get("id"), REJECTED, variation, verdict)
                 
             except Exception as e:
+                self._log("variation", example.get("id"), ERROR, error=str(e))
                 print(f"Error generating variation: {str(e)}")
+            
+            return None
         
-        return variations
+        variations = await asyncio.gather(*(
+            generate_variation(i) for i in range(start_index, start_index + num_variations)
+        ))
+        return [variation for variation in variations if variation is not None]
     
     async def generate_concept_connections(
         self,
         examples: List[Dict[str, Any]],
-        num_connections: int
+        num_connections: int,
+        start_index: int = 0,
+        pairs: Optional[List[Tuple[Dict[str, Any], Dict[str, Any]]]] = None
     ) -> List[Dict[str, Any]]:
         """
         Generate problems that connect concepts from multiple examples.
         
+        Without explicit `pairs`, connection i combines examples i and i + 1
+        (wrapping around). All connections are generated concurrently within
+        the generator's budget.
+        
         Args:
             examples: List of examples to combine concepts from
             num_connections: Number of connected problems to generate
+            start_index: Index of the first connection, so resumed runs
+                continue with new pairs
+            pairs: Optional pre-selected example pairs (e.g. from a
+                ConceptIndex); one connection is generated per pair
             
         Returns:
             List of new problems combining concepts
         """
-        connections = []
-        
-        for _ in range(num_connections):
+        if pairs is None:
             if len(examples) < 2:
-                break
-                
+                return []
+            pairs = [
+                (examples[i % len(examples)], examples[(i + 1) % len(examples)])
+                for i in range(start_index, start_index + num_connections)
+            ]
+        
+        async def generate_connection(
+            i: int,
+            first: Dict[str, Any],
+            second: Dict[str, Any]
+        ) -> Optional[Dict[str, Any]]:
+            
             prompt = f"""
             Create a new STEM problem that combines concepts from these examples:
             
             Example 1:
-            {examples[0]['problem']}
+            {first['problem']}
             
             Example 2:
-            {examples[1]['problem']}
+            {second['problem']}
             
             Requirements:
             1. Create a problem that requires understanding both concepts
@@ -188,31 +331,42 @@ class STEMDataGenerator(SyntheticDataGenerator):
             Return the new problem as a JSON object with the same structure.
             """
             
+            key = f"{first.get('id')}|{second.get('id')}"
             try:
-                response = await self.openai_client.generate(
+                response = await self._generate(
                     prompt=prompt,
                     model="gpt-4",
-                    max_tokens=1000
+                    max_tokens=1000,
+                    json_mode=True
                 )
                 
-                connected = json.loads(response.text)
+                connected = extract_json(response.text, required=EXAMPLE_FIELDS, name="stem_connection")
                 connected["id"] = str(uuid.uuid4())
                 connected["metadata"] = {
                     "connection_type": "concept_integration",
-                    "source_examples": [ex.get("id") for ex in examples[:2]]
+                    "connection_index": i,
+                    "source_examples": [first.get("id"), second.get("id")],
+                    "prompt_hash": prompt_hash(prompt)
                 }
                 
                 # Validate the connected problem
-                is_valid, quality_score, feedback = await self.validate_example(connected)
+                verdict = await self.validate(connected)
+                is_valid, quality_score, feedback = verdict
                 if is_valid and quality_score >= self.quality_threshold:
                     connected["metadata"]["quality_score"] = quality_score
                     connected["metadata"]["validation_feedback"] = feedback
-                    connections.append(connected)
+                    self._log("connection", key, ACCEPTED, connected, verdict)
+                    return connected
+                self._log("connection", key, REJECTED, connected, verdict)
                 
             except Exception as e:
+                self._log("connection", key, ERROR, error=str(e))
                 print(f"Error generating connection: {str(e)}")
             
-            # Rotate examples for next iteration
-            examples = examples[1:] + [examples[0]]
+            return None
         
-        return connections 
\ No newline at end of file
+        connections = await asyncio.gather(*(
+            generate_connection(start_index + k, first, second)
+            for k, (first, second) in enumerate(pairs[:num_connections])
+        ))
+        return [connection for connection in connections if connection is not None]
\ No newline at end of file
@@ -0,0 +1,155 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import pandas as pd
+
+QUALITY_METRICS = ["reasoning_quality", "step_clarity"]
+# Reported by multi-sample evaluation
+SAMPLING_METRICS = ["pass_at_k", "maj_at_k", "sample_accuracy", "tokens_per_sample"]
+LATENCY_QUANTILES = [0.25, 0.5, 0.75, 0.95]
+
+@dataclass
+class ResultsSummary:
+    """
+    Pre-aggregated statistics for a results frame.
+    
+    Attributes:
+        by_model: One row per model with accuracy, counts, quality metric
+            means/stds, latency quantiles, token statistics and prompt-cache use
+        by_category: Accuracy and counts per (model, category), if available
+        by_difficulty: Accuracy and counts per (model, difficulty), if available
+        quality_metrics: Quality metrics present in the results
+        sampling_metrics: Multi-sample metrics present in the results
+            (their per-model means are in by_model)
+    """
+    by_model: pd.DataFrame
+    by_category: Optional[pd.DataFrame]
+    by_difficulty: Optional[pd.DataFrame]
+    quality_metrics: List[str]
+    sampling_metrics: List[str] = field(default_factory=list)
+    
+    @property
+    def models(self) -> List[str]:
+        return list(self.by_model.index)
+    
+    @property
+    def has_latency(self) -> bool:
+        return "latency_mean" in self.by_model.columns
+    
+    @property
+    def has_tokens(self) -> bool:
+        return "tokens_mean" in self.by_model.columns
+    
+    @property
+    def has_prompt_cache(self) -> bool:
+        return "cache_hit_ratio" in self.by_model.columns
+
+def _breakdown(
+    data: pd.DataFrame,
+    column: str,
+    model_labels: pd.Index,
+    column_labels: pd.Index
+) -> pd.DataFrame:
+    """Accuracy and counts per (model, column)."""
+    valid = data[data[column] >= 0]
+    stats = valid.groupby(["model_name", column], sort=True)["is_correct"].agg(
+        accuracy="mean",
+        count="size"
+    )
+    stats.index = pd.MultiIndex.from_arrays(
+        [
+            model_labels.take(stats.index.get_level_values(0)),
+            column_labels.take(stats.index.get_level_values(1))
+        ],
+        names=["model_name", column]
+    )
+    return stats
+
+def summarize_results(results: pd.DataFrame) -> ResultsSummary:
+    """
+    Compute every per-model, per-category and per-difficulty statistic.
+    
+    Only the columns needed for reporting are copied out of the results, and
+    all per-model statistics come from a single groupby over that narrow frame.
+    
+    Args:
+        results: DataFrame containing evaluation results
+    
+    Returns:
+        ResultsSummary used by all plots and the summary report
+    """
+    # Group on integer codes rather than strings; labels are restored at the end
+    model_codes, model_labels = pd.factorize(results["model_name"], sort=True)
+    data = pd.DataFrame({
+        "model_name": model_codes,
+        "is_correct": results["is_correct"].fillna(False).astype(float).to_numpy()
+    })
+    quality_metrics = [m for m in QUALITY_METRICS if m in results.columns]
+    sampling_metrics = [m for m in SAMPLING_METRICS if m in results.columns]
+    numeric = quality_metrics + sampling_metrics + [
+        c for c in ("latency", "tokens_used", "prompt_tokens", "cached_tokens") if c in results.columns
+    ]
+    for column in numeric:
+        data[column] = pd.to_numeric(results[column], errors="coerce").to_numpy()
+    labels = {}
+    for column in ("category", "difficulty"):
+        if column in results.columns:
+            data[column], labels[column] = pd.factorize(results[column], sort=True)
+    
+    aggregations = {
+        "accuracy": ("is_correct", "mean"),
+        "count": ("is_correct", "size"),
+        "correct": ("is_correct", "sum")
+    }
+    for metric in quality_metrics:
+        aggregations[f"{metric}_mean"] = (metric, "mean")
+        aggregations[f"{metric}_std"] = (metric, "std")
+    for metric in sampling_metrics:
+        aggregations[metric] = (metric, "mean")
+    if "latency" in data.columns:
+        aggregations.update({
+            "latency_mean": ("latency", "mean"),
+            "latency_min": ("latency", "min"),
+            "latency_max": ("latency", "max")
+        })
+    if "tokens_used" in data.columns:
+        aggregations.update({
+            "tokens_mean": ("tokens_used", "mean"),
+            "tokens_std": ("tokens_used", "std"),
+            "tokens_total": ("tokens_used", "sum")
+        })
+    has_prompt_cache = "prompt_tokens" in data.columns and "cached_tokens" in data.columns
+    if has_prompt_cache:
+        aggregations.update({
+            "prompt_tokens_total": ("prompt_tokens", "sum"),
+            "cached_tokens_total": ("cached_tokens", "sum")
+        })
+    
+    grouped = data.groupby("model_name", sort=True)
+    by_model = grouped.agg(**aggregations)
+    by_model["errors"] = by_model["count"] - by_model["correct"]
+    if has_prompt_cache:
+        by_model["cache_hit_ratio"] = (
+            by_model["cached_tokens_total"] / by_model["prompt_tokens_total"].where(by_model["prompt_tokens_total"] > 0)
+        ).fillna(0.0)
+    
+    if "latency" in data.columns:
+        quantiles = grouped["latency"].quantile(LATENCY_QUANTILES).unstack()
+        for q in LATENCY_QUANTILES:
+            by_model[f"latency_p{int(q * 100)}"] = quantiles[q]
+    
+    by_model.index = pd.Index(model_labels.take(by_model.index), name="model_name")
+    
+    return ResultsSummary(
+        by_model=by_model,
+        by_category=(
+            _breakdown(data, "category", model_labels, labels["category"])
+            if "category" in labels else None
+        ),
+        by_difficulty=(
+            _breakdown(data, "difficulty", model_labels, labels["difficulty"])
+            if "difficulty" in labels else None
+        ),
+        quality_metrics=quality_metrics,
+        sampling_metrics=sampling_metrics
+    )
\ No newline at end of file
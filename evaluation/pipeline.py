@@ -1,27 +1,62 @@
 import asyncio
 import json
+import multiprocessing
 import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type, Union
 
 import pandas as pd
 from tqdm import tqdm
 
-from ..api.base import BaseModelClient
-from ..api.openai_client import OpenAIClient
-from ..api.deepseek_client import DeepSeekClient
-from ..tasks.base import BaseTask, TaskExample, TaskResult
+from ..api.base import ModelResponse
+from ..api.batch import BatchEndpoint, BatchExecutor, BatchRequest
+from ..api.manager import ClientManager, get_client_manager
+from ..tasks.base import BaseTask, ResourceProfile, TaskExample, TaskResult
+from ..tasks.sandbox import CodeSandbox
 from ..utils.config import config
+from ..utils.profiling import profiler
+from ..utils.tracing import tracer
 
 class EvaluationPipeline:
     """Pipeline for running model evaluations on tasks."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        clients: Optional[ClientManager] = None,
+        batch_endpoints: Optional[Dict[str, BatchEndpoint]] = None,
+        cpu_workers: Optional[int] = None
+    ):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            clients: Client manager shared with tasks and generators
+                (default: the process-wide manager)
+            batch_endpoints: Batch APIs by provider for batch mode, overriding
+                the clients' own (e.g. a LocalBatchEndpoint in tests)
+            cpu_workers: Grading processes this pipeline may start per
+                executor (default: CPU count); sharded workers each get a
+                share of the machine
+        """
         self.config = config
-        self.model_clients: Dict[str, BaseModelClient] = {
-            "openai": OpenAIClient(),
-            "deepseek": DeepSeekClient()
-        }
+        # Every model and judge call is rate limited by the shared manager
+        self.clients = clients or get_client_manager()
+        self.batch_endpoints = batch_endpoints or {}
+        
+        # Global budget shared by every task evaluated through this pipeline
+        self.semaphore = asyncio.Semaphore(self.config.get("evaluation.parallel_evaluations", 4))
+        # Work items waiting for a slot
+        self.waiting = 0
+        
+        # Tasks whose batch run failed before every batch was collected
+        self._unfinished_batches: set = set()
+        
+        # Grading executors shared by tasks with the same resource profile
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        self._executors: Dict[Tuple[str, Optional[int]], Union[Executor, CodeSandbox]] = {}
         
         # Create results directory if it doesn't exist
         os.makedirs(self.config.get("evaluation.results_dir", "results"), exist_ok=True)
@@ -30,7 +65,9 @@ class EvaluationPipeline:
         self,
         task: BaseTask,
         models: Optional[List[Dict[str, str]]] = None,
-        num_examples: Optional[int] = None
+        num_examples: Optional[int] = None,
+        mode: Optional[str] = None,
+        samples: Optional[int] = None
     ) -> pd.DataFrame:
         """
         Evaluate models on a task.
@@ -39,90 +76,465 @@ class EvaluationPipeline:
             task: The task to evaluate
             models: List of model configurations to evaluate
             num_examples: Number of examples to generate (overrides config)
-            
+            mode: "live" to call models per example, or "batch" to send each
+                model's prompts through its provider's batch API (providers
+                without one fall back to live calls); defaults to
+                evaluation.mode
+            samples: Samples per (model, example); above 1, results report
+                pass@k and majority-vote accuracy (defaults to
+                evaluation.samples, live mode only)
+        
         Returns:
             DataFrame containing evaluation results
         """
         # Get models to evaluate
         if models is None:
-            models = []
-            for provider, provider_config in self.config.get("models", {}).items():
-                for model in provider_config.get("models", []):
-                    models.append({
-                        "provider": provider,
-                        "name": model["name"],
-                        "alias": model["alias"]
-                    })
+            models = self.get_models()
+        mode = mode or self.config.get("evaluation.mode", "live")
+        if mode not in ("live", "batch"):
+            raise ValueError(f"Unknown evaluation mode: {mode}")
+        samples = samples or self.config.get("evaluation.samples", 1)
+        if samples > 1 and mode == "batch":
+            raise ValueError("Multi-sample evaluation is only supported in live mode")
+        self.bind_task(task)
         
         # Generate examples
         n_examples = num_examples or task.config.get("num_examples", 10)
-        examples = await task.generate_examples(n_examples)
+        with tracer.span("examples", task=task.task_name, count=n_examples):
+            # A batch run reuses the examples of an interrupted one, so its
+            # submitted batches (keyed by example ID) are found again
+            examples = self._load_batch_examples(task, n_examples) if mode == "batch" else None
+            if examples is None:
+                examples = await task.generate_examples(n_examples)
+                if mode == "batch":
+                    self._save_batch_examples(task, examples)
+        profiler.checkpoint(f"{task.task_name}: examples generated")
         
-        # Run evaluations
-        results: List[TaskResult] = []
+        # Models whose provider has a batch API skip the live path in batch mode
+        batched: Dict[str, BatchEndpoint] = {}
+        if mode == "batch":
+            for model in models:
+                provider = model["provider"]
+                endpoint = self.batch_endpoints.get(provider) or self.clients[provider].batch_endpoint()
+                if endpoint is None:
+                    print(f"Warning: {model['provider']} has no batch API, evaluating {model['alias']} live")
+                else:
+                    batched[model["alias"]] = endpoint
         
-        for model in tqdm(models, desc="Evaluating models"):
-            provider = model["provider"]
-            model_name = model["name"]
-            client = self.model_clients[provider]
+        # Run evaluations concurrently, bounded by the pipeline's shared budget
+        work = [
+            (model, example)
+            for model in models if model["alias"] not in batched
+            for example in examples
+        ]
+        
+        with tqdm(total=len(models) * len(examples), desc=f"Evaluating {task.task_name}") as progress:
+            async def run(model: Dict[str, str], example: TaskExample) -> TaskResult:
+                result = await self.evaluate_example(task, model, example, samples)
+                progress.update(1)
+                return result
             
-            for example in tqdm(examples, desc=f"Testing {model['alias']}", leave=False):
-                try:
-                    # Get model response
-                    prompt = task.get_prompt(example)
-                    response = await client.generate(
-                        prompt=prompt,
-                        model=model_name,
-                        max_tokens=self.config.get("evaluation.max_tokens", 1000),
-                        temperature=self.config.get("evaluation.temperature", 0.7)
-                    )
-                    
-                    # Evaluate response
-                    result = await task.evaluate_response(
+            outcomes = await asyncio.gather(
+                *(run(model, example) for model, example in work),
+                *(
+                    self._evaluate_batch(task, model, examples, batched[model["alias"]], progress)
+                    for model in models if model["alias"] in batched
+                )
+            )
+            results: List[TaskResult] = []
+            for outcome in outcomes:
+                results.extend(outcome if isinstance(outcome, list) else [outcome])
+        
+        profiler.checkpoint(f"{task.task_name}: evaluated")
+        
+        # Convert results to DataFrame
+        df = self._results_to_dataframe(results)
+        
+        # Save results without blocking other tasks on the event loop
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._save_results, df, task.task_name
+        )
+        profiler.checkpoint(f"{task.task_name}: results saved")
+        # Keep the examples while submitted batches may still have results to collect
+        if mode == "batch" and task.task_name not in self._unfinished_batches:
+            os.remove(self._batch_examples_path(task))
+        self._unfinished_batches.discard(task.task_name)
+        
+        return df
+    
+    def _batch_state_dir(self) -> str:
+        batch_config = self.config.get("evaluation.batch", {}) or {}
+        return batch_config.get(
+            "state_dir",
+            os.path.join(self.config.get("evaluation.results_dir", "results"), "batches")
+        )
+    
+    def _batch_examples_path(self, task: BaseTask) -> str:
+        return os.path.join(self._batch_state_dir(), f"{task.task_name}_examples.json")
+    
+    def _load_batch_examples(self, task: BaseTask, num_examples: int) -> Optional[List[TaskExample]]:
+        """The example set of an unfinished batch run of this task, if any."""
+        path = self._batch_examples_path(task)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            saved = json.load(f)
+        if len(saved) != num_examples:
+            print(f"Warning: Unfinished batch run of {task.task_name} used {len(saved)} examples, starting over")
+            return None
+        print(f"Resuming the unfinished batch run of {task.task_name} with its {len(saved)} examples")
+        return [TaskExample(**example) for example in saved]
+    
+    def _save_batch_examples(self, task: BaseTask, examples: List[TaskExample]) -> None:
+        """Persist a batch run's examples until the run finishes."""
+        path = self._batch_examples_path(task)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([asdict(example) for example in examples], f, default=str)
+        os.replace(tmp_path, path)
+    
+    def bind_task(self, task: BaseTask) -> None:
+        """
+        Give a task the grading executor its resource profile asks for.
+        
+        Process and thread pools are created on first use and shared by
+        every task with the same executor type and concurrency. A sandbox
+        is set as `task.sandbox`; its limits come from the `sandbox` config
+        of the first task bound to it.
+        """
+        profile: ResourceProfile = task.resource_profile
+        if profile.executor == "inline":
+            task.executor = None
+            return
+        
+        key = (profile.executor, profile.concurrency)
+        if key not in self._executors:
+            if profile.executor == "process":
+                self._executors[key] = ProcessPoolExecutor(
+                    max_workers=profile.concurrency or self.cpu_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            elif profile.executor == "thread":
+                self._executors[key] = ThreadPoolExecutor(max_workers=profile.concurrency)
+            elif profile.executor == "sandbox":
+                self._executors[key] = CodeSandbox.from_config(
+                    task.config.get("sandbox", {}) or {},
+                    processes=profile.concurrency or self.cpu_workers
+                )
+            else:
+                raise ValueError(f"Unknown executor type: {profile.executor}")
+        
+        if profile.executor == "sandbox":
+            task.executor = None
+            task.sandbox = self._executors[key]
+        else:
+            task.executor = self._executors[key]
+    
+    def close(self) -> None:
+        """Shut down the grading executors and sandboxes."""
+        for executor in self._executors.values():
+            if isinstance(executor, CodeSandbox):
+                executor.close()
+            else:
+                executor.shutdown(wait=True)
+        self._executors.clear()
+    
+    async def aclose(self) -> None:
+        """Shut down the grading executors and close the model clients' connections."""
+        self.close()
+        await self.clients.aclose()
+    
+    def get_models(self) -> List[Dict[str, str]]:
+        """
+        Get every configured model.
+        
+        Returns:
+            List of model configurations with provider, name and alias
+        """
+        models = []
+        for provider, provider_config in self.config.get("models", {}).items():
+            for model in provider_config.get("models", []):
+                models.append({
+                    "provider": provider,
+                    "name": model["name"],
+                    "alias": model["alias"]
+                })
+        return models
+    
+    async def evaluate_example(
+        self,
+        task: BaseTask,
+        model: Dict[str, str],
+        example: TaskExample,
+        samples: int = 1
+    ) -> TaskResult:
+        """
+        Evaluate a single model on a single example.
+        
+        Args:
+            task: The task the example belongs to
+            model: Model configuration with provider, name and alias
+            example: The example to evaluate
+            samples: Number of samples to draw and vote over
+        
+        Returns:
+            TaskResult for the example (an error result if evaluation failed)
+        
+        The model call and the task's judge call both run inside one slot of
+        the pipeline's shared concurrency budget.
+        """
+        with tracer.span(
+            "evaluate",
+            task=task.task_name,
+            provider=model["provider"],
+            model=model["alias"],
+            example=example.id
+        ):
+            async with self._slot():
+                if samples > 1:
+                    return await self._evaluate_samples(task, model, example, samples)
+                return await self._evaluate_example(task, model, example)
+    
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """Hold a slot of the shared budget, counting and tracing the wait for it."""
+        with tracer.span("slot_wait"):
+            self.waiting += 1
+            try:
+                await self.semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        try:
+            yield
+        finally:
+            self.semaphore.release()
+    
+    async def _evaluate_example(
+        self,
+        task: BaseTask,
+        model: Dict[str, str],
+        example: TaskExample
+    ) -> TaskResult:
+        """Evaluate a single example (callers hold a concurrency slot)."""
+        client = self.clients[model["provider"]]
+        
+        try:
+            # Get model response
+            prompt = task.get_prompt(example)
+            response = await client.generate(
+                prompt=prompt,
+                model=model["name"],
+                max_tokens=self.config.get("evaluation.max_tokens", 1000),
+                temperature=self.config.get("evaluation.temperature", 0.7)
+            )
+            return await self._grade(task, model, example, response)
+        except Exception as e:
+            return self._error_result(task, model, example, e)
+    
+    async def _evaluate_samples(
+        self,
+        task: BaseTask,
+        model: Dict[str, str],
+        example: TaskExample,
+        samples: int
+    ) -> TaskResult:
+        """
+        Evaluate several samples of one model on one example.
+        
+        Samples come from one request where the provider supports `n`, and
+        from concurrent calls otherwise. They are grouped by the task's
+        normalized answer and each distinct answer is graded once, so judge
+        calls scale with the number of distinct answers rather than samples.
+        The result carries the majority answer's grade (ties go to the
+        answer seen first) plus pass@k, maj@k and per-sample token costs.
+        """
+        client = self.clients[model["provider"]]
+        
+        try:
+            responses = await client.generate_samples(
+                prompt=task.get_prompt(example),
+                model=model["name"],
+                max_tokens=self.config.get("evaluation.max_tokens", 1000),
+                n=samples,
+                temperature=self.config.get("evaluation.temperature", 0.7)
+            )
+            
+            groups: Dict[str, List[ModelResponse]] = {}
+            for i, response in enumerate(responses):
+                answer = task.normalize_answer(example, response.text)
+                # Unreadable answers can't be pooled, so each is graded on its own
+                groups.setdefault(answer if answer is not None else f"\x00{i}", []).append(response)
+            ordered = sorted(
+                groups.items(),
+                key=lambda item: (len(item[1]), not item[0].startswith("\x00")),
+                reverse=True
+            )
+            
+            async def grade(response: ModelResponse) -> TaskResult:
+                with tracer.span(
+                    "grade",
+                    task=task.task_name,
+                    provider=model["provider"],
+                    model=model["alias"],
+                    example=example.id
+                ):
+                    return await task.evaluate_response(
                         example=example,
                         model_response=response.text,
                         model_name=model["alias"]
                     )
-                    
-                    # Add metadata
-                    result.metadata = result.metadata or {}
-                    result.metadata.update({
-                        "tokens_used": response.tokens_used,
-                        "latency": response.latency,
-                        "provider": provider,
-                        "full_model_name": model_name,
-                        "task_name": task.task_name,
-                        **example.metadata
-                    })
-                    
-                    results.append(result)
-                    
-                except Exception as e:
-                    print(f"Error evaluating {model['alias']} on example {example.id}: {str(e)}")
-                    # Add error result
-                    results.append(TaskResult(
-                        example_id=example.id,
-                        model_name=model["alias"],
-                        model_output="",
-                        is_correct=False,
-                        reasoning_quality=0.0,
-                        metrics={},
-                        metadata={
-                            "error": str(e),
-                            "provider": provider,
-                            "full_model_name": model_name,
-                            "task_name": task.task_name,
-                            **example.metadata
-                        }
-                    ))
+            
+            graded = await asyncio.gather(*(grade(group[0]) for _, group in ordered))
+        except Exception as e:
+            return self._error_result(task, model, example, e)
         
-        # Convert results to DataFrame
-        df = self._results_to_dataframe(results)
+        correct = sum(len(group) for (_, group), grade in zip(ordered, graded) if grade.is_correct)
+        majority = ordered[0][1]
+        tokens = [response.tokens_used for response in responses]
+        
+        result = graded[0]
+        result.metrics = {
+            **result.metrics,
+            "pass_at_k": float(correct > 0),
+            "maj_at_k": float(result.is_correct),
+            "sample_accuracy": correct / len(responses)
+        }
+        result.metadata = result.metadata or {}
+        result.metadata.update({
+            "samples": len(responses),
+            "distinct_answers": len(ordered),
+            "majority_share": len(majority) / len(responses),
+            "tokens_used": sum(tokens),
+            "tokens_per_sample": sum(tokens) / len(tokens),
+            "sample_tokens": tokens,
+            "prompt_tokens": sum(response.prompt_tokens for response in responses),
+            "cached_tokens": sum(response.cached_tokens for response in responses),
+            "latency": max(response.latency for response in responses),
+            "provider": model["provider"],
+            "full_model_name": model["name"],
+            "task_name": task.task_name,
+            **example.metadata
+        })
+        return result
+    
+    async def _evaluate_batch(
+        self,
+        task: BaseTask,
+        model: Dict[str, str],
+        examples: List[TaskExample],
+        endpoint: BatchEndpoint,
+        progress: tqdm
+    ) -> List[TaskResult]:
+        """
+        Evaluate one model on every example through a batch API.
         
-        # Save results
-        self._save_results(df, task.task_name)
+        Prompts go out as one batch; responses are graded as they come back,
+        inside the same concurrency budget as live evaluation (judge calls
+        are still made live). Items the batch couldn't answer become error
+        results, like failed live calls.
+        """
+        batch_config = self.config.get("evaluation.batch", {}) or {}
+        executor = BatchExecutor(
+            endpoint,
+            state_dir=self._batch_state_dir(),
+            poll_interval=batch_config.get("poll_interval", 30),
+            max_wait=batch_config.get("max_wait"),
+            max_resubmits=batch_config.get("max_resubmits", 1)
+        )
+        requests = [
+            BatchRequest(
+                custom_id=example.id,
+                model=model["name"],
+                prompt=task.get_prompt(example),
+                max_tokens=self.config.get("evaluation.max_tokens", 1000),
+                temperature=self.config.get("evaluation.temperature", 0.7)
+            )
+            for example in examples
+        ]
         
-        return df
+        try:
+            with tracer.span("batch", provider=model["provider"], model=model["alias"], requests=len(requests)):
+                responses = await executor.run(requests, name=f"{task.task_name}_{model['alias']}")
+        except Exception as e:
+            print(f"Warning: Batch run for {model['alias']} failed, rerun to resume it: {str(e)}")
+            self._unfinished_batches.add(task.task_name)
+            responses = {example.id: e for example in examples}
+        
+        async def grade(example: TaskExample) -> TaskResult:
+            response = responses[example.id]
+            if isinstance(response, Exception):
+                result = self._error_result(task, model, example, response)
+            else:
+                async with self._slot():
+                    try:
+                        result = await self._grade(task, model, example, response)
+                    except Exception as e:
+                        result = self._error_result(task, model, example, e)
+            progress.update(1)
+            return result
+        
+        return list(await asyncio.gather(*(grade(example) for example in examples)))
+    
+    async def _grade(
+        self,
+        task: BaseTask,
+        model: Dict[str, str],
+        example: TaskExample,
+        response: ModelResponse
+    ) -> TaskResult:
+        """Grade a model response and attach the run metadata."""
+        with tracer.span(
+            "grade",
+            task=task.task_name,
+            provider=model["provider"],
+            model=model["alias"],
+            example=example.id
+        ):
+            result = await task.evaluate_response(
+                example=example,
+                model_response=response.text,
+                model_name=model["alias"]
+            )
+        
+        # Add metadata
+        result.metadata = result.metadata or {}
+        result.metadata.update({
+            "tokens_used": response.tokens_used,
+            "prompt_tokens": response.prompt_tokens,
+            "cached_tokens": response.cached_tokens,
+            "latency": response.latency,
+            "provider": model["provider"],
+            "full_model_name": model["name"],
+            "task_name": task.task_name,
+            **example.metadata
+        })
+        return result
+    
+    def _error_result(
+        self,
+        task: BaseTask,
+        model: Dict[str, str],
+        example: TaskExample,
+        error: Exception
+    ) -> TaskResult:
+        """Result recorded for an example that couldn't be evaluated."""
+        print(f"Error evaluating {model['alias']} on example {example.id}: {str(error)}")
+        return TaskResult(
+            example_id=example.id,
+            model_name=model["alias"],
+            model_output="",
+            is_correct=False,
+            reasoning_quality=0.0,
+            metrics={},
+            metadata={
+                "error": str(error),
+                "provider": model["provider"],
+                "full_model_name": model["name"],
+                "task_name": task.task_name,
+                **example.metadata
+            }
+        )
     
     def _results_to_dataframe(self, results: List[TaskResult]) -> pd.DataFrame:
         """Convert task results to a DataFrame."""
@@ -143,20 +555,28 @@ class EvaluationPipeline:
             
             records.append(record)
         
-        return pd.DataFrame.from_records(records)
+        df = pd.DataFrame.from_records(records)
+        
+        # Low-cardinality labels as categoricals keep reporting group-bys cheap
+        for column in ("model_name", "category", "difficulty", "provider", "task_name"):
+            if column in df.columns:
+                df[column] = df[column].astype("category")
+        
+        return df
     
     def _save_results(self, df: pd.DataFrame, task_name: str) -> None:
         """Save evaluation results."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         results_dir = self.config.get("evaluation.results_dir", "results")
         
-        # Save CSV
-        csv_path = os.path.join(results_dir, f"{task_name}_{timestamp}.csv")
-        df.to_csv(csv_path, index=False)
-        
-        # Save JSON
-        json_path = os.path.join(results_dir, f"{task_name}_{timestamp}.json")
-        df.to_json(json_path, orient="records", indent=2)
+        with tracer.span("persist", task=task_name, rows=len(df)):
+            # Save CSV
+            csv_path = os.path.join(results_dir, f"{task_name}_{timestamp}.csv")
+            df.to_csv(csv_path, index=False)
+            
+            # Save JSON
+            json_path = os.path.join(results_dir, f"{task_name}_{timestamp}.json")
+            df.to_json(json_path, orient="records", indent=2)
         
         print(f"Results saved to {csv_path} and {json_path}")
     
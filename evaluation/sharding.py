@@ -0,0 +1,365 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import asdict
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from ..tasks.base import BaseTask, TaskExample, TaskResult
+from ..utils.config import config
+from ..utils.metrics import metrics
+from ..utils.profiling import profiler
+from ..utils.tracing import tracer
+from .pipeline import EvaluationPipeline
+from .work_queue import Lease, LeaseQueue
+
+# Creates a task from its name and the worker's shared client manager
+TaskFactory = Callable[[str, Optional[Mapping[str, object]]], BaseTask]
+
+def _worker_dir(shard_dir: str, run_id: Optional[str] = None) -> str:
+    """Where a run's workers write their traces, profiles and metrics."""
+    return os.path.join(shard_dir, "workers", run_id) if run_id else os.path.join(shard_dir, "workers")
+
+class ShardCoordinator:
+    """
+    Splits a (task, model, example) work plan into shards and merges results.
+    
+    Shards are handed out through a LeaseQueue, so any number of worker
+    processes, on this machine or on others sharing the queue's filesystem,
+    can evaluate them in parallel.
+    """
+    
+    def __init__(
+        self,
+        pipeline: EvaluationPipeline,
+        queue_path: str,
+        shard_dir: str,
+        shard_size: int = 25,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 3,
+        journal_mode: str = "DELETE"
+    ):
+        """
+        Initialize the coordinator.
+        
+        Args:
+            pipeline: Pipeline used to resolve models and save merged results
+            queue_path: Path to the shared queue database
+            shard_dir: Directory workers write shard results to
+            shard_size: Number of (model, example) items per shard
+            lease_seconds: Lease duration before an unresponsive worker's shard is reclaimed
+            max_attempts: Number of times a shard is retried before it is marked failed
+            journal_mode: Queue journal mode, see `LeaseQueue`
+        """
+        self.pipeline = pipeline
+        # The queue file may hold earlier runs' shards; only this run's count
+        self.run_id = uuid.uuid4().hex[:12]
+        self.queue = LeaseQueue(
+            queue_path,
+            lease_seconds=lease_seconds,
+            max_attempts=max_attempts,
+            run_id=self.run_id,
+            journal_mode=journal_mode
+        )
+        self.queue_path = queue_path
+        self.shard_dir = shard_dir
+        self.shard_size = shard_size
+        self.shard_ids: List[str] = []
+        # Workers' traces, profiles and metrics snapshots for this run
+        self.worker_dir = _worker_dir(shard_dir, self.run_id)
+        
+        os.makedirs(self.worker_dir, exist_ok=True)
+    
+    def enqueue(
+        self,
+        task: BaseTask,
+        examples: List[TaskExample],
+        models: Optional[List[Dict[str, str]]] = None,
+        samples: int = 1
+    ) -> int:
+        """
+        Split a task's work plan into shards and enqueue them.
+        
+        Args:
+            task: The task being evaluated
+            examples: Examples to evaluate every model on
+            models: Models to evaluate (defaults to all configured models)
+            samples: Samples per (model, example), stored with each shard
+        
+        Returns:
+            Number of shards enqueued
+        """
+        models = models or self.pipeline.get_models()
+        serialized = [asdict(example) for example in examples]
+        
+        num_shards = 0
+        for model in models:
+            for start in range(0, len(serialized), self.shard_size):
+                shard_id = f"{self.run_id}-{task.task_name}-{model['alias']}-{start:06d}"
+                self.queue.put(shard_id, {
+                    "task_name": task.task_name,
+                    "model": model,
+                    "samples": samples,
+                    "examples": serialized[start:start + self.shard_size]
+                })
+                self.shard_ids.append(shard_id)
+                num_shards += 1
+        return num_shards
+    
+    def run_local_workers(
+        self,
+        num_workers: int,
+        task_factory: TaskFactory,
+        poll_interval: float = 2.0,
+        max_idle_exits: int = 3,
+        profile: bool = False,
+        report_metrics: bool = False,
+        shutdown_timeout: float = 60.0
+    ) -> None:
+        """
+        Run local worker processes until every shard of this run is done or failed.
+        
+        Workers that exit while work remains (for example after a crash, or
+        while waiting on a lease held by a dead remote worker) are replaced.
+        A worker that exits before any shard settled (e.g. it can't import
+        a task or is missing an API key) never uses up a shard's attempts,
+        so after `max_idle_exits` such exits in a row the run is aborted.
+        
+        Args:
+            num_workers: Number of worker processes to keep running
+            task_factory: Picklable callable creating a task from its name
+            poll_interval: Seconds between queue checks
+            max_idle_exits: Worker exits without progress before giving up
+            profile: Whether workers trace and profile themselves (to `worker_dir`)
+            report_metrics: Whether workers export their metrics (to `worker_dir`)
+            shutdown_timeout: Seconds to wait for workers to exit once the run is done
+        
+        Raises:
+            RuntimeError: If workers keep exiting without making progress
+        """
+        ctx = multiprocessing.get_context("spawn")
+        # Each worker with the number of settled shards when it started
+        workers: List[Tuple[multiprocessing.process.BaseProcess, int]] = []
+        # Split the machine between workers so their grading pools don't oversubscribe it
+        cpu_workers = max(1, (os.cpu_count() or 1) // num_workers)
+        idle_exits = 0
+        
+        while not self.queue.is_drained():
+            counts = self.queue.counts()
+            settled = counts["done"] + counts["failed"]
+            
+            alive = []
+            for worker, settled_at_start in workers:
+                if worker.is_alive():
+                    alive.append((worker, settled_at_start))
+                elif settled > settled_at_start:
+                    idle_exits = 0
+                else:
+                    idle_exits += 1
+                    print(f"Warning: Worker {worker.pid} exited with code {worker.exitcode} before any shard settled")
+            workers = alive
+            
+            if idle_exits >= max_idle_exits:
+                for worker, _ in workers:
+                    worker.terminate()
+                    worker.join()
+                raise RuntimeError(
+                    f"{idle_exits} workers exited without making progress; "
+                    "see their output above for the cause"
+                )
+            
+            while len(workers) < num_workers:
+                worker = ctx.Process(
+                    target=run_worker,
+                    args=(self.queue_path, self.shard_dir, task_factory),
+                    kwargs={
+                        "lease_seconds": self.queue.lease_seconds,
+                        "max_attempts": self.queue.max_attempts,
+                        "journal_mode": self.queue.journal_mode,
+                        "cpu_workers": cpu_workers,
+                        "run_id": self.run_id,
+                        "profile": profile,
+                        "report_metrics": report_metrics
+                    }
+                )
+                worker.start()
+                workers.append((worker, settled))
+            
+            print(
+                f"Shards: {counts['done']} done, {counts['leased']} running, "
+                f"{counts['pending']} pending, {counts['failed']} failed"
+            )
+            time.sleep(poll_interval)
+        
+        # Let workers finish shutting down (and writing their telemetry) before it is merged
+        for worker, _ in workers:
+            worker.join(timeout=shutdown_timeout)
+            if worker.is_alive():
+                print(f"Warning: Worker {worker.pid} did not exit within {shutdown_timeout:.0f}s, terminating it")
+                worker.terminate()
+                worker.join()
+    
+    def merge(self) -> Dict[str, pd.DataFrame]:
+        """
+        Merge the results of this run's completed shards.
+        
+        Returns:
+            Mapping of task name to results DataFrame
+        """
+        completed = self.queue.results()
+        missing = [shard_id for shard_id in self.shard_ids if shard_id not in completed]
+        if missing:
+            print(f"Warning: {len(missing)} shards did not complete and are missing from results")
+        
+        results: Dict[str, List[TaskResult]] = defaultdict(list)
+        for shard_id in self.shard_ids:
+            if shard_id not in completed:
+                continue
+            with open(completed[shard_id], "r") as f:
+                for line in f:
+                    record = json.loads(line)
+                    results[record["task_name"]].append(TaskResult(**record["result"]))
+        
+        return {
+            task_name: self.pipeline._results_to_dataframe(task_results)
+            for task_name, task_results in results.items()
+        }
+
+async def _evaluate_shard(
+    pipeline: EvaluationPipeline,
+    queue: LeaseQueue,
+    lease: Lease,
+    task: BaseTask,
+    shard_dir: str
+) -> str:
+    """Evaluate every item in a shard and write the results atomically."""
+    async def heartbeat() -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            if not await loop.run_in_executor(None, queue.heartbeat, lease):
+                print(f"Warning: Lost lease on shard {lease.shard_id}")
+                return
+    
+    heartbeat_task = asyncio.create_task(heartbeat())
+    try:
+        model = lease.payload["model"]
+        samples = lease.payload.get("samples", 1)
+        results = await asyncio.gather(*(
+            pipeline.evaluate_example(task, model, TaskExample(**example_data), samples)
+            for example_data in lease.payload["examples"]
+        ))
+        lines = [
+            json.dumps({"task_name": task.task_name, "result": asdict(result)}, default=str)
+            for result in results
+        ]
+    finally:
+        heartbeat_task.cancel()
+    
+    path = os.path.join(shard_dir, f"{lease.shard_id}.jsonl")
+    tmp_path = f"{path}.{lease.worker_id}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+def run_worker(
+    queue_path: str,
+    shard_dir: str,
+    task_factory: TaskFactory,
+    worker_id: Optional[str] = None,
+    poll_interval: float = 2.0,
+    lease_seconds: float = 300.0,
+    max_attempts: int = 3,
+    journal_mode: str = "DELETE",
+    cpu_workers: Optional[int] = None,
+    run_id: Optional[str] = None,
+    profile: bool = False,
+    report_metrics: bool = False
+) -> None:
+    """
+    Claim and evaluate shards until the queue is drained.
+    
+    Model and judge calls happen here rather than in the coordinator, so
+    the worker records its own telemetry in the run's worker directory
+    (`<shard_dir>/workers/<run_id>`), named by worker ID: with `profile`,
+    `<worker_id>.trace.json` (spans and stage histograms) and a CPU/memory
+    profile under `<worker_id>/`; with `report_metrics`, a periodically
+    refreshed `<worker_id>.metrics.json`. The coordinator merges them.
+    
+    Args:
+        queue_path: Path to the shared queue database
+        shard_dir: Directory to write shard results to
+        task_factory: Callable creating a task from its name and shared client manager
+        worker_id: Identifier for this worker (defaults to host and PID)
+        poll_interval: Seconds to wait when no shard is available
+        lease_seconds: Lease duration, must match the coordinator's
+        max_attempts: Attempts per shard, must match the coordinator's
+        journal_mode: Queue journal mode, must match the coordinator's
+        cpu_workers: Grading processes this worker may start (default: CPU count)
+        run_id: Only work on this run's shards (default: any run in the queue)
+        profile: Whether to trace and profile this worker
+        report_metrics: Whether to export this worker's metrics for the coordinator
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = LeaseQueue(
+        queue_path,
+        lease_seconds=lease_seconds,
+        max_attempts=max_attempts,
+        run_id=run_id,
+        journal_mode=journal_mode
+    )
+    os.makedirs(shard_dir, exist_ok=True)
+    worker_dir = _worker_dir(shard_dir, run_id)
+    
+    if profile:
+        tracer.enable(max_events=config.get("tracing.max_events"))
+    if report_metrics:
+        metrics.export(os.path.join(worker_dir, f"{worker_id}.metrics.json"))
+    
+    async def work(pipeline: EvaluationPipeline) -> None:
+        tasks: Dict[str, BaseTask] = {}
+        
+        while True:
+            lease = queue.claim(worker_id)
+            if lease is None:
+                if queue.is_drained():
+                    return
+                await asyncio.sleep(poll_interval)
+                continue
+            
+            task_name = lease.payload["task_name"]
+            try:
+                if task_name not in tasks:
+                    tasks[task_name] = task_factory(task_name, pipeline.clients)
+                    pipeline.bind_task(tasks[task_name])
+                path = await _evaluate_shard(pipeline, queue, lease, tasks[task_name], shard_dir)
+                if not queue.complete(lease, path):
+                    print(f"Warning: Shard {lease.shard_id} was reclaimed before it completed")
+            except Exception as e:
+                print(f"Error evaluating shard {lease.shard_id}: {str(e)}")
+                queue.fail(lease, str(e))
+    
+    async def run() -> None:
+        if profile:
+            profiler.start(os.path.join(worker_dir, worker_id))
+        pipeline = EvaluationPipeline(cpu_workers=cpu_workers)
+        metrics.watch_pipeline(pipeline)
+        try:
+            await work(pipeline)
+        finally:
+            await pipeline.aclose()
+            if profile:
+                profiler.stop()
+                tracer.export_chrome(os.path.join(worker_dir, f"{worker_id}.trace.json"))
+    
+    try:
+        asyncio.run(run())
+    finally:
+        metrics.close()
\ No newline at end of file
@@ -0,0 +1,199 @@
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Upper bound on elements in one resampling index matrix (~160MB of int64)
+MAX_CHUNK_ELEMENTS = 20_000_000
+
+@dataclass
+class StatisticsSummary:
+    """
+    Uncertainty estimates for a results frame.
+    
+    Attributes:
+        accuracy: Per-model accuracy with bootstrap CI bounds (ci_low, ci_high)
+        comparisons: One row per model pair with the paired accuracy
+            difference, its bootstrap CI, and McNemar's test
+        num_paired_examples: Number of examples answered by every model
+        confidence: Confidence level of the intervals
+        num_resamples: Number of bootstrap resamples
+    """
+    accuracy: pd.DataFrame
+    comparisons: pd.DataFrame
+    num_paired_examples: int
+    confidence: float
+    num_resamples: int
+
+def paired_matrix(
+    results: pd.DataFrame,
+    metric: str = "is_correct"
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Pivot results into an (example x model) matrix of a metric.
+    
+    Only examples that have a value for every model are kept, so each row
+    is a matched observation across models.
+    
+    Args:
+        results: DataFrame containing evaluation results
+        metric: Column to pivot
+    
+    Returns:
+        Tuple of (model names, matrix of shape [num_examples, num_models])
+    """
+    example_codes, _ = pd.factorize(results["example_id"])
+    model_codes, models = pd.factorize(results["model_name"], sort=True)
+    
+    matrix = np.full((example_codes.max() + 1 if len(example_codes) else 0, len(models)), np.nan)
+    values = pd.to_numeric(results[metric], errors="coerce").to_numpy(dtype=float)
+    matrix[example_codes, model_codes] = values
+    
+    complete = ~np.isnan(matrix).any(axis=1)
+    return [str(m) for m in models], matrix[complete]
+
+def bootstrap_means(
+    values: np.ndarray,
+    num_resamples: int = 10000,
+    seed: Optional[int] = None
+) -> np.ndarray:
+    """
+    Bootstrap the column means of a matrix, resampling whole rows.
+    
+    Rows are resampled jointly, so statistics computed across columns of
+    the same resample are paired. When the rows take few distinct values
+    (as with per-example correctness across a handful of models), each
+    resample is drawn as multinomial counts over the distinct rows, which
+    is equivalent to resampling rows but costs O(distinct rows) instead of
+    O(rows). Otherwise resamples are drawn as batched index matrices.
+    
+    Args:
+        values: Array of shape [num_rows, num_columns] (or 1-D)
+        num_resamples: Number of bootstrap resamples
+        seed: Optional random seed
+    
+    Returns:
+        Array of shape [num_resamples, num_columns] of resampled means
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    if n == 0:
+        return np.full((num_resamples, values.shape[1]), np.nan)
+    
+    rng = np.random.default_rng(seed)
+    
+    patterns, inverse = np.unique(values, axis=0, return_inverse=True)
+    if len(patterns) * 4 <= n:
+        probs = np.bincount(inverse.ravel(), minlength=len(patterns)) / n
+        counts = rng.multinomial(n, probs, size=num_resamples)
+        return counts @ patterns / n
+    
+    means = np.empty((num_resamples, values.shape[1]))
+    chunk = max(1, MAX_CHUNK_ELEMENTS // n)
+    for start in range(0, num_resamples, chunk):
+        size = min(chunk, num_resamples - start)
+        index = rng.integers(0, n, size=(size, n))
+        means[start:start + size] = values[index].mean(axis=1)
+    return means
+
+def mcnemar_test(correct_a: np.ndarray, correct_b: np.ndarray) -> Tuple[int, int, float]:
+    """
+    McNemar's test on paired per-example correctness.
+    
+    Uses the exact binomial test when there are fewer than 25 discordant
+    pairs and the continuity-corrected chi-square test otherwise.
+    
+    Args:
+        correct_a: Boolean correctness of model A per example
+        correct_b: Boolean correctness of model B per example
+    
+    Returns:
+        Tuple of (only A correct, only B correct, two-sided p-value)
+    """
+    correct_a = np.asarray(correct_a, dtype=bool)
+    correct_b = np.asarray(correct_b, dtype=bool)
+    only_a = int(np.count_nonzero(correct_a & ~correct_b))
+    only_b = int(np.count_nonzero(~correct_a & correct_b))
+    discordant = only_a + only_b
+    
+    if discordant == 0:
+        return only_a, only_b, 1.0
+    
+    if discordant < 25:
+        tail = sum(math.comb(discordant, k) for k in range(min(only_a, only_b) + 1))
+        return only_a, only_b, min(1.0, 2 * tail / 2 ** discordant)
+    
+    statistic = (abs(only_a - only_b) - 1) ** 2 / discordant
+    return only_a, only_b, math.erfc(math.sqrt(statistic / 2))
+
+def compute_statistics(
+    results: pd.DataFrame,
+    num_resamples: int = 10000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None
+) -> StatisticsSummary:
+    """
+    Compute bootstrap confidence intervals and paired significance tests.
+    
+    Args:
+        results: DataFrame containing evaluation results
+        num_resamples: Number of bootstrap resamples
+        confidence: Confidence level for intervals
+        seed: Optional random seed
+    
+    Returns:
+        StatisticsSummary with per-model intervals and pairwise comparisons
+    """
+    alpha = (1 - confidence) / 2
+    quantiles = [alpha, 1 - alpha]
+    correct = results["is_correct"].fillna(False).astype(float)
+    
+    # Per-model intervals use every row of each model
+    rows = []
+    for model, model_correct in correct.groupby(results["model_name"], sort=True, observed=True):
+        means = bootstrap_means(model_correct.to_numpy(), num_resamples, seed)
+        low, high = np.quantile(means[:, 0], quantiles)
+        rows.append({
+            "model_name": model,
+            "accuracy": model_correct.mean(),
+            "ci_low": low,
+            "ci_high": high,
+            "count": len(model_correct)
+        })
+    accuracy = pd.DataFrame(rows, columns=["model_name", "accuracy", "ci_low", "ci_high", "count"])
+    accuracy = accuracy.set_index("model_name")
+    
+    # Pairwise comparisons use examples answered by every model
+    models, matrix = paired_matrix(results.assign(is_correct=correct))
+    comparisons = []
+    if len(models) > 1 and len(matrix):
+        means = bootstrap_means(matrix, num_resamples, seed)
+        for i in range(len(models)):
+            for j in range(i + 1, len(models)):
+                low, high = np.quantile(means[:, i] - means[:, j], quantiles)
+                only_a, only_b, p_value = mcnemar_test(matrix[:, i], matrix[:, j])
+                comparisons.append({
+                    "model_a": models[i],
+                    "model_b": models[j],
+                    "difference": matrix[:, i].mean() - matrix[:, j].mean(),
+                    "ci_low": low,
+                    "ci_high": high,
+                    "only_a_correct": only_a,
+                    "only_b_correct": only_b,
+                    "p_value": p_value
+                })
+    
+    return StatisticsSummary(
+        accuracy=accuracy,
+        comparisons=pd.DataFrame(comparisons, columns=[
+            "model_a", "model_b", "difference", "ci_low", "ci_high",
+            "only_a_correct", "only_b_correct", "p_value"
+        ]),
+        num_paired_examples=len(matrix),
+        confidence=confidence,
+        num_resamples=num_resamples
+    )
\ No newline at end of file
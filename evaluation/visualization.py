@@ -1,11 +1,27 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional
 
 import matplotlib.pyplot as plt
 import pandas as pd
+import plotly
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
 from plotly.subplots import make_subplots
 
+from ..utils.config import config
+from .aggregation import ResultsSummary, summarize_results
+from .statistics import StatisticsSummary, compute_statistics
+
+# Versioned, so HTML written after a plotly upgrade never loads an older plotly.js
+PLOTLYJS_FILENAME = f"plotly-{plotly.__version__}.min.js"
+RENDER_MANIFEST_FILENAME = ".render_manifest.json"
+
 class EvaluationVisualizer:
     """Visualization tools for evaluation results."""
     
@@ -17,6 +33,27 @@ class EvaluationVisualizer:
             results: DataFrame containing evaluation results
         """
         self.results = results
+        self._summary: Optional[ResultsSummary] = None
+        self._statistics: Optional[StatisticsSummary] = None
+    
+    @property
+    def summary(self) -> ResultsSummary:
+        """Aggregated statistics shared by every plot and the summary report."""
+        if self._summary is None:
+            self._summary = summarize_results(self.results)
+        return self._summary
+    
+    @property
+    def statistics(self) -> StatisticsSummary:
+        """Bootstrap confidence intervals and paired significance tests."""
+        if self._statistics is None:
+            self._statistics = compute_statistics(
+                self.results,
+                num_resamples=config.get("reporting.statistics.num_resamples", 10000),
+                confidence=config.get("reporting.statistics.confidence", 0.95),
+                seed=config.get("reporting.statistics.seed")
+            )
+        return self._statistics
     
     def plot_accuracy_comparison(
         self,
@@ -29,37 +66,42 @@ class EvaluationVisualizer:
         Args:
             by_category: Whether to break down by category
             by_difficulty: Whether to break down by difficulty
-            
+        
         Returns:
             Plotly figure
         """
-        if by_category and "category" in self.results.columns:
+        summary = self.summary
+        
+        if by_category and summary.by_category is not None:
             fig = px.bar(
-                self.results.groupby(["model_name", "category"])["is_correct"].mean().reset_index(),
+                summary.by_category.reset_index(),
                 x="model_name",
-                y="is_correct",
+                y="accuracy",
                 color="category",
                 barmode="group",
                 title="Model Accuracy by Category",
-                labels={"is_correct": "Accuracy", "model_name": "Model"}
+                labels={"accuracy": "Accuracy", "model_name": "Model"}
             )
-        elif by_difficulty and "difficulty" in self.results.columns:
+        elif by_difficulty and summary.by_difficulty is not None:
             fig = px.bar(
-                self.results.groupby(["model_name", "difficulty"])["is_correct"].mean().reset_index(),
+                summary.by_difficulty.reset_index(),
                 x="model_name",
-                y="is_correct",
+                y="accuracy",
                 color="difficulty",
                 barmode="group",
                 title="Model Accuracy by Difficulty",
-                labels={"is_correct": "Accuracy", "model_name": "Model"}
+                labels={"accuracy": "Accuracy", "model_name": "Model"}
             )
         else:
+            accuracy = self.statistics.accuracy.reset_index()
             fig = px.bar(
-                self.results.groupby("model_name")["is_correct"].mean().reset_index(),
+                accuracy,
                 x="model_name",
-                y="is_correct",
-                title="Model Accuracy Comparison",
-                labels={"is_correct": "Accuracy", "model_name": "Model"}
+                y="accuracy",
+                error_y=accuracy["ci_high"] - accuracy["accuracy"],
+                error_y_minus=accuracy["accuracy"] - accuracy["ci_low"],
+                title=f"Model Accuracy Comparison ({self.statistics.confidence:.0%} bootstrap CI)",
+                labels={"accuracy": "Accuracy", "model_name": "Model"}
             )
         
         return fig
@@ -71,14 +113,16 @@ class EvaluationVisualizer:
         Returns:
             Plotly figure
         """
-        metrics = ["reasoning_quality", "step_clarity"]
-        available_metrics = [m for m in metrics if m in self.results.columns]
+        summary = self.summary
+        available_metrics = summary.quality_metrics
+        if not available_metrics:
+            raise ValueError("Reasoning quality data not available in results")
+        
+        means = summary.by_model[[f"{m}_mean" for m in available_metrics]]
         
         fig = go.Figure()
         
-        for model in self.results["model_name"].unique():
-            model_data = self.results[self.results["model_name"] == model]
-            values = [model_data[metric].mean() for metric in available_metrics]
+        for model, values in zip(means.index, means.to_numpy().tolist()):
             values.append(values[0])  # Close the polygon
             
             fig.add_trace(go.Scatterpolar(
@@ -105,18 +149,36 @@ class EvaluationVisualizer:
         """
         Create boxplot of model latencies.
         
+        The boxes are drawn from precomputed quartiles; whiskers extend to
+        1.5 IQR, clipped to the observed range.
+        
         Returns:
             Plotly figure
         """
-        if "latency" not in self.results.columns:
+        summary = self.summary
+        if not summary.has_latency:
             raise ValueError("Latency data not available in results")
         
-        fig = px.box(
-            self.results,
-            x="model_name",
-            y="latency",
+        stats = summary.by_model
+        iqr = stats["latency_p75"] - stats["latency_p25"]
+        
+        fig = go.Figure()
+        
+        fig.add_trace(go.Box(
+            x=stats.index.tolist(),
+            q1=stats["latency_p25"].tolist(),
+            median=stats["latency_p50"].tolist(),
+            q3=stats["latency_p75"].tolist(),
+            mean=stats["latency_mean"].tolist(),
+            lowerfence=(stats["latency_p25"] - 1.5 * iqr).clip(lower=stats["latency_min"]).tolist(),
+            upperfence=(stats["latency_p75"] + 1.5 * iqr).clip(upper=stats["latency_max"]).tolist(),
+            name="Latency"
+        ))
+        
+        fig.update_layout(
             title="Model Latency Distribution",
-            labels={"latency": "Latency (seconds)", "model_name": "Model"}
+            xaxis_title="Model",
+            yaxis_title="Latency (seconds)"
         )
         
         return fig
@@ -128,22 +190,21 @@ class EvaluationVisualizer:
         Returns:
             Plotly figure
         """
-        if "tokens_used" not in self.results.columns:
+        summary = self.summary
+        if not summary.has_tokens:
             raise ValueError("Token usage data not available in results")
         
-        token_stats = self.results.groupby("model_name").agg({
-            "tokens_used": ["mean", "std"]
-        }).reset_index()
+        token_stats = summary.by_model
         
         fig = go.Figure()
         
         fig.add_trace(go.Bar(
             name="Mean Token Usage",
-            x=token_stats["model_name"],
-            y=token_stats["tokens_used"]["mean"],
+            x=token_stats.index.tolist(),
+            y=token_stats["tokens_mean"].tolist(),
             error_y=dict(
                 type="data",
-                array=token_stats["tokens_used"]["std"],
+                array=token_stats["tokens_std"].fillna(0).tolist(),
                 visible=True
             )
         ))
@@ -164,73 +225,232 @@ class EvaluationVisualizer:
             Markdown formatted summary string
         """
         summary = []
+        stats = self.summary
+        by_model = stats.by_model
+        has_quality = "reasoning_quality_mean" in by_model.columns
+        
         summary.append("# Evaluation Summary Report\n")
         
         # Overall statistics
         summary.append("## Overall Statistics\n")
-        overall_stats = self.results.groupby("model_name").agg({
-            "is_correct": ["mean", "count"],
-            "reasoning_quality": "mean"
-        }).round(3)
+        significance = self.statistics
+        confidence = f"{significance.confidence:.0%} CI"
+        summary.append(f"| Model | Accuracy | {confidence} | Sample Size | Reasoning Quality |")
+        summary.append(f"|-------|----------|{'-' * (len(confidence) + 2)}|-------------|------------------|")
         
-        summary.append("| Model | Accuracy | Sample Size | Reasoning Quality |")
-        summary.append("|-------|----------|-------------|------------------|")
+        for model, row in by_model.iterrows():
+            quality = f"{row['reasoning_quality_mean']:.3f}" if has_quality else "n/a"
+            interval = significance.accuracy.loc[model]
+            summary.append(
+                f"| {model} | {row['accuracy']:.3f} | "
+                f"[{interval['ci_low']:.3f}, {interval['ci_high']:.3f}] | "
+                f"{int(row['count'])} | {quality} |"
+            )
         
-        for model in overall_stats.index:
-            stats = overall_stats.loc[model]
+        # Paired comparisons between models
+        if len(significance.comparisons):
+            summary.append("\n## Pairwise Comparisons\n")
             summary.append(
-                f"| {model} | {stats['is_correct']['mean']:.3f} | "
-                f"{stats['is_correct']['count']} | {stats['reasoning_quality']['mean']:.3f} |"
+                f"Paired over {significance.num_paired_examples} examples answered by every model; "
+                f"intervals from {significance.num_resamples} bootstrap resamples, "
+                f"p-values from McNemar's test.\n"
             )
+            summary.append(f"| Model A | Model B | Accuracy Difference | {confidence} | McNemar p |")
+            summary.append(f"|---------|---------|---------------------|{'-' * (len(confidence) + 2)}|-----------|")
+            
+            for _, row in significance.comparisons.iterrows():
+                marker = " *" if row["p_value"] < 1 - significance.confidence else ""
+                summary.append(
+                    f"| {row['model_a']} | {row['model_b']} | {row['difference']:+.3f} | "
+                    f"[{row['ci_low']:+.3f}, {row['ci_high']:+.3f}] | {row['p_value']:.4f}{marker} |"
+                )
         
         # Category breakdown if available
-        if "category" in self.results.columns:
+        if stats.by_category is not None:
             summary.append("\n## Performance by Category\n")
-            category_stats = self.results.groupby(["model_name", "category"])["is_correct"].mean().round(3)
-            
             summary.append("| Model | Category | Accuracy |")
             summary.append("|-------|----------|----------|")
             
-            for (model, category), accuracy in category_stats.items():
+            for (model, category), accuracy in stats.by_category["accuracy"].items():
                 summary.append(f"| {model} | {category} | {accuracy:.3f} |")
         
+        # Self-consistency results if models were sampled more than once
+        if "pass_at_k" in stats.sampling_metrics:
+            summary.append("\n## Multi-Sample Results\n")
+            summary.append("| Model | pass@k | maj@k | Per-Sample Accuracy | Tokens per Sample |")
+            summary.append("|-------|--------|-------|---------------------|-------------------|")
+            
+            for model, row in by_model.iterrows():
+                tokens = f"{row['tokens_per_sample']:.0f}" if "tokens_per_sample" in by_model.columns else "n/a"
+                summary.append(
+                    f"| {model} | {row['pass_at_k']:.3f} | {row['maj_at_k']:.3f} | "
+                    f"{row['sample_accuracy']:.3f} | {tokens} |"
+                )
+        
+        # Prompt-cache use, when the providers reported it
+        if stats.has_prompt_cache and by_model["prompt_tokens_total"].sum() > 0:
+            summary.append("\n## Prompt Cache\n")
+            summary.append("| Model | Prompt Tokens | Cached Tokens | Hit Ratio |")
+            summary.append("|-------|---------------|---------------|-----------|")
+            
+            for model, row in by_model.iterrows():
+                summary.append(
+                    f"| {model} | {int(row['prompt_tokens_total'])} | "
+                    f"{int(row['cached_tokens_total'])} | {row['cache_hit_ratio']:.1%} |"
+                )
+        
         # Error analysis
         summary.append("\n## Error Analysis\n")
-        error_cases = self.results[~self.results["is_correct"]].groupby("model_name").size()
-        
         summary.append("| Model | Number of Errors |")
         summary.append("|-------|-----------------|")
         
-        for model, errors in error_cases.items():
-            summary.append(f"| {model} | {errors} |")
+        for model, errors in by_model["errors"].items():
+            summary.append(f"| {model} | {int(errors)} |")
         
         return "\n".join(summary)
     
-    def save_visualizations(self, output_dir: str) -> None:
+    def build_figures(self) -> Dict[str, go.Figure]:
+        """
+        Build every standard figure.
+        
+        Figures whose input data is unavailable are skipped with a warning.
+        
+        Returns:
+            Mapping of figure name to Plotly figure
+        """
+        builders = {
+            "accuracy": self.plot_accuracy_comparison,
+            "accuracy_by_category": lambda: self.plot_accuracy_comparison(by_category=True),
+            "accuracy_by_difficulty": lambda: self.plot_accuracy_comparison(by_difficulty=True),
+            "reasoning_quality": self.plot_reasoning_quality_radar,
+            "latency": self.plot_latency_boxplot,
+            "token_usage": self.plot_token_usage_bar
+        }
+        
+        plots = {}
+        for name, build in builders.items():
+            try:
+                plots[name] = build()
+            except Exception as e:
+                print(f"Error creating {name} plot: {str(e)}")
+        return plots
+    
+    def save_visualizations(
+        self,
+        output_dir: str,
+        export_pool: Optional[ProcessPoolExecutor] = None,
+        max_workers: Optional[int] = None
+    ) -> None:
         """
         Save all visualizations to files.
         
+        Figures are exported in a process pool whose workers each keep one
+        image renderer alive. The HTML files share a single plotly.js asset
+        in `output_dir`, and figures whose content hash matches the previous
+        render in `output_dir` are not exported again.
+        
         Args:
             output_dir: Directory to save visualization files
+            export_pool: Pool from `create_export_pool`, shared across reports
+                so renderers are started once per run (default: a pool for
+                this call only)
+            max_workers: Number of export processes when no pool is given
+                (default: one per figure, up to CPU count)
         """
+        os.makedirs(output_dir, exist_ok=True)
+        
         # Create plots
-        plots = {
-            "accuracy": self.plot_accuracy_comparison(),
-            "accuracy_by_category": self.plot_accuracy_comparison(by_category=True),
-            "accuracy_by_difficulty": self.plot_accuracy_comparison(by_difficulty=True),
-            "reasoning_quality": self.plot_reasoning_quality_radar(),
-            "latency": self.plot_latency_boxplot(),
-            "token_usage": self.plot_token_usage_bar()
-        }
+        plots = self.build_figures()
+        
+        # Shared plotly.js asset referenced by every HTML file
+        plotlyjs_path = os.path.join(output_dir, PLOTLYJS_FILENAME)
+        if not os.path.exists(plotlyjs_path):
+            with open(plotlyjs_path, "w", encoding="utf-8") as f:
+                f.write(get_plotlyjs())
+        
+        # Skip figures whose inputs haven't changed since the last render
+        manifest_path = os.path.join(output_dir, RENDER_MANIFEST_FILENAME)
+        manifest = _load_manifest(manifest_path)
         
-        # Save each plot
+        pending = {}
         for name, fig in plots.items():
+            fig_json = fig.to_json()
+            digest = hashlib.sha256(f"{PLOTLYJS_FILENAME}\n{fig_json}".encode("utf-8")).hexdigest()
+            outputs = [os.path.join(output_dir, f"{name}.{ext}") for ext in ("html", "png")]
+            if manifest.get(name) == digest and all(os.path.exists(path) for path in outputs):
+                continue
+            pending[name] = (fig_json, digest)
+        
+        # Save each changed plot
+        if pending:
+            pool = export_pool or create_export_pool(max_workers or len(pending))
             try:
-                fig.write_html(f"{output_dir}/{name}.html")
-                fig.write_image(f"{output_dir}/{name}.png")
-            except Exception as e:
-                print(f"Error saving {name} plot: {str(e)}")
+                futures = {
+                    name: pool.submit(_export_figure, fig_json, output_dir, name)
+                    for name, (fig_json, _) in pending.items()
+                }
+                for name, future in futures.items():
+                    try:
+                        future.result()
+                        manifest[name] = pending[name][1]
+                    except Exception as e:
+                        manifest.pop(name, None)
+                        print(f"Error saving {name} plot: {str(e)}")
+            finally:
+                if export_pool is None:
+                    pool.shutdown(wait=True)
+            
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f, indent=2)
         
         # Save summary report
         with open(f"{output_dir}/summary_report.md", "w") as f:
-            f.write(self.generate_summary_report()) 
\ No newline at end of file
+            f.write(self.generate_summary_report())
+
+def create_export_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Create a process pool for figure export.
+    
+    Each process starts one image renderer (a headless Chrome for kaleido)
+    and keeps it for its lifetime, so create one pool per run and pass it
+    to every `save_visualizations` call.
+    
+    Args:
+        max_workers: Number of export processes, capped at the CPU count
+            (default: CPU count)
+    
+    Returns:
+        The pool; the caller shuts it down
+    """
+    cpus = os.cpu_count() or 1
+    return ProcessPoolExecutor(
+        max_workers=min(max_workers or cpus, cpus),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_renderer
+    )
+
+def _load_manifest(path: str) -> Dict[str, str]:
+    """Load the figure hashes of the previous render, if any."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _init_renderer() -> None:
+    """Start one long-lived image renderer per export process."""
+    try:
+        import kaleido
+        if hasattr(kaleido, "start_sync_server"):
+            kaleido.start_sync_server(silence_warnings=True)
+    except Exception as e:
+        print(f"Warning: Could not start a persistent image renderer: {str(e)}")
+
+def _export_figure(fig_json: str, output_dir: str, name: str) -> None:
+    """Write a serialized figure to HTML and PNG."""
+    fig = pio.from_json(fig_json)
+    fig.write_html(
+        os.path.join(output_dir, f"{name}.html"),
+        include_plotlyjs=PLOTLYJS_FILENAME
+    )
+    fig.write_image(os.path.join(output_dir, f"{name}.png"))
\ No newline at end of file
@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+@dataclass
+class Lease:
+    """A claimed shard of work."""
+    shard_id: str
+    worker_id: str
+    payload: Dict[str, Any]
+    attempts: int
+    expires_at: float
+
+class LeaseQueue:
+    """
+    Durable SQLite-backed work queue with time-limited leases.
+    
+    Workers claim a shard, which leases it to them until `expires_at`. A
+    worker that crashes or stalls stops renewing its lease, so the shard is
+    handed to the next worker that calls `claim`. Shards that fail more than
+    `max_attempts` times are parked in the `failed` state.
+    
+    The database can live on a filesystem shared by several machines, as long
+    as that filesystem supports POSIX locks and the queue keeps the default
+    rollback journal (`journal_mode="DELETE"`). WAL needs shared memory that
+    network filesystems don't provide, so only use it when every worker runs
+    on the machine holding the database. One database can hold several
+    runs: shard IDs start with their run's ID, and a queue opened with a
+    `run_id` only claims, counts and reports that run's shards.
+    """
+    
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+    
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 3,
+        run_id: Optional[str] = None,
+        journal_mode: str = "DELETE"
+    ):
+        """
+        Open (and create if needed) a queue.
+        
+        Args:
+            path: Path to the SQLite database file
+            lease_seconds: How long a claim lasts without a heartbeat
+            max_attempts: Number of claims a shard gets before it is marked failed
+            run_id: Only see shards whose ID starts with "<run_id>-"
+                (default: every run in the database)
+            journal_mode: SQLite journal mode, "DELETE" (safe on shared
+                filesystems) or "WAL" (faster, single machine only)
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.run_id = run_id
+        self.journal_mode = journal_mode.upper()
+        if self.journal_mode not in ("DELETE", "WAL"):
+            raise ValueError(f"Unsupported journal mode: {journal_mode}")
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS shards (
+                    shard_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    worker_id TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    expires_at REAL,
+                    result TEXT,
+                    error TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS shards_state ON shards (state, expires_at)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def _scope(self) -> Tuple[str, Tuple[str, ...]]:
+        """SQL condition (and its parameters) selecting this queue's run."""
+        if self.run_id is None:
+            return "1 = 1", ()
+        # Run IDs are hex, so they contain no LIKE wildcards
+        return "shard_id LIKE ?", (f"{self.run_id}-%",)
+    
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def put(self, shard_id: str, payload: Dict[str, Any]) -> bool:
+        """
+        Enqueue a shard. Shards that already exist are left untouched.
+        
+        Args:
+            shard_id: Unique shard identifier
+            payload: JSON-serializable shard description
+        
+        Returns:
+            True if the shard was newly enqueued
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO shards (shard_id, payload, state) VALUES (?, ?, ?)",
+                (shard_id, json.dumps(payload), self.PENDING)
+            )
+            return cursor.rowcount > 0
+    
+    def claim(self, worker_id: str) -> Optional[Lease]:
+        """
+        Claim the next available shard, reclaiming expired leases first.
+        
+        Args:
+            worker_id: Identifier of the claiming worker
+        
+        Returns:
+            A Lease, or None if nothing is available right now
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reclaim_expired(conn, now)
+            scope, params = self._scope()
+            row = conn.execute(
+                f"SELECT shard_id, payload, attempts FROM shards WHERE state = ? AND {scope} "
+                "ORDER BY rowid LIMIT 1",
+                (self.PENDING, *params)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            
+            expires_at = now + self.lease_seconds
+            conn.execute(
+                "UPDATE shards SET state = ?, worker_id = ?, attempts = attempts + 1, "
+                "expires_at = ? WHERE shard_id = ?",
+                (self.LEASED, worker_id, expires_at, row["shard_id"])
+            )
+            conn.execute("COMMIT")
+            return Lease(
+                shard_id=row["shard_id"],
+                worker_id=worker_id,
+                payload=json.loads(row["payload"]),
+                attempts=row["attempts"] + 1,
+                expires_at=expires_at
+            )
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def _reclaim_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        """Return expired leases to the queue, or fail them if out of attempts."""
+        conn.execute(
+            "UPDATE shards SET state = ?, error = 'lease expired' "
+            "WHERE state = ? AND expires_at < ? AND attempts >= ?",
+            (self.FAILED, self.LEASED, now, self.max_attempts)
+        )
+        conn.execute(
+            "UPDATE shards SET state = ?, worker_id = NULL, expires_at = NULL "
+            "WHERE state = ? AND expires_at < ?",
+            (self.PENDING, self.LEASED, now)
+        )
+    
+    def heartbeat(self, lease: Lease) -> bool:
+        """
+        Extend a lease.
+        
+        Args:
+            lease: The lease to extend
+        
+        Returns:
+            False if the lease has been lost to another worker
+        """
+        expires_at = time.time() + self.lease_seconds
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE shards SET expires_at = ? "
+                "WHERE shard_id = ? AND worker_id = ? AND state = ?",
+                (expires_at, lease.shard_id, lease.worker_id, self.LEASED)
+            )
+        if cursor.rowcount:
+            lease.expires_at = expires_at
+        return cursor.rowcount > 0
+    
+    def complete(self, lease: Lease, result: str) -> bool:
+        """
+        Mark a leased shard as done.
+        
+        Args:
+            lease: The lease being completed
+            result: Location of the shard's results
+        
+        Returns:
+            False if the lease had already been lost to another worker
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE shards SET state = ?, result = ?, expires_at = NULL "
+                "WHERE shard_id = ? AND worker_id = ? AND state = ?",
+                (self.DONE, result, lease.shard_id, lease.worker_id, self.LEASED)
+            )
+            return cursor.rowcount > 0
+    
+    def fail(self, lease: Lease, error: str) -> None:
+        """
+        Release a leased shard after an error.
+        
+        The shard goes back to pending unless it has used up its attempts.
+        
+        Args:
+            lease: The failed lease
+            error: Error message to record
+        """
+        state = self.FAILED if lease.attempts >= self.max_attempts else self.PENDING
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE shards SET state = ?, error = ?, worker_id = NULL, expires_at = NULL "
+                "WHERE shard_id = ? AND worker_id = ? AND state = ?",
+                (state, error, lease.shard_id, lease.worker_id, self.LEASED)
+            )
+    
+    def counts(self) -> Dict[str, int]:
+        """Get the number of shards in each state."""
+        counts = {state: 0 for state in (self.PENDING, self.LEASED, self.DONE, self.FAILED)}
+        scope, params = self._scope()
+        with self._connection() as conn:
+            for row in conn.execute(f"SELECT state, COUNT(*) AS n FROM shards WHERE {scope} GROUP BY state", params):
+                counts[row["state"]] = row["n"]
+        return counts
+    
+    def is_drained(self) -> bool:
+        """Check whether every shard is either done or failed."""
+        counts = self.counts()
+        return counts[self.PENDING] == 0 and counts[self.LEASED] == 0
+    
+    def results(self) -> Dict[str, str]:
+        """Get the result location of every completed shard."""
+        scope, params = self._scope()
+        with self._connection() as conn:
+            return {
+                row["shard_id"]: row["result"]
+                for row in conn.execute(
+                    f"SELECT shard_id, result FROM shards WHERE state = ? AND {scope}", (self.DONE, *params)
+                )
+            }
\ No newline at end of file
@@ -1,10 +1,17 @@
 import asyncio
 import json
+import sys
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 import openai
 from pathlib import Path
 
+# Run as a script (python examples/customer_support_bot.py), the repository
+# root isn't on the path; add it so the shared template registry imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.templates import Template, get_registry
+
 @dataclass
 class CustomerContext:
     user_id: str
@@ -14,29 +21,29 @@ class CustomerContext:
     system_info: Optional[Dict] = None
 
 class CustomerSupportBot:
-    def __init__(self, api_key: str, templates_path: str):
+    def __init__(self, api_key: str, templates_dir: str = "data/templates"):
         self.client = openai.AsyncOpenAI(api_key=api_key)
-        self.templates = self._load_templates(templates_path)
+        self.templates = get_registry(templates_dir)
         self.conversation_history = {}
-        
-    def _load_templates(self, path: str) -> Dict:
-        with open(path, 'r') as f:
-            return json.load(f)
+        # System prompts only depend on the template, so build each one once
+        self._system_prompts: Dict[str, str] = {}
     
-    def _get_template(self, issue_type: str) -> Dict:
-        for template in self.templates['templates']:
-            if template['id'] == issue_type:
-                return template
-        raise ValueError(f"No template found for issue type: {issue_type}")
+    def _get_template(self, issue_type: str) -> Template:
+        try:
+            return self.templates.get("customer_support", issue_type)
+        except KeyError:
+            raise ValueError(f"No template found for issue type: {issue_type}")
     
-    def _build_system_prompt(self, template: Dict) -> str:
-        return f"""You are an expert customer support agent. Follow these guidelines:
-        1. Use the template pattern: {template['structure']['pattern']}
-        2. Constraints: {', '.join(template['constraints'])}
+    def _build_system_prompt(self, template: Template) -> str:
+        if template.id not in self._system_prompts:
+            self._system_prompts[template.id] = f"""You are an expert customer support agent. Follow these guidelines:
+        1. Use the template pattern: {template.pattern}
+        2. Constraints: {', '.join(template.constraints)}
         3. Maintain a professional, empathetic tone
         4. Ask clarifying questions when needed
         5. Provide step-by-step solutions
         6. Verify understanding with the customer"""
+        return self._system_prompts[template.id]
     
     def _build_user_prompt(self, context: CustomerContext, user_message: str) -> str:
         template = self._get_template(context.issue_type)
@@ -81,7 +88,7 @@ async def main():
     api_key = "your-api-key"
     bot = CustomerSupportBot(
         api_key=api_key,
-        templates_path="reasoning_evals/data/templates/customer_support/scenarios.json"
+        templates_dir="data/templates"
     )
     
     # Example context for a technical issue
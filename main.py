@@ -1,61 +1,250 @@
 import argparse
 import asyncio
+import functools
+import glob
 import os
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional
 
-from tasks.stem import STEMTask
+from tasks.registry import TaskRegistry
 from evaluation.pipeline import EvaluationPipeline
-from evaluation.visualization import EvaluationVisualizer
+from evaluation.sharding import ShardCoordinator, run_worker
+from evaluation.visualization import EvaluationVisualizer, create_export_pool
 from utils.config import config
+from utils.metrics import metrics
+from utils.parsing import parse_stats
+from utils.profiling import profiler
+from utils.tracing import tracer
+
+# Built-in and entry-point tasks; modules are imported only when a task is created
+task_registry = TaskRegistry()
+
+def create_task(task_name: str, clients: Optional[Mapping[str, Any]] = None):
+    """Create a task from its name (also used by sharded worker processes)."""
+    return task_registry.create(task_name, config.get_task_config(task_name), clients=clients)
+
+def print_client_stats(stats: Dict[str, Any]) -> None:
+    """Print the shared client manager's per-provider counters."""
+    for provider, counts in stats["providers"].items():
+        # Caching thresholds differ by provider, so the hit ratio is reported per provider
+        cache = f", {counts['cache_hit_ratio']:.1%} prompt cache hits" if counts["prompt_tokens"] else ""
+        print(
+            f"{provider}: {counts['requests']} requests, {counts['errors']} errors, "
+            f"{counts['tokens']} tokens, peak {counts['peak_in_flight']} in flight, "
+            f"{counts['deduplicated']} deduplicated{cache}"
+        )
+    if stats["prompt_tokens"]:
+        print(
+            f"Prompt cache: {stats['cache_hit_ratio']:.1%} hit ratio, "
+            f"{stats['cached_tokens']} of {stats['prompt_tokens']} prompt tokens served from cache"
+        )
+
+def save_profile(output_dir: str) -> None:
+    """Export the recorded spans, print the per-stage latency breakdown and write the CPU/memory profiles."""
+    trace_path = os.path.join(output_dir, config.get("tracing.filename", "trace.json"))
+    tracer.export_chrome(trace_path)
+    print("\nLatency by stage (stages nest, so totals overlap):")
+    print(tracer.format_breakdown())
+    if tracer.dropped:
+        print(f"Trace truncated: {tracer.dropped} spans beyond tracing.max_events not exported")
+    print(f"Trace written to {trace_path} (open in chrome://tracing or Perfetto)")
+    report_path = profiler.stop()
+    if report_path:
+        print(f"Profile written to {report_path} (flame graph stacks in cpu.folded)")
+
+def merge_worker_profiles(worker_dir: str) -> None:
+    """Fold sharded workers' traces, stage histograms and CPU/memory profiles into this run's."""
+    for trace_path in sorted(glob.glob(os.path.join(worker_dir, "*.trace.json"))):
+        worker_id = os.path.basename(trace_path)[:-len(".trace.json")]
+        tracer.merge_chrome(trace_path, process_name=f"worker {worker_id}")
+        profiler.add_worker(
+            worker_id,
+            os.path.join(worker_dir, worker_id, config.get("profiling.dir", "profile"))
+        )
+
+def save_task_report(
+    results,
+    output_dir: str,
+    task_name: str,
+    export_pool: Optional[ProcessPoolExecutor] = None
+) -> None:
+    """Render visualizations and the summary report for a task."""
+    task_output_dir = os.path.join(output_dir, task_name)
+    os.makedirs(task_output_dir, exist_ok=True)
+    
+    visualizer = EvaluationVisualizer(results)
+    visualizer.save_visualizations(task_output_dir, export_pool=export_pool)
+    
+    print(f"Results saved to {task_output_dir}")
+
+async def run_sharded_evaluation(
+    task_names: List[str],
+    output_dir: str,
+    num_examples: Optional[int] = None,
+    num_workers: Optional[int] = None,
+    queue_path: Optional[str] = None,
+    samples: Optional[int] = None,
+    profile: bool = False
+) -> None:
+    """
+    Run evaluations by sharding the work plan across worker processes.
+    
+    Args:
+        task_names: List of task names to evaluate
+        output_dir: Directory to save results
+        num_examples: Optional number of examples to generate per task
+        num_workers: Number of local worker processes (default: CPU count)
+        queue_path: Path to the shared work queue database
+        samples: Samples per (model, example) (default: evaluation.samples)
+        profile: Whether to profile the run (trace, stage breakdown, CPU and memory),
+            coordinator and workers alike
+    """
+    pipeline = EvaluationPipeline()
+    metrics.watch_pipeline(pipeline)
+    os.makedirs(output_dir, exist_ok=True)
+    if profile:
+        profiler.start(output_dir)
+    
+    sharding_config = config.get("evaluation.sharding", {}) or {}
+    coordinator = ShardCoordinator(
+        pipeline=pipeline,
+        queue_path=queue_path or os.path.join(output_dir, "work_queue.sqlite"),
+        shard_dir=os.path.join(output_dir, "shards"),
+        shard_size=sharding_config.get("shard_size", 25),
+        lease_seconds=sharding_config.get("lease_seconds", 300),
+        max_attempts=sharding_config.get("max_attempts", 3),
+        journal_mode=sharding_config.get("journal_mode", "DELETE")
+    )
+    metrics.watch_shards(coordinator.queue)
+    metrics.watch_workers(coordinator.worker_dir)
+    print(f"Sharded run {coordinator.run_id} (remote workers: --worker --run-id {coordinator.run_id})")
+    
+    for task_name in task_names:
+        if task_name not in task_registry:
+            print(f"Warning: Task {task_name} not implemented, skipping")
+            continue
+        
+        task = create_task(task_name, pipeline.clients)
+        pipeline.bind_task(task)
+        n_examples = num_examples or task.config.get("num_examples", 10)
+        examples = await task.generate_examples(n_examples)
+        num_shards = coordinator.enqueue(
+            task,
+            examples,
+            samples=samples or config.get("evaluation.samples", 1)
+        )
+        print(f"Enqueued {num_shards} shards for {task_name}")
+    
+    # Grading happens in the workers; free the coordinator's pools and sandbox
+    pipeline.close()
+    
+    await asyncio.get_running_loop().run_in_executor(
+        None,
+        functools.partial(
+            coordinator.run_local_workers,
+            num_workers or os.cpu_count() or 1,
+            create_task,
+            max_idle_exits=sharding_config.get("max_idle_exits", 3),
+            profile=profile,
+            report_metrics=metrics.server is not None
+        )
+    )
+    if profile:
+        merge_worker_profiles(coordinator.worker_dir)
+    
+    export_pool = create_export_pool()
+    try:
+        for task_name, results in coordinator.merge().items():
+            pipeline._save_results(results, task_name)
+            save_task_report(results, output_dir, task_name, export_pool)
+    finally:
+        export_pool.shutdown(wait=True)
+    
+    await pipeline.aclose()
+    if profile:
+        save_profile(output_dir)
 
 async def run_evaluation(
     task_names: List[str],
     output_dir: str,
-    num_examples: Optional[int] = None
+    num_examples: Optional[int] = None,
+    mode: Optional[str] = None,
+    samples: Optional[int] = None,
+    profile: bool = False
 ) -> None:
     """
     Run evaluations for specified tasks.
     
+    All tasks run concurrently and share the pipeline's concurrency and
+    rate-limit budget. Reports are built in threads and their figures are
+    exported through one pool of image renderers shared by every task, so
+    one task's visualizations don't hold up the others.
+    
     Args:
         task_names: List of task names to evaluate
         output_dir: Directory to save results
         num_examples: Optional number of examples to generate per task
+        mode: "live" or "batch" (default: evaluation.mode)
+        samples: Samples per (model, example) (default: evaluation.samples)
+        profile: Whether to profile the run (trace, stage breakdown, CPU and memory)
     """
     pipeline = EvaluationPipeline()
+    metrics.watch_pipeline(pipeline)
     
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
+    if profile:
+        profiler.start(output_dir)
     
-    # Map task names to task classes
-    task_map = {
-        "stem": STEMTask
-    }
-    
+    implemented = []
     for task_name in task_names:
-        if task_name not in task_map:
+        if task_name not in task_registry:
             print(f"Warning: Task {task_name} not implemented, skipping")
             continue
-        
+        implemented.append(task_name)
+    
+    if not implemented:
+        profiler.stop()
+        return
+    
+    loop = asyncio.get_running_loop()
+    export_pool = create_export_pool()
+    
+    async def evaluate(task_name: str) -> None:
         print(f"\nEvaluating {task_name} task...")
         
-        # Initialize task
-        task_config = config.get_task_config(task_name)
-        task = task_map[task_name](task_config)
+        # Initialize task with the pipeline's clients
+        task = create_task(task_name, pipeline.clients)
         
         # Run evaluation
         results = await pipeline.evaluate_task(
             task=task,
-            num_examples=num_examples
+            num_examples=num_examples,
+            mode=mode,
+            samples=samples
         )
         
-        # Generate visualizations
-        task_output_dir = os.path.join(output_dir, task_name)
-        os.makedirs(task_output_dir, exist_ok=True)
-        
-        visualizer = EvaluationVisualizer(results)
-        visualizer.save_visualizations(task_output_dir)
-        
-        print(f"Results saved to {task_output_dir}")
+        # Generate visualizations off the event loop
+        await loop.run_in_executor(None, save_task_report, results, output_dir, task_name, export_pool)
+    
+    try:
+        outcomes = await asyncio.gather(
+            *(evaluate(task_name) for task_name in implemented),
+            return_exceptions=True
+        )
+    finally:
+        export_pool.shutdown(wait=True)
+        print_client_stats(pipeline.clients.stats())
+        await pipeline.aclose()
+        if profile:
+            save_profile(output_dir)
+    
+    for task_name, outcome in zip(implemented, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Error evaluating {task_name} task: {str(outcome)}")
+    
+    for name, counts in parse_stats.summary().items():
+        print(f"Parsed {name} responses: {counts} ({parse_stats.failure_rate(name):.1%} failed)")
 
 def main():
     parser = argparse.ArgumentParser(description="Run LLM reasoning evaluations")
@@ -79,13 +268,122 @@ def main():
         help="Number of examples to generate per task (overrides config)"
     )
     
+    parser.add_argument(
+        "--sharded",
+        action="store_true",
+        help="Shard the work plan across worker processes through a durable queue"
+    )
+    
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of local worker processes for --sharded (default: CPU count)"
+    )
+    
+    parser.add_argument(
+        "--queue-path",
+        help="Work queue database (default: <output-dir>/work_queue.sqlite)"
+    )
+    
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Only act as a worker for an existing sharded run's queue"
+    )
+    
+    parser.add_argument(
+        "--run-id",
+        help="With --worker, only work on this sharded run's shards (printed by the coordinator)"
+    )
+    
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Send model prompts through provider batch APIs (slower, cheaper; for large offline runs)"
+    )
+    
+    parser.add_argument(
+        "--samples",
+        type=int,
+        help="Samples per model and example; reports pass@k and majority-vote accuracy (overrides config)"
+    )
+    
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Trace every stage of the run, print a latency breakdown and write <output-dir>/trace.json and CPU/memory profiles to <output-dir>/profile"
+    )
+    
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve Prometheus metrics on this local port while the run is going (overrides config)"
+    )
+    
+    parser.add_argument(
+        "--list-tasks",
+        action="store_true",
+        help="List available tasks and exit"
+    )
+    
     args = parser.parse_args()
     
+    if args.list_tasks:
+        for task_name in task_registry.names():
+            print(task_name)
+        return
+    
+    profile = args.profile or config.get("tracing.enabled", False)
+    if profile:
+        tracer.enable(max_events=config.get("tracing.max_events"))
+    
+    metrics_port = args.metrics_port or config.get("metrics.port")
+    if metrics_port:
+        metrics.serve(metrics_port, host=config.get("metrics.host", "127.0.0.1"))
+    
+    if args.worker:
+        sharding_config = config.get("evaluation.sharding", {}) or {}
+        run_worker(
+            queue_path=args.queue_path or os.path.join(args.output_dir, "work_queue.sqlite"),
+            shard_dir=os.path.join(args.output_dir, "shards"),
+            task_factory=create_task,
+            lease_seconds=sharding_config.get("lease_seconds", 300),
+            max_attempts=sharding_config.get("max_attempts", 3),
+            journal_mode=sharding_config.get("journal_mode", "DELETE"),
+            run_id=args.run_id,
+            profile=profile,
+            # The coordinator only sees this worker's requests if it exports them
+            report_metrics=True
+        )
+        return
+    
+    batch = args.batch or config.get("evaluation.mode", "live") == "batch"
+    samples = args.samples or config.get("evaluation.samples", 1)
+    if batch and samples > 1:
+        parser.error("batch mode sends one request per example; it can't be combined with --samples or evaluation.samples above 1")
+    
+    if args.sharded:
+        if batch:
+            parser.error("--sharded evaluates live; it can't be combined with --batch or evaluation.mode: batch")
+        asyncio.run(run_sharded_evaluation(
+            task_names=args.tasks,
+            output_dir=args.output_dir,
+            num_examples=args.num_examples,
+            num_workers=args.workers,
+            queue_path=args.queue_path,
+            samples=args.samples,
+            profile=profile
+        ))
+        return
+    
     # Run evaluations
     asyncio.run(run_evaluation(
         task_names=args.tasks,
         output_dir=args.output_dir,
-        num_examples=args.num_examples
+        num_examples=args.num_examples,
+        mode="batch" if args.batch else None,
+        samples=args.samples,
+        profile=profile
     ))
 
 if __name__ == "__main__":
@@ -29,4 +29,12 @@ setup(
     python_requires=">=3.8",
     install_requires=requirements,
     include_package_data=True,
+    entry_points={
+        "reasoning_evals.tasks": [
+            "stem = reasoning_evals.tasks.stem:STEMTask",
+            "logical_puzzles = reasoning_evals.tasks.logical:LogicalPuzzlesTask",
+            "coding = reasoning_evals.tasks.coding:CodingTask",
+            "planning = reasoning_evals.tasks.planning:PlanningTask",
+        ],
+    },
 )
@@ -1,6 +1,11 @@
+import asyncio
 from abc import ABC, abstractmethod
+from concurrent.futures import Executor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from ..api.manager import get_client_manager
+from ..utils.answers import normalize_answer
 
 @dataclass
 class TaskExample:
@@ -21,19 +26,74 @@ class TaskResult:
     metrics: Dict[str, float]
     metadata: Optional[Dict[str, Any]] = None
 
+@dataclass(frozen=True)
+class ResourceProfile:
+    """
+    How a task's evaluation load should be scheduled.
+    
+    Attributes:
+        kind: "judge_heavy", "cpu_heavy" or "io_bound"
+        executor: Where blocking grading work runs: "inline", "thread",
+            "process" or "sandbox" (a CodeSandbox for untrusted code,
+            given to the task as `task.sandbox` instead)
+        concurrency: Executor workers (default: the pipeline's CPU share
+            for processes and sandboxes)
+    """
+    kind: str
+    executor: str = "inline"
+    concurrency: Optional[int] = None
+
+# Grading is dominated by LLM judge calls, which the pipeline's shared budget bounds
+JUDGE_HEAVY = ResourceProfile("judge_heavy")
+# Grading is local computation, spread over a process pool
+CPU_HEAVY = ResourceProfile("cpu_heavy", executor="process")
+# Grading does blocking I/O (files, subprocesses), run on threads
+IO_BOUND = ResourceProfile("io_bound", executor="thread")
+# Grading runs model-written code, in the pipeline's shared CodeSandbox
+SANDBOX = ResourceProfile("cpu_heavy", executor="sandbox")
+
 class BaseTask(ABC):
     """Abstract base class for defining evaluation tasks."""
     
-    def __init__(self, task_name: str, config: Dict[str, Any]):
+    resource_profile: ResourceProfile = JUDGE_HEAVY
+    
+    def __init__(
+        self,
+        task_name: str,
+        config: Dict[str, Any],
+        clients: Optional[Mapping[str, Any]] = None
+    ):
         """
         Initialize a task.
         
         Args:
             task_name: Name of the task
             config: Task configuration dictionary
+            clients: Model clients by provider, usually the pipeline's
+                ClientManager (default: the process-wide manager)
         """
         self.task_name = task_name
         self.config = config
+        self.clients = clients if clients is not None else get_client_manager()
+        # Set by the scheduler from the task's resource profile
+        self.executor: Optional[Executor] = None
+    
+    async def run_blocking(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run blocking grading work in the executor picked for this task.
+        
+        With a process executor, `fn` and its arguments must be picklable.
+        
+        Args:
+            fn: Function to call
+            *args: Positional arguments
+        
+        Returns:
+            The function's result
+        """
+        if self.executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
     
     @abstractmethod
     async def generate_examples(self, num_examples: int) -> List[TaskExample]:
@@ -42,7 +102,7 @@ class BaseTask(ABC):
         
         Args:
             num_examples: Number of examples to generate
-            
+        
         Returns:
             List of TaskExample objects
         """
@@ -62,7 +122,7 @@ class BaseTask(ABC):
             example: The task example
             model_response: The model's response
             model_name: Name of the model
-            
+        
         Returns:
             TaskResult object containing evaluation metrics
         """
@@ -75,7 +135,7 @@ class BaseTask(ABC):
         
         Args:
             example: The task example
-            
+        
         Returns:
             Formatted prompt string
         """
@@ -88,12 +148,30 @@ class BaseTask(ABC):
         
         Args:
             example: The task example to validate
-            
+        
         Returns:
             Tuple of (is_valid, error_message)
         """
         pass
     
+    def normalize_answer(self, example: TaskExample, response: str) -> Optional[str]:
+        """
+        Canonical form of a response's answer, used to vote across samples.
+        
+        Responses with the same normalized answer are graded once in
+        multi-sample evaluation, so tasks whose grading depends on more
+        than the final answer line should override this.
+        
+        Args:
+            example: The task example
+            response: The model's response
+        
+        Returns:
+            Normalized answer, or None if it can't be read (such responses
+            are graded individually)
+        """
+        return normalize_answer(response)
+    
     def get_metrics(self) -> List[str]:
         """
         Get the list of metrics this task evaluates.
@@ -0,0 +1,344 @@
+import asyncio
+import math
+import random
+import re
+import uuid
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from ..utils.parsing import extract_json
+from ..utils.prompts import PromptLayout
+from ..utils.templates import Template, get_registry
+from .base import SANDBOX, BaseTask, TaskExample, TaskResult
+from .example_pool import ExamplePool
+from .sandbox import CodeSandbox, ExecutionResult
+
+# Template used for each configured category
+CATEGORY_TEMPLATES = {
+    "algorithms": "algorithm_implementation",
+    "data_structures": "data_structure_implementation",
+    "debugging": "debugging_task",
+    "data_processing": "data_processing"
+}
+
+SPEC_FIELDS = {
+    "problem": str,
+    "entry_point": str,
+    "reference_solution": str,
+    "tests": list
+}
+
+# Fixed instructions lead every prompt so providers can cache them across problems
+SOLVE_PROMPT = PromptLayout(
+    """
+    Solve the Python programming problem given below.
+    
+    Requirements:
+    1. Define the entry point named after the problem exactly as specified
+    2. Use only the Python standard library
+    3. Handle edge cases and aim for an efficient solution
+    
+    Return your complete solution in a single ```python code block.
+    """,
+    """
+    Problem:
+    {problem}
+    
+    Entry point: `{entry_point}`
+    """
+)
+
+_CODE_BLOCK_RE = re.compile(r"```(?:python|py|Python)?[ \t]*\n(.*?)```", re.DOTALL)
+
+def extract_code(response: str, entry_point: str) -> str:
+    """
+    Pull the solution code out of a model response.
+    
+    Prefers the last fenced code block that defines `entry_point`, then the
+    last fenced block, then the whole response.
+    
+    Args:
+        response: Model response text
+        entry_point: Name of the function or class the solution must define
+    
+    Returns:
+        Python source code
+    """
+    blocks = _CODE_BLOCK_RE.findall(response)
+    definition = re.compile(rf"^\s*(?:async\s+)?(?:def|class)\s+{re.escape(entry_point)}\b", re.MULTILINE)
+    for block in reversed(blocks):
+        if definition.search(block):
+            return block
+    return blocks[-1] if blocks else response
+
+def growth_exponent(runtimes: List[Tuple[int, float]]) -> Optional[float]:
+    """
+    Least-squares slope of log(runtime) against log(n).
+    
+    Args:
+        runtimes: (input size, seconds) pairs
+    
+    Returns:
+        Empirical exponent (about 1 for linear, 2 for quadratic), or None
+    """
+    points = [(math.log(n), math.log(t)) for n, t in runtimes if n > 0 and t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+class CodingTask(BaseTask):
+    """
+    Implementation of the coding task.
+    
+    Problems come with hidden tests and a benchmark whose reference solution
+    has been run in the sandbox, and responses are graded by executing them
+    locally rather than by an LLM judge.
+    """
+    
+    # Submissions run in the pipeline's sandbox, sized for the whole process
+    resource_profile = SANDBOX
+    
+    def __init__(self, config: Dict[str, Any], clients: Optional[Mapping[str, Any]] = None):
+        super().__init__("coding", config, clients)
+        self.categories = config.get("categories", [])
+        self.difficulty_levels = config.get("difficulty_levels", [])
+        self.generator_model = config.get("generator_model", "gpt-4")
+        self.openai_client = self.clients["openai"]
+        self.rng = random.Random(config.get("seed"))
+        
+        registry = get_registry(config.get("templates_dir", "data/templates"))
+        self.templates: Dict[str, List[Template]] = {}
+        for category in self.categories:
+            template_id = CATEGORY_TEMPLATES.get(category, category)
+            try:
+                self.templates[category] = [registry.get("coding", template_id)]
+            except KeyError:
+                print(f"Warning: No templates found for category {category}")
+                self.templates[category] = []
+        
+        # Set by the pipeline's bind_task; see _get_sandbox
+        self.sandbox: Optional[CodeSandbox] = None
+        
+        # Persistent pool of previously generated (and verified) problems
+        pool_config = config.get("example_pool", {})
+        self.example_pool = ExamplePool(
+            task_name=self.task_name,
+            pool_dir=pool_config.get("dir", "data/pools"),
+            near_duplicate_threshold=pool_config.get("near_duplicate_threshold", 0.8),
+            seed=config.get("seed")
+        ) if pool_config.get("enabled", True) else None
+    
+    def _get_sandbox(self) -> CodeSandbox:
+        """The shared sandbox, or a private one when the task is used without a pipeline."""
+        if self.sandbox is None:
+            self.sandbox = CodeSandbox.from_config(self.config.get("sandbox", {}))
+        return self.sandbox
+    
+    async def generate_examples(self, num_examples: int) -> List[TaskExample]:
+        """
+        Generate a stratified sample of verified coding problems.
+        
+        Cells are filled from the example pool first; the shortfall is
+        generated concurrently across cells, and a problem is kept only if
+        its reference solution passes its own hidden tests in the sandbox.
+        """
+        categories = [c for c in self.categories if self.templates.get(c)]
+        if not categories:
+            print("Warning: No templates available for any coding category")
+            return []
+        
+        if self.example_pool is None:
+            plan = {}
+            cells = [(c, d) for c in categories for d in self.difficulty_levels]
+            for i in range(num_examples):
+                cell = cells[i % len(cells)]
+                plan[cell] = plan.get(cell, 0) + 1
+        else:
+            plan = self.example_pool.plan_cells(num_examples, categories, self.difficulty_levels)
+        
+        async def fill_cell(category: str, difficulty: str, count: int) -> List[TaskExample]:
+            if self.example_pool is not None:
+                cell_examples = self.example_pool.sample(category, difficulty, count)
+            else:
+                cell_examples = []
+            
+            failed_attempts = 0
+            while len(cell_examples) < count and failed_attempts < count * 2:
+                template = self.rng.choice(self.templates[category])
+                try:
+                    example = await self._generate_example(category, difficulty, template)
+                except ValueError as e:
+                    failed_attempts += 1
+                    print(f"Skipping invalid example: {str(e)}")
+                    continue
+                
+                # Validate example
+                is_valid, error = self.validate_example(example)
+                if not is_valid:
+                    failed_attempts += 1
+                    print(f"Skipping invalid example: {error}")
+                    continue
+                
+                if self.example_pool is not None and not self.example_pool.add(example):
+                    failed_attempts += 1
+                    print(f"Skipping duplicate {difficulty} {category} example")
+                    continue
+                
+                cell_examples.append(example)
+            return cell_examples
+        
+        cells = await asyncio.gather(*(
+            fill_cell(category, difficulty, count)
+            for (category, difficulty), count in plan.items()
+        ))
+        examples = [example for cell_examples in cells for example in cell_examples]
+        
+        self.rng.shuffle(examples)
+        return examples
+    
+    async def _generate_example(
+        self,
+        category: str,
+        difficulty: str,
+        template: Template
+    ) -> TaskExample:
+        """Generate a coding problem and verify its reference solution."""
+        prompt = f"""
+        Create a {difficulty} Python coding problem based on this template:
+        {template.structure_json}
+        
+        Return a JSON object with:
+        - problem: The problem statement, including the exact signature of the function or class to implement
+        - entry_point: Name of the function or class the solution must define
+        - reference_solution: A correct, efficient Python solution
+        - tests: 8-12 hidden tests covering normal and edge cases, each an object with
+          "call" (a Python expression using the entry point) and "expected" (the JSON value it returns)
+        - benchmark: An object with "call" (a Python expression using the entry point and an integer n
+          that builds an input of size n and solves it) and "sizes" (3-4 increasing values of n for which
+          the reference solution takes roughly 1-100 ms)
+        
+        Tests and benchmark must be self-contained: no files, network access or randomness.
+        """
+        
+        response = await self.openai_client.generate(
+            prompt=prompt,
+            model=self.generator_model,
+            max_tokens=2000,
+            json_mode=True
+        )
+        spec = extract_json(response.text, required=SPEC_FIELDS, name="coding_problem")
+        
+        tests = [test for test in spec["tests"] if isinstance(test, dict) and "call" in test]
+        benchmark = spec.get("benchmark")
+        if not (isinstance(benchmark, dict) and benchmark.get("call") and benchmark.get("sizes")):
+            benchmark = None
+        
+        reference = await self._get_sandbox().run(spec["reference_solution"], tests, benchmark)
+        if not reference.all_passed:
+            raise ValueError(
+                f"Reference solution failed its own tests: "
+                f"{reference.error or '; '.join(reference.failures[:2])}"
+            )
+        
+        return TaskExample(
+            id=str(uuid.uuid4()),
+            input=spec["problem"].strip(),
+            expected_output=spec["reference_solution"],
+            metadata={
+                "category": category,
+                "difficulty": difficulty,
+                "template_id": template.id,
+                "entry_point": spec["entry_point"],
+                "tests": tests,
+                "benchmark": benchmark if reference.runtimes else None,
+                "reference_runtimes": sorted(reference.runtimes.items())
+            }
+        )
+    
+    async def evaluate_response(
+        self,
+        example: TaskExample,
+        model_response: str,
+        model_name: str
+    ) -> TaskResult:
+        """Grade a solution by running it against the hidden tests in the sandbox."""
+        metadata = example.metadata or {}
+        code = extract_code(model_response, metadata.get("entry_point", ""))
+        result = await self._get_sandbox().run(code, metadata.get("tests", []), metadata.get("benchmark"))
+        
+        metrics = {"functional_correctness": result.pass_rate}
+        if result.coverage is not None:
+            metrics["test_coverage"] = result.coverage
+        efficiency, exponent = self._efficiency(result, metadata.get("reference_runtimes", []))
+        if efficiency is not None:
+            metrics["efficiency"] = efficiency
+        
+        return TaskResult(
+            example_id=example.id,
+            model_name=model_name,
+            model_output=model_response,
+            is_correct=result.all_passed,
+            # Graded by execution rather than a judge, so quality is the pass rate
+            reasoning_quality=result.pass_rate,
+            metrics=metrics,
+            metadata={
+                "tests_passed": result.passed,
+                "tests_total": result.total,
+                "failures": result.failures,
+                "error": result.error,
+                "timed_out": result.timed_out,
+                "runtime_exponent": exponent
+            }
+        )
+    
+    @staticmethod
+    def _efficiency(
+        result: ExecutionResult,
+        reference_runtimes: List[Tuple[int, float]]
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Score runtime against the reference solution.
+        
+        Returns:
+            Tuple of (reference / candidate runtime at the largest shared
+            input size capped at 1, empirical growth exponent)
+        """
+        if not result.runtimes or not reference_runtimes:
+            return None, None
+        reference = {int(n): t for n, t in reference_runtimes}
+        shared = sorted(set(reference) & set(result.runtimes))
+        if not shared:
+            return None, None
+        largest = shared[-1]
+        efficiency = min(1.0, reference[largest] / max(result.runtimes[largest], 1e-9))
+        return efficiency, growth_exponent(sorted(result.runtimes.items()))
+    
+    def normalize_answer(self, example: TaskExample, response: str) -> Optional[str]:
+        """The extracted code with blank lines and trailing whitespace removed."""
+        code = extract_code(response, (example.metadata or {}).get("entry_point", ""))
+        lines = [line.rstrip() for line in code.splitlines() if line.strip()]
+        return "\n".join(lines) or None
+    
+    def get_prompt(self, example: TaskExample) -> str:
+        """Generate the prompt for a coding problem."""
+        entry_point = (example.metadata or {}).get("entry_point", "")
+        return SOLVE_PROMPT.render(problem=example.input, entry_point=entry_point)
+    
+    def validate_example(self, example: TaskExample) -> Tuple[bool, Optional[str]]:
+        """Validate a coding problem example."""
+        metadata = example.metadata or {}
+        
+        if not example.input.strip():
+            return False, "Empty problem statement"
+        
+        if not metadata.get("entry_point"):
+            return False, "Missing entry point"
+        
+        if len(metadata.get("tests", [])) < 3:
+            return False, "Too few hidden tests"
+        
+        return True, None
\ No newline at end of file
@@ -0,0 +1,221 @@
+import random
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+Assignment = Dict[str, Any]
+
+def _claim(kind: str, values: Sequence[bool]) -> bool:
+    """Truth value of a truth-teller/liar claim about the given people."""
+    if kind == "is_truthful":
+        return values[0]
+    if kind == "is_liar":
+        return not values[0]
+    if kind == "both_truthful":
+        return values[0] and values[1]
+    if kind == "exactly_one_liar":
+        return values[0] != values[1]
+    if kind == "same_type":
+        return values[0] == values[1]
+    if kind == "at_least_one_liar":
+        return not all(values)
+    raise ValueError(f"Unknown claim: {kind}")
+
+# Predicates over the values of a constraint's variables, followed by its params
+PREDICATES: Dict[str, Callable[..., bool]] = {
+    "equals": lambda x, k: x == k,
+    "not_equals": lambda x, k: x != k,
+    "not_in": lambda x, ks: x not in ks,
+    "at_end": lambda x, n: x in (0, n - 1),
+    "not_at_end": lambda x, n: x not in (0, n - 1),
+    "before": lambda x, y: x < y,
+    "immediately_before": lambda x, y: y == x + 1,
+    "not_immediately_before": lambda x, y: y != x + 1,
+    "adjacent": lambda x, y: abs(x - y) == 1,
+    "not_adjacent": lambda x, y: abs(x - y) != 1,
+    # A speaker's statement is true exactly when the speaker is truthful
+    "statement": lambda speaker, *rest: speaker == _claim(rest[-1], rest[:-1])
+}
+
+@dataclass
+class Constraint:
+    """
+    A constraint over puzzle variables, stored as plain data.
+    
+    Attributes:
+        kind: Key into PREDICATES
+        variables: Variables whose values are passed to the predicate
+        params: Extra predicate arguments (positions, claim kinds, ...)
+    """
+    kind: str
+    variables: List[str]
+    params: List[Any] = field(default_factory=list)
+    
+    def is_satisfied(self, assignment: Assignment) -> bool:
+        """Whether the constraint holds; False if any variable is unassigned."""
+        if any(v not in assignment for v in self.variables):
+            return False
+        return PREDICATES[self.kind](*(assignment[v] for v in self.variables), *self.params)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Constraint":
+        return cls(kind=data["kind"], variables=list(data["variables"]), params=list(data.get("params", [])))
+
+class CSPSolver:
+    """
+    Backtracking solver for small finite-domain puzzles.
+    
+    Variables are chosen by minimum remaining values, and every assignment
+    is followed by forward checking: values that would violate the
+    all-different rule or a constraint with a single unassigned variable
+    are pruned from the remaining domains before recursing.
+    """
+    
+    def __init__(
+        self,
+        variables: Sequence[str],
+        domain: Sequence[Any],
+        constraints: Sequence[Constraint],
+        all_different: bool = False
+    ):
+        """
+        Initialize the solver.
+        
+        Args:
+            variables: Variable names
+            domain: Values every variable can take
+            constraints: Constraints to satisfy
+            all_different: Whether variables must take distinct values
+        """
+        self.variables = list(variables)
+        self.domain = list(domain)
+        self.constraints = list(constraints)
+        self.all_different = all_different
+        self._by_variable: Dict[str, List[Constraint]] = {v: [] for v in self.variables}
+        for constraint in self.constraints:
+            for v in set(constraint.variables):
+                self._by_variable[v].append(constraint)
+    
+    def solve(self, limit: Optional[int] = None) -> List[Assignment]:
+        """
+        Find solutions.
+        
+        Args:
+            limit: Stop after this many solutions (2 is enough to test uniqueness)
+        
+        Returns:
+            List of solutions
+        """
+        solutions: List[Assignment] = []
+        domains = {v: list(self.domain) for v in self.variables}
+        # Constraints on a single variable only need checking once
+        for v in self.variables:
+            for constraint in self._by_variable[v]:
+                if set(constraint.variables) == {v}:
+                    domains[v] = [x for x in domains[v] if constraint.is_satisfied({v: x})]
+        self._search({}, domains, solutions, limit)
+        return solutions
+    
+    def count_solutions(self, limit: Optional[int] = None) -> int:
+        return len(self.solve(limit))
+    
+    def _search(
+        self,
+        assignment: Assignment,
+        domains: Dict[str, List[Any]],
+        solutions: List[Assignment],
+        limit: Optional[int]
+    ) -> bool:
+        """Depth-first search; returns True once `limit` solutions are found."""
+        unassigned = [v for v in self.variables if v not in assignment]
+        if not unassigned:
+            solutions.append(dict(assignment))
+            return limit is not None and len(solutions) >= limit
+        
+        variable = min(unassigned, key=lambda v: len(domains[v]))
+        for value in domains[variable]:
+            assignment[variable] = value
+            pruned = self._forward_check(variable, value, assignment, domains)
+            if pruned is not None and self._search(assignment, pruned, solutions, limit):
+                return True
+            del assignment[variable]
+        return False
+    
+    def _forward_check(
+        self,
+        variable: str,
+        value: Any,
+        assignment: Assignment,
+        domains: Dict[str, List[Any]]
+    ) -> Optional[Dict[str, List[Any]]]:
+        """Prune remaining domains after an assignment; None if one becomes empty."""
+        pruned = dict(domains)
+        pruned[variable] = [value]
+        if self.all_different:
+            for other in self.variables:
+                if other not in assignment:
+                    pruned[other] = [x for x in pruned[other] if x != value]
+        
+        for constraint in self._by_variable[variable]:
+            open_variables = {v for v in constraint.variables if v not in assignment}
+            if not open_variables:
+                if not constraint.is_satisfied(assignment):
+                    return None
+            elif len(open_variables) == 1:
+                other = open_variables.pop()
+                pruned[other] = [
+                    x for x in pruned[other]
+                    if constraint.is_satisfied({**assignment, other: x})
+                ]
+        
+        if any(not pruned[v] for v in self.variables if v not in assignment):
+            return None
+        return pruned
+
+def build_unique_puzzle(
+    variables: Sequence[str],
+    domain: Sequence[Any],
+    candidates: Sequence[Constraint],
+    rng: random.Random,
+    all_different: bool = False,
+    base_constraints: Sequence[Constraint] = ()
+) -> Optional[List[Constraint]]:
+    """
+    Pick constraints until exactly one assignment satisfies them.
+    
+    Every candidate should hold under the intended solution. Candidates are
+    added in random order until the solution is unique, then each added
+    constraint is dropped again if uniqueness survives without it, so the
+    puzzle has no redundant clues.
+    
+    Args:
+        variables: Variable names
+        domain: Values every variable can take
+        candidates: Constraints consistent with the intended solution
+        rng: Random source
+        all_different: Whether variables must take distinct values
+        base_constraints: Constraints that are always part of the puzzle
+    
+    Returns:
+        The chosen constraints (including base constraints), or None if the
+        candidates can't pin down a unique solution
+    """
+    def unique(constraints: Sequence[Constraint]) -> bool:
+        return CSPSolver(variables, domain, constraints, all_different).count_solutions(limit=2) == 1
+    
+    pool = list(candidates)
+    rng.shuffle(pool)
+    chosen: List[Constraint] = []
+    while not unique([*base_constraints, *chosen]):
+        if not pool:
+            return None
+        chosen.append(pool.pop())
+    
+    for constraint in list(chosen):
+        remaining = [c for c in chosen if c is not constraint]
+        if unique([*base_constraints, *remaining]):
+            chosen = remaining
+    
+    return [*base_constraints, *chosen]
\ No newline at end of file
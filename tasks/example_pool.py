@@ -0,0 +1,350 @@
+import hashlib
+import json
+import os
+import random
+import re
+from collections import defaultdict
+from dataclasses import asdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .base import TaskExample
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_TOKEN_RE = re.compile(r"\w+")
+
+Cell = Tuple[str, str]
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so formatting noise doesn't change hashes."""
+    return " ".join(text.lower().split())
+
+def content_hash(example: TaskExample) -> str:
+    """
+    Compute a stable content hash for an example.
+    
+    Args:
+        example: The task example
+    
+    Returns:
+        Hex digest over the normalized problem text and expected answer
+    """
+    payload = normalize_text(example.input) + "\x1f" + normalize_text(example.expected_output)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class MinHasher:
+    """MinHash signatures over word shingles for near-duplicate detection."""
+    
+    def __init__(self, num_perm: int = 64, shingle_size: int = 2, seed: int = 1):
+        """
+        Initialize the hasher.
+        
+        Args:
+            num_perm: Number of hash permutations in a signature
+            shingle_size: Number of consecutive words per shingle
+            seed: Seed for the permutation coefficients
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._coefficients = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+    
+    def _shingles(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        if len(tokens) <= self.shingle_size:
+            return [" ".join(tokens)]
+        return [
+            " ".join(tokens[i:i + self.shingle_size])
+            for i in range(len(tokens) - self.shingle_size + 1)
+        ]
+    
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """Compute the MinHash signature of a text."""
+        hashes = {
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+            for s in self._shingles(text)
+        }
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self._coefficients
+        )
+    
+    @staticmethod
+    def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+        """Estimate the Jaccard similarity of two signatures."""
+        matches = sum(1 for a, b in zip(sig_a, sig_b) if a == b)
+        return matches / len(sig_a) if sig_a else 0.0
+
+class NearDuplicateIndex:
+    """MinHash signatures with LSH banding for finding near-duplicate texts."""
+    
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, num_bands: int = 16):
+        """
+        Initialize the index.
+        
+        Args:
+            threshold: Estimated Jaccard similarity above which two texts
+                are considered duplicates
+            num_perm: Number of MinHash permutations
+            num_bands: Number of LSH bands (must divide num_perm)
+        """
+        if num_perm % num_bands:
+            raise ValueError("num_bands must divide num_perm")
+        
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.num_bands = num_bands
+        self.rows_per_band = num_perm // num_bands
+        self.signatures: Dict[str, Tuple[int, ...]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = defaultdict(list)
+    
+    def __len__(self) -> int:
+        return len(self.signatures)
+    
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        r = self.rows_per_band
+        return [(band, signature[band * r:(band + 1) * r]) for band in range(self.num_bands)]
+    
+    def add(self, key: str, text: str, signature: Optional[Tuple[int, ...]] = None) -> Tuple[int, ...]:
+        """
+        Index a text under a key.
+        
+        Args:
+            key: Identifier returned by `find` for this text
+            text: Text to index
+            signature: Precomputed signature, if available
+            
+        Returns:
+            The text's MinHash signature
+        """
+        if signature is None or len(signature) != self.hasher.num_perm:
+            signature = self.hasher.signature(text)
+        if key not in self.signatures:
+            self.signatures[key] = signature
+            for band_key in self._band_keys(signature):
+                self._buckets[band_key].append(key)
+        return signature
+    
+    def find(self, text: str) -> Optional[str]:
+        """
+        Find an indexed text that is a near-duplicate of `text`.
+        
+        Args:
+            text: Text to check
+            
+        Returns:
+            Key of the matching text, or None
+        """
+        signature = self.hasher.signature(text)
+        seen = set()
+        for band_key in self._band_keys(signature):
+            for candidate in self._buckets.get(band_key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if self.hasher.similarity(signature, self.signatures[candidate]) >= self.threshold:
+                    return candidate
+        return None
+
+class ExamplePool:
+    """
+    Persistent, content-hashed pool of generated examples for a task.
+    
+    Examples are appended to a JSONL file so every generated problem is paid
+    for once and reused by later runs. The pool is indexed by
+    (category, difficulty, template_id) for stratified sampling, and uses
+    MinHash with LSH banding to reject near-duplicate problems.
+    """
+    
+    def __init__(
+        self,
+        task_name: str,
+        pool_dir: str = "data/pools",
+        near_duplicate_threshold: float = 0.8,
+        num_perm: int = 64,
+        num_bands: int = 16,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize the pool, loading any examples already on disk.
+        
+        Args:
+            task_name: Name of the task the pool belongs to
+            pool_dir: Directory holding pool files
+            near_duplicate_threshold: Estimated Jaccard similarity above which
+                two problems are considered duplicates
+            num_perm: Number of MinHash permutations
+            num_bands: Number of LSH bands (must divide num_perm)
+            seed: Optional seed for sampling
+        """
+        self.task_name = task_name
+        self.path = os.path.join(pool_dir, f"{task_name}.jsonl")
+        self.near_duplicates = NearDuplicateIndex(
+            threshold=near_duplicate_threshold,
+            num_perm=num_perm,
+            num_bands=num_bands
+        )
+        self.rng = random.Random(seed)
+        
+        self.examples: Dict[str, TaskExample] = {}
+        self.index: Dict[Tuple[str, str, Optional[str]], List[str]] = defaultdict(list)
+        self.duplicates_rejected = 0
+        
+        self._load()
+    
+    def __len__(self) -> int:
+        return len(self.examples)
+    
+    def _load(self) -> None:
+        """Load pooled examples from disk."""
+        if not os.path.exists(self.path):
+            return
+        
+        with open(self.path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    example = TaskExample(**record["example"])
+                    signature = tuple(record["signature"])
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"Warning: Skipping corrupt pool record in {self.path}: {str(e)}")
+                    continue
+                self._insert(record["hash"], example, signature)
+    
+    def _insert(
+        self,
+        key: str,
+        example: TaskExample,
+        signature: Optional[Tuple[int, ...]] = None
+    ) -> Tuple[int, ...]:
+        signature = self.near_duplicates.add(key, example.input, signature)
+        if key in self.examples:
+            return signature
+        metadata = example.metadata or {}
+        self.examples[key] = example
+        self.index[(
+            metadata.get("category"),
+            metadata.get("difficulty"),
+            metadata.get("template_id")
+        )].append(key)
+        return signature
+    
+    def find_near_duplicate(self, text: str) -> Optional[str]:
+        """
+        Find a pooled example whose problem text is a near-duplicate.
+        
+        Args:
+            text: Problem text to check
+        
+        Returns:
+            Hash of the matching example, or None
+        """
+        return self.near_duplicates.find(text)
+    
+    def add(self, example: TaskExample) -> bool:
+        """
+        Add an example to the pool and persist it.
+        
+        Args:
+            example: The example to add
+        
+        Returns:
+            True if the example was added, False if it duplicates a pooled example
+        """
+        key = content_hash(example)
+        if key in self.examples or self.find_near_duplicate(example.input):
+            self.duplicates_rejected += 1
+            return False
+        
+        signature = self._insert(key, example)
+        
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps({
+                "hash": key,
+                "signature": list(signature),
+                "example": asdict(example)
+            }) + "\n")
+        return True
+    
+    def count(self, category: str, difficulty: str, template_id: Optional[str] = None) -> int:
+        """Count pooled examples in a cell, optionally for a single template."""
+        if template_id is not None:
+            return len(self.index.get((category, difficulty, template_id), ()))
+        return sum(
+            len(keys) for (c, d, _), keys in self.index.items()
+            if c == category and d == difficulty
+        )
+    
+    def plan_cells(
+        self,
+        num_examples: int,
+        categories: Sequence[str],
+        difficulties: Sequence[str]
+    ) -> Dict[Cell, int]:
+        """
+        Split a sample size evenly across (category, difficulty) cells.
+        
+        Cell sizes differ by at most one; the cells receiving the remainder
+        are chosen at random so repeated small runs stay balanced overall.
+        
+        Args:
+            num_examples: Total number of examples wanted
+            categories: Categories to stratify over
+            difficulties: Difficulty levels to stratify over
+        
+        Returns:
+            Mapping of (category, difficulty) to the number of examples
+        """
+        cells = [(c, d) for c in categories for d in difficulties]
+        if not cells:
+            return {}
+        
+        base, remainder = divmod(num_examples, len(cells))
+        plan = {cell: base for cell in cells}
+        for cell in self.rng.sample(cells, remainder):
+            plan[cell] += 1
+        return plan
+    
+    def sample(
+        self,
+        category: str,
+        difficulty: str,
+        count: int,
+        exclude: Optional[set] = None
+    ) -> List[TaskExample]:
+        """
+        Draw up to `count` pooled examples from a cell, balanced across templates.
+        
+        Args:
+            category: Problem category
+            difficulty: Difficulty level
+            count: Number of examples wanted
+            exclude: Optional set of example IDs to skip
+        
+        Returns:
+            List of pooled examples (may be shorter than `count`)
+        """
+        exclude = exclude or set()
+        per_template = []
+        for (c, d, _), keys in sorted(self.index.items(), key=lambda item: str(item[0])):
+            if c != category or d != difficulty:
+                continue
+            available = [k for k in keys if self.examples[k].id not in exclude]
+            self.rng.shuffle(available)
+            if available:
+                per_template.append(available)
+        
+        selected: List[TaskExample] = []
+        while len(selected) < count and per_template:
+            for keys in list(per_template):
+                if len(selected) >= count:
+                    break
+                selected.append(self.examples[keys.pop()])
+                if not keys:
+                    per_template.remove(keys)
+        return selected
\ No newline at end of file
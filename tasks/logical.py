@@ -0,0 +1,531 @@
+import itertools
+import json
+import random
+import re
+import uuid
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ..utils.prompts import PromptLayout
+from ..utils.templates import Template, get_registry
+from .base import CPU_HEAVY, BaseTask, TaskExample, TaskResult
+from .csp import Assignment, Constraint, CSPSolver, build_unique_puzzle
+
+# Puzzle size range per difficulty
+PUZZLE_SIZES = {
+    "easy": (3, 4),
+    "medium": (4, 5),
+    "hard": (5, 6)
+}
+
+PEOPLE = ["Alice", "Bob", "Carol", "David", "Emma", "Frank", "Grace", "Henry"]
+COLLEAGUES = ["Avery", "Blake", "Casey", "Drew", "Emery", "Finley"]
+SPEAKERS = ["Uma", "Victor", "Wendy", "Xavier", "Yara", "Zane"]
+DEPARTMENTS = ["Customer Service", "Engineering", "Finance", "HR", "IT", "Legal", "Marketing", "Sales"]
+ORDINALS = ["first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth"]
+
+# Constraint kinds each ordering puzzle draws its clues from
+ORDERING_KINDS = {
+    "seating_arrangement": [
+        "equals", "not_equals", "at_end", "not_at_end",
+        "before", "immediately_before", "adjacent", "not_adjacent"
+    ],
+    "department_assignment": ["equals", "not_equals", "not_in", "before", "immediately_before"],
+    "scheduling_puzzle": ["equals", "not_equals", "before", "immediately_before", "not_immediately_before"]
+}
+
+CLUE_TEXTS = {
+    "seating_arrangement": {
+        "equals": "{x} sits in {value} from the left",
+        "not_equals": "{x} does not sit in {value} from the left",
+        "at_end": "{x} sits at one of the ends",
+        "not_at_end": "{x} cannot sit at an end",
+        "before": "{x} sits somewhere to the left of {y}",
+        "immediately_before": "{x} sits immediately to the left of {y}",
+        "adjacent": "{x} sits next to {y}",
+        "not_adjacent": "{x} is not adjacent to {y}"
+    },
+    "department_assignment": {
+        "equals": "{x} is in {value}",
+        "not_equals": "{x} is not in {value}",
+        "not_in": "{x} is not in {values}",
+        "before": "{x}'s department comes before {y}'s in alphabetical order",
+        "immediately_before": "{y} works in the department immediately following {x}'s in alphabetical order"
+    },
+    "scheduling_puzzle": {
+        "equals": "{x} must be the {value} {event}",
+        "not_equals": "{x} cannot be the {value} {event}",
+        "before": "{x} must occur before {y}",
+        "immediately_before": "{y} must immediately follow {x}",
+        "not_immediately_before": "{y} cannot immediately follow {x}"
+    }
+}
+
+# Claims about other people; claims that are linear in their subjects
+# (is_truthful, is_liar, same_type, exactly_one_liar) are symmetric under
+# flipping everyone, so a unique solution needs at least one of the others
+CLAIM_TEXTS = {
+    "is_truthful": "{a} is telling the truth.",
+    "is_liar": "{a} is lying.",
+    "same_type": "{a} and {b} are either both truth-tellers or both liars.",
+    "exactly_one_liar": "Exactly one of {a} and {b} is lying.",
+    "both_truthful": "{a} and {b} are both telling the truth.",
+    "at_least_one_liar": "At least one of {a} and {b} is lying."
+}
+
+CLAIMS = {
+    "easy": ["is_truthful", "is_liar", "both_truthful", "at_least_one_liar"],
+    "medium": ["is_truthful", "is_liar", "same_type", "both_truthful", "at_least_one_liar"],
+    "hard": list(CLAIM_TEXTS)
+}
+
+ANSWER_FORMATS = {
+    "seating_arrangement": "Answer: <names from left to right, separated by commas>",
+    "department_assignment": "Answer: <name>: <department>; <name>: <department>; ...",
+    "truth_teller_liar": "Answer: Truth-tellers: <names separated by commas, or none>",
+    "scheduling_puzzle": "Answer: <events in order, separated by commas>"
+}
+
+# Fixed instructions lead every prompt so providers can cache them across puzzles
+SOLVE_INSTRUCTIONS = """
+    Solve the logic puzzle given below.
+    
+    Reason step by step, then give your final answer on the last line in this format:
+    <answer format>
+    """
+
+SOLVE_PROMPTS = {
+    category: PromptLayout(SOLVE_INSTRUCTIONS.replace("<answer format>", answer_format), "Puzzle:\n{puzzle}")
+    for category, answer_format in ANSWER_FORMATS.items()
+}
+DEFAULT_SOLVE_PROMPT = PromptLayout(
+    SOLVE_INSTRUCTIONS.replace("<answer format>", "Answer: <your answer>"),
+    "Puzzle:\n{puzzle}"
+)
+
+# Attempts at drawing statements before giving up on a truth-teller puzzle
+MAX_STATEMENT_ATTEMPTS = 500
+
+def _join(items: Sequence[str]) -> str:
+    """Join items as an English list ("A, B, and C")."""
+    items = list(items)
+    if len(items) <= 2:
+        return " and ".join(items)
+    return f"{', '.join(items[:-1])}, and {items[-1]}"
+
+def _number(clues: Sequence[str]) -> str:
+    return "; ".join(f"({i}) {clue}" for i, clue in enumerate(clues, 1))
+
+def _final_answer(response: str) -> str:
+    """Text after the last "Answer:" marker, or the last non-empty line."""
+    parts = re.split(r"(?i)\banswer\s*:", response)
+    if len(parts) > 1:
+        return parts[-1].strip()
+    lines = [line for line in response.strip().splitlines() if line.strip()]
+    return lines[-1] if lines else ""
+
+def _mentions(text: str, name: str) -> Optional[int]:
+    match = re.search(rf"\b{re.escape(name)}\b", text, re.IGNORECASE)
+    return match.start() if match else None
+
+class LogicalPuzzlesTask(BaseTask):
+    """
+    Implementation of the logical puzzles task.
+    
+    Puzzles are generated locally from the logical templates: a hidden
+    solution is drawn, then clues that hold under it are added until a
+    constraint solver finds exactly one solution. Responses are graded by
+    checking the model's answer against the constraints, so neither
+    generation nor grading needs an LLM.
+    """
+    
+    resource_profile = CPU_HEAVY
+    
+    def __init__(self, config: Dict[str, Any], clients: Optional[Mapping[str, Any]] = None):
+        super().__init__("logical_puzzles", config, clients)
+        self.categories = config.get("categories", [])
+        self.difficulty_levels = config.get("difficulty_levels", [])
+        self.rng = random.Random(config.get("seed"))
+        
+        registry = get_registry(config.get("templates_dir", "data/templates"))
+        self.templates: Dict[str, Template] = {}
+        for category in self.categories:
+            try:
+                self.templates[category] = registry.get("logical", category)
+            except KeyError:
+                print(f"Warning: No template found for category {category}")
+    
+    async def generate_examples(self, num_examples: int) -> List[TaskExample]:
+        """Generate puzzles spread evenly over categories and difficulties."""
+        categories = [c for c in self.categories if c in self.templates]
+        if not categories:
+            print("Warning: No templates available for any logical puzzle category")
+            return []
+        
+        cells = [(c, d) for c in categories for d in self.difficulty_levels]
+        examples = []
+        for i in range(num_examples):
+            category, difficulty = cells[i % len(cells)]
+            example = self._generate_example(category, difficulty)
+            if example is None:
+                print(f"Skipping {difficulty} {category} puzzle: no unique instance found")
+                continue
+            examples.append(example)
+        
+        self.rng.shuffle(examples)
+        return examples
+    
+    def _generate_example(self, category: str, difficulty: str) -> Optional[TaskExample]:
+        """Generate one puzzle with a unique solution."""
+        low, high = PUZZLE_SIZES.get(difficulty, PUZZLE_SIZES["medium"])
+        size = self.rng.randint(low, high)
+        if category == "truth_teller_liar":
+            puzzle = self._truth_teller_puzzle(size, difficulty)
+        elif category in ORDERING_KINDS:
+            puzzle = self._ordering_puzzle(category, size, difficulty)
+        else:
+            print(f"Warning: Unsupported logical puzzle category {category}")
+            return None
+        if puzzle is None:
+            return None
+        
+        problem, puzzle = puzzle
+        return TaskExample(
+            id=str(uuid.uuid4()),
+            input=problem,
+            expected_output=self.format_answer(category, puzzle, puzzle["solution"]),
+            metadata={
+                "category": category,
+                "difficulty": difficulty,
+                "template_id": self.templates[category].id,
+                "puzzle": puzzle
+            }
+        )
+    
+    def _ordering_puzzle(
+        self,
+        category: str,
+        size: int,
+        difficulty: str
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Seating, department and scheduling puzzles: each item takes a distinct slot."""
+        template = self.templates[category]
+        event = ""
+        if category == "seating_arrangement":
+            variables = self.rng.sample(PEOPLE, size)
+            labels = [f"position {i + 1}" for i in range(size)]
+        elif category == "department_assignment":
+            variables = COLLEAGUES[:size]
+            labels = sorted(self.rng.sample(DEPARTMENTS, size))
+        else:
+            event_types = template.variables.get("event_type") or ["meetings"]
+            event_type = self.rng.choice(event_types)
+            event = event_type[:-1] if event_type.endswith("s") else event_type
+            variables = [f"{event_type[0].upper()}{i + 1}" for i in range(size)]
+            labels = ORDINALS[:size - 1] + ["last"]
+        
+        order = list(range(size))
+        self.rng.shuffle(order)
+        solution = dict(zip(variables, order))
+        
+        kinds = set(ORDERING_KINDS[category])
+        if difficulty == "hard":
+            # Without direct placements every position has to be inferred
+            kinds.discard("equals")
+        candidates = self._ordering_candidates(kinds, variables, solution, size)
+        constraints = build_unique_puzzle(variables, range(size), candidates, self.rng, all_different=True)
+        if constraints is None:
+            return None
+        
+        texts = CLUE_TEXTS[category]
+        clues = [
+            texts[c.kind].format(
+                x=c.variables[0],
+                y=c.variables[-1],
+                value=labels[c.params[0]] if c.kind in ("equals", "not_equals") else "",
+                values=" or ".join(labels[k] for k in c.params[0]) if c.kind == "not_in" else "",
+                event=event
+            )
+            for c in constraints
+        ]
+        
+        if category == "seating_arrangement":
+            problem = template.skeleton.render(
+                num_people=self._count(size),
+                names=_join(variables),
+                constraints=_number(clues)
+            )
+        elif category == "department_assignment":
+            problem = template.skeleton.render(
+                num_people=self._count(size),
+                names=", ".join(variables),
+                departments=_join(labels),
+                clues=_number(clues),
+                ordered_departments=", ".join(labels)
+            )
+        else:
+            problem = template.skeleton.render(
+                num_events=self._count(size),
+                event_type=event_type,
+                event_names=", ".join(variables),
+                time_frame=f"in {size} consecutive one-hour slots starting at 9 AM",
+                constraints=_number(clues),
+                question="Determine the order."
+            )
+        
+        return problem, {
+            "variables": variables,
+            "domain": list(range(size)),
+            "labels": labels,
+            "all_different": True,
+            "constraints": [c.to_dict() for c in constraints],
+            "solution": solution
+        }
+    
+    def _ordering_candidates(
+        self,
+        kinds: set,
+        variables: List[str],
+        solution: Assignment,
+        size: int
+    ) -> List[Constraint]:
+        """Every clue of the allowed kinds that holds under the hidden solution."""
+        candidates = []
+        for x in variables:
+            k = solution[x]
+            others = [j for j in range(size) if j != k]
+            if "equals" in kinds:
+                candidates.append(Constraint("equals", [x], [k]))
+            if "not_equals" in kinds:
+                candidates.extend(Constraint("not_equals", [x], [j]) for j in others)
+            if "not_in" in kinds and len(others) >= 2:
+                candidates.append(Constraint("not_in", [x], [sorted(self.rng.sample(others, 2))]))
+            end_kind = "at_end" if k in (0, size - 1) else "not_at_end"
+            if end_kind in kinds:
+                candidates.append(Constraint(end_kind, [x], [size]))
+        
+        for x, y in itertools.permutations(variables, 2):
+            kx, ky = solution[x], solution[y]
+            if "before" in kinds and kx < ky:
+                candidates.append(Constraint("before", [x, y]))
+            if "immediately_before" in kinds and ky == kx + 1:
+                candidates.append(Constraint("immediately_before", [x, y]))
+            if "not_immediately_before" in kinds and kx < ky and ky != kx + 1:
+                candidates.append(Constraint("not_immediately_before", [x, y]))
+            if variables.index(x) < variables.index(y):
+                pair_kind = "adjacent" if abs(kx - ky) == 1 else "not_adjacent"
+                if pair_kind in kinds:
+                    candidates.append(Constraint(pair_kind, [x, y]))
+        return candidates
+    
+    def _truth_teller_puzzle(self, size: int, difficulty: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Everyone makes one statement; redraw statements until exactly one world is consistent."""
+        template = self.templates["truth_teller_liar"]
+        variables = SPEAKERS[:size]
+        claims = CLAIMS.get(difficulty, CLAIMS["medium"])
+        
+        for _ in range(MAX_STATEMENT_ATTEMPTS):
+            constraints = []
+            for speaker in variables:
+                claim = self.rng.choice(claims)
+                others = [p for p in variables if p != speaker]
+                arity = 1 if claim in ("is_truthful", "is_liar") else 2
+                subjects = self.rng.sample(others, arity)
+                constraints.append(Constraint("statement", [speaker, *subjects], [claim]))
+            
+            solutions = CSPSolver(variables, [True, False], constraints).solve(limit=2)
+            if len(solutions) == 1:
+                break
+        else:
+            return None
+        
+        statements = [
+            f'{c.variables[0]} says: "' + CLAIM_TEXTS[c.params[0]].format(
+                a=c.variables[1],
+                b=c.variables[-1]
+            ) + '"'
+            for c in constraints
+        ]
+        problem = template.skeleton.render(
+            num_people=self._count(size),
+            names=", ".join(variables),
+            statements=_number(statements),
+            question="Determine who is telling the truth."
+        )
+        return problem, {
+            "variables": variables,
+            "domain": [True, False],
+            "labels": ["truth-teller", "liar"],
+            "all_different": False,
+            "constraints": [c.to_dict() for c in constraints],
+            "solution": solutions[0]
+        }
+    
+    @staticmethod
+    def _count(size: int) -> str:
+        words = ["Zero", "One", "Two", "Three", "Four", "Five", "Six", "Seven", "Eight"]
+        return words[size] if size < len(words) else str(size)
+    
+    @staticmethod
+    def format_answer(category: str, puzzle: Dict[str, Any], assignment: Assignment) -> str:
+        """Render an assignment in the category's answer format."""
+        variables = puzzle["variables"]
+        if category == "truth_teller_liar":
+            truthful = [v for v in variables if assignment[v]]
+            return f"Truth-tellers: {', '.join(truthful) if truthful else 'none'}"
+        if category == "department_assignment":
+            return "; ".join(f"{v}: {puzzle['labels'][assignment[v]]}" for v in variables)
+        return ", ".join(sorted(variables, key=lambda v: assignment[v]))
+    
+    @staticmethod
+    def parse_answer(category: str, puzzle: Dict[str, Any], response: str) -> Optional[Assignment]:
+        """
+        Read the model's final answer as a puzzle assignment.
+        
+        Args:
+            category: Puzzle category
+            puzzle: Structured puzzle from the example metadata
+            response: Model response
+        
+        Returns:
+            Assignment of every variable, or None if the answer can't be read
+        """
+        text = _final_answer(response)
+        variables = puzzle["variables"]
+        
+        if category == "truth_teller_liar":
+            truthful, liars = set(), set()
+            found_truth = found_liars = False
+            for clause in re.split(r"[;\n]|\.\s", text):
+                lowered = clause.lower()
+                named = {v for v in variables if _mentions(clause, v) is not None}
+                if "truth" in lowered:
+                    found_truth = True
+                    truthful |= named
+                elif "liar" in lowered or "lying" in lowered:
+                    found_liars = True
+                    liars |= named
+            if found_truth:
+                return {v: v in truthful for v in variables}
+            if found_liars:
+                return {v: v not in liars for v in variables}
+            return None
+        
+        if category == "department_assignment":
+            labels = puzzle["labels"]
+            department = "|".join(re.escape(label) for label in sorted(labels, key=len, reverse=True))
+            assignment = {}
+            for v in variables:
+                match = re.search(
+                    rf"\b{re.escape(v)}\b\W*(?:(?:is|works) in\s+)?({department})\b",
+                    text,
+                    re.IGNORECASE
+                )
+                if match is None:
+                    return None
+                chosen = match.group(1).lower()
+                assignment[v] = next(i for i, label in enumerate(labels) if label.lower() == chosen)
+            return assignment
+        
+        positions = {v: _mentions(text, v) for v in variables}
+        if any(p is None for p in positions.values()):
+            return None
+        order = sorted(variables, key=lambda v: positions[v])
+        return {v: i for i, v in enumerate(order)}
+    
+    async def evaluate_response(
+        self,
+        example: TaskExample,
+        model_response: str,
+        model_name: str
+    ) -> TaskResult:
+        """Grade an answer by checking it against the puzzle's constraints."""
+        metadata = example.metadata or {}
+        grade = await self.run_blocking(grade_answer, metadata.get("category", ""), metadata["puzzle"], model_response)
+        
+        return TaskResult(
+            example_id=example.id,
+            model_name=model_name,
+            model_output=model_response,
+            is_correct=grade["is_correct"],
+            # Graded against the constraints rather than by a judge
+            reasoning_quality=grade["constraint_satisfaction"],
+            metrics={
+                "solution_correctness": float(grade["is_correct"]),
+                "constraint_satisfaction": grade["constraint_satisfaction"]
+            },
+            metadata={
+                "parsed_answer": grade["parsed_answer"],
+                "constraints_satisfied": grade["satisfied"],
+                "constraints_total": grade["total"],
+                "violated_constraints": grade["violated"]
+            }
+        )
+    
+    def normalize_answer(self, example: TaskExample, response: str) -> Optional[str]:
+        """The parsed assignment, so differently worded answers vote together."""
+        metadata = example.metadata or {}
+        assignment = self.parse_answer(metadata.get("category", ""), metadata["puzzle"], response)
+        return None if assignment is None else json.dumps(assignment, sort_keys=True)
+    
+    def get_prompt(self, example: TaskExample) -> str:
+        """Generate the prompt for a logic puzzle."""
+        category = (example.metadata or {}).get("category", "")
+        return SOLVE_PROMPTS.get(category, DEFAULT_SOLVE_PROMPT).render(puzzle=example.input)
+    
+    def validate_example(self, example: TaskExample) -> Tuple[bool, Optional[str]]:
+        """Check that a puzzle still has exactly its stored solution."""
+        puzzle = (example.metadata or {}).get("puzzle")
+        if not puzzle:
+            return False, "Missing puzzle structure"
+        
+        solutions = CSPSolver(
+            puzzle["variables"],
+            puzzle["domain"],
+            [Constraint.from_dict(c) for c in puzzle["constraints"]],
+            puzzle["all_different"]
+        ).solve(limit=2)
+        if len(solutions) != 1:
+            return False, f"Puzzle has {len(solutions)}+ solutions"
+        if solutions[0] != puzzle["solution"]:
+            return False, "Stored solution doesn't match the solver"
+        
+        return True, None
+
+def grade_answer(category: str, puzzle: Dict[str, Any], response: str) -> Dict[str, Any]:
+    """
+    Check a response's final answer against a puzzle's constraints.
+    
+    Module-level so it can run in a process pool.
+    
+    Args:
+        category: Puzzle category
+        puzzle: Structured puzzle from the example metadata
+        response: Model response
+    
+    Returns:
+        Dict with is_correct, constraint_satisfaction, parsed_answer,
+        satisfied, total and violated (the violated constraints)
+    """
+    constraints = [Constraint.from_dict(c) for c in puzzle["constraints"]]
+    assignment = LogicalPuzzlesTask.parse_answer(category, puzzle, response)
+    if assignment is None:
+        satisfied = 0
+        distinct = False
+    else:
+        satisfied = sum(c.is_satisfied(assignment) for c in constraints)
+        distinct = not puzzle["all_different"] or len(set(assignment.values())) == len(assignment)
+    
+    # Uniqueness was checked at generation, so satisfying every constraint
+    # with distinct values is the same as matching the stored solution
+    is_correct = assignment is not None and distinct and satisfied == len(constraints)
+    return {
+        "is_correct": is_correct,
+        "constraint_satisfaction": satisfied / len(constraints) if constraints else 0.0,
+        "parsed_answer": LogicalPuzzlesTask.format_answer(category, puzzle, assignment) if assignment else None,
+        "satisfied": satisfied,
+        "total": len(constraints),
+        "violated": [
+            c.to_dict() for c in constraints
+            if assignment is not None and not c.is_satisfied(assignment)
+        ]
+    }
\ No newline at end of file
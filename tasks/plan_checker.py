@@ -0,0 +1,286 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+_CLOCK_RE = re.compile(r"^\s*(\d{1,2})(?:[:.](\d{2}))?\s*([AaPp])?\.?[Mm]?\.?\s*$")
+
+def parse_clock(value: Any) -> Optional[int]:
+    """
+    Parse a time of day ("9:30", "09:30", "1:25 PM") into minutes after midnight.
+    
+    Returns:
+        Minutes after midnight, or None if the value isn't a time of day
+    """
+    if not isinstance(value, str):
+        return None
+    match = _CLOCK_RE.match(value)
+    if match is None:
+        return None
+    hours, minutes = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = (match.group(3) or "").lower()
+    if meridiem == "p" and hours < 12:
+        hours += 12
+    elif meridiem == "a" and hours == 12:
+        hours = 0
+    if hours > 24 or minutes >= 60:
+        return None
+    return hours * 60 + minutes
+
+def format_clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+@dataclass
+class CheckResult:
+    """Outcome of one feasibility check."""
+    name: str
+    passed: bool
+    detail: str = ""
+
+@dataclass
+class PlanReport:
+    """
+    Result of checking a plan against a scenario.
+    
+    Attributes:
+        checks: Outcome of every check, in scenario order
+        total_cost: Cost of the plan computed from the scenario's prices
+    """
+    checks: List[CheckResult] = field(default_factory=list)
+    total_cost: float = 0.0
+    
+    @property
+    def feasible(self) -> bool:
+        return bool(self.checks) and all(check.passed for check in self.checks)
+    
+    @property
+    def satisfaction(self) -> float:
+        if not self.checks:
+            return 0.0
+        return sum(check.passed for check in self.checks) / len(self.checks)
+    
+    @property
+    def violations(self) -> List[str]:
+        return [f"{check.name}: {check.detail}" for check in self.checks if not check.passed]
+
+@dataclass
+class _Entry:
+    """A schedule entry resolved against the scenario's options."""
+    id: str
+    option: Dict[str, Any]
+    day: Optional[int] = None
+    start: Optional[float] = None
+    end: Optional[float] = None
+    cost: float = 0.0
+    
+    @property
+    def timed(self) -> bool:
+        return self.start is not None and self.end is not None
+    
+    def offset(self) -> float:
+        """Start of the entry's day on the absolute time axis."""
+        return (self.day - 1) * MINUTES_PER_DAY if self.day is not None else 0
+
+class PlanChecker:
+    """
+    Deterministic feasibility checker for structured plans.
+    
+    A scenario lists the options a plan may use (each with an ID, group,
+    price, and either a fixed slot or a duration) and constraints as plain
+    data. Plans are lists of schedule entries referencing option IDs; every
+    entry is resolved to an interval on one time axis ("clock" scenarios use
+    day numbers and times of day, "week" scenarios use week numbers), and
+    each constraint becomes one pass/fail check.
+    """
+    
+    def __init__(self, scenario: Dict[str, Any]):
+        """
+        Initialize the checker.
+        
+        Args:
+            scenario: Scenario with "unit", "options" and "constraints"
+        """
+        self.unit = scenario.get("unit", "clock")
+        self.options = {option["id"].upper(): option for option in scenario["options"]}
+        self.constraints = scenario.get("constraints", [])
+    
+    def check(self, plan: Dict[str, Any]) -> PlanReport:
+        """
+        Check a plan.
+        
+        Args:
+            plan: Plan with a "schedule" list and optionally "total_cost"
+        
+        Returns:
+            PlanReport with one check per constraint, plus entry validity
+            and (when given) the reported total
+        """
+        schedule = plan.get("schedule") if isinstance(plan, dict) else None
+        if not isinstance(schedule, list) or not schedule:
+            return PlanReport(checks=[CheckResult("schedule", False, "plan has no schedule entries")])
+        
+        entries, problems = self._resolve(schedule)
+        report = PlanReport(total_cost=sum(entry.cost for entry in entries))
+        report.checks.append(CheckResult("valid_entries", not problems, "; ".join(problems[:5])))
+        
+        for constraint in self.constraints:
+            passed, detail = getattr(self, f"_check_{constraint['kind']}")(constraint, entries, report)
+            report.checks.append(CheckResult(constraint["kind"], passed, detail))
+        
+        reported = plan.get("total_cost")
+        if reported is not None and any(c["kind"] == "budget" for c in self.constraints):
+            try:
+                reported = float(str(reported).replace("$", "").replace(",", ""))
+                passed = abs(reported - report.total_cost) <= max(1.0, 0.01 * report.total_cost)
+            except ValueError:
+                passed = False
+            report.checks.append(CheckResult(
+                "reported_total",
+                passed,
+                "" if passed else f"reported {reported}, entries sum to {report.total_cost:g}"
+            ))
+        
+        return report
+    
+    def _resolve(self, schedule: List[Any]) -> Tuple[List[_Entry], List[str]]:
+        """Match entries to options and parse their times, collecting problems."""
+        entries, problems, seen = [], [], set()
+        for raw in schedule:
+            if not isinstance(raw, dict):
+                problems.append(f"entry is not an object: {str(raw)[:40]}")
+                continue
+            entry_id = str(raw.get("id", "")).strip().upper()
+            option = self.options.get(entry_id)
+            if option is None:
+                problems.append(f"unknown option {entry_id or '(missing id)'}")
+                continue
+            if entry_id in seen:
+                problems.append(f"{entry_id} scheduled more than once")
+                continue
+            seen.add(entry_id)
+            
+            entry = _Entry(id=entry_id, option=option)
+            if option.get("cost") is not None:
+                entry.cost = float(option["cost"])
+            else:
+                try:
+                    entry.cost = float(str(raw.get("cost")).replace("$", "").replace(",", ""))
+                except ValueError:
+                    problems.append(f"{entry_id} needs a numeric cost")
+            
+            if option.get("timed", True):
+                problem = self._resolve_time(entry, raw)
+                if problem:
+                    problems.append(problem)
+            entries.append(entry)
+        return entries, problems
+    
+    def _resolve_time(self, entry: _Entry, raw: Dict[str, Any]) -> Optional[str]:
+        option = entry.option
+        if self.unit == "week":
+            try:
+                first, last = int(raw.get("start")), int(raw.get("end"))
+            except (TypeError, ValueError):
+                return f"{entry.id} needs integer start and end weeks"
+            entry.start, entry.end = first - 1, last
+        else:
+            try:
+                entry.day = int(raw.get("day", 1))
+            except (TypeError, ValueError):
+                return f"{entry.id} has an invalid day"
+            start, end = parse_clock(raw.get("start")), parse_clock(raw.get("end"))
+            if start is None or end is None:
+                return f"{entry.id} needs start and end times"
+            entry.start, entry.end = entry.offset() + start, entry.offset() + end
+        
+        if entry.end <= entry.start:
+            return f"{entry.id} ends before it starts"
+        slot = option.get("slot")
+        if slot is not None:
+            expected = (slot.get("day"), slot["start"], slot["end"])
+            actual = (entry.day, entry.start - entry.offset(), entry.end - entry.offset())
+            if actual != expected:
+                return f"{entry.id} must keep its fixed time"
+        elif option.get("duration") is not None and entry.end - entry.start != option["duration"]:
+            return f"{entry.id} must last {option['duration']} {'weeks' if self.unit == 'week' else 'minutes'}"
+        return None
+    
+    @staticmethod
+    def _matching(entries: List[_Entry], keys: List[str]) -> List[_Entry]:
+        """Entries whose ID or group is in `keys`; "*" matches every entry."""
+        keys = {key.upper() for key in keys}
+        return [
+            entry for entry in entries
+            if "*" in keys or entry.id in keys or str(entry.option.get("group", "")).upper() in keys
+        ]
+    
+    def _check_required(self, constraint, entries, report) -> Tuple[bool, str]:
+        present = any(entry.id == constraint["id"].upper() for entry in entries)
+        return present, "" if present else f"{constraint['id']} is missing"
+    
+    def _check_select_one(self, constraint, entries, report) -> Tuple[bool, str]:
+        chosen = self._matching(entries, [constraint["group"]])
+        return len(chosen) == 1, "" if len(chosen) == 1 else f"{len(chosen)} options chosen from {constraint['group']}"
+    
+    def _check_budget(self, constraint, entries, report) -> Tuple[bool, str]:
+        passed = report.total_cost <= constraint["limit"] + 1e-6
+        return passed, "" if passed else f"total {report.total_cost:g} exceeds {constraint['limit']:g}"
+    
+    def _check_min_cost(self, constraint, entries, report) -> Tuple[bool, str]:
+        entry = next((e for e in entries if e.id == constraint["id"].upper()), None)
+        if entry is None:
+            return False, f"{constraint['id']} is missing"
+        passed = entry.cost >= constraint["amount"]
+        return passed, "" if passed else f"{entry.id} gets {entry.cost:g}, needs {constraint['amount']:g}"
+    
+    def _check_within(self, constraint, entries, report) -> Tuple[bool, str]:
+        """Entries must lie inside a window of each day (or of the week axis)."""
+        for entry in self._matching(entries, constraint.get("ids") or ["*"]):
+            if not entry.timed:
+                continue
+            start, end = entry.start - entry.offset(), entry.end - entry.offset()
+            if start < constraint.get("earliest", 0) or end > constraint["latest"]:
+                return False, f"{entry.id} falls outside the allowed window"
+            if constraint.get("days") is not None and entry.day not in constraint["days"]:
+                return False, f"{entry.id} is on day {entry.day}"
+        return True, ""
+    
+    def _check_no_overlap(self, constraint, entries, report) -> Tuple[bool, str]:
+        """Entries (optionally only one participant's) don't overlap and keep a minimum gap."""
+        selected = [e for e in self._matching(entries, constraint.get("ids") or ["*"]) if e.timed]
+        participant = constraint.get("participant")
+        if participant is not None:
+            selected = [e for e in selected if participant in e.option.get("participants", [])]
+        selected.sort(key=lambda e: e.start)
+        gap = constraint.get("gap", 0)
+        for previous, current in zip(selected, selected[1:]):
+            if current.start < previous.end + gap:
+                return False, f"{previous.id} and {current.id} overlap or are too close"
+        return True, ""
+    
+    def _check_precedes(self, constraint, entries, report) -> Tuple[bool, str]:
+        """Every `first` entry ends before any `second` entry starts."""
+        first = [e for e in self._matching(entries, constraint["first"]) if e.timed]
+        second = [e for e in self._matching(entries, constraint["second"]) if e.timed]
+        # "*" on one side means every entry not named on the other side
+        if "*" in constraint["first"]:
+            first = [e for e in first if e not in second]
+        elif "*" in constraint["second"]:
+            second = [e for e in second if e not in first]
+        for a in first:
+            for b in second:
+                if a.end > b.start:
+                    return False, f"{a.id} must end before {b.id} starts"
+        return True, ""
+    
+    def _check_availability(self, constraint, entries, report) -> Tuple[bool, str]:
+        """A participant's entries must each fit inside one of their windows."""
+        participant = constraint["participant"]
+        for entry in entries:
+            if not entry.timed or participant not in entry.option.get("participants", []):
+                continue
+            start, end = entry.start - entry.offset(), entry.end - entry.offset()
+            if not any(low <= start and end <= high for low, high in constraint["windows"]):
+                return False, f"{participant} is unavailable for {entry.id}"
+        return True, ""
\ No newline at end of file
@@ -0,0 +1,768 @@
+import itertools
+import json
+import math
+import random
+import uuid
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from ..utils.parsing import extract_json
+from ..utils.prompts import PromptLayout
+from ..utils.templates import Template, get_registry
+from .base import JUDGE_HEAVY, BaseTask, TaskExample, TaskResult
+from .plan_checker import PlanChecker, format_clock, parse_clock
+
+# Fields the judge must return for an explanation score to be usable
+JUDGE_FIELDS = {
+    "explanation_quality": (int, float)
+}
+
+PLAN_FIELDS = {
+    "schedule": list
+}
+
+ROUTES = [
+    ("New York", "Chicago", "San Francisco"),
+    ("Boston", "Washington", "Atlanta"),
+    ("Seattle", "Denver", "Austin"),
+    ("Los Angeles", "Phoenix", "Dallas"),
+    ("London", "Paris", "Rome"),
+    ("Toronto", "Montreal", "Halifax")
+]
+
+# (id, name, duration in minutes) of event components
+EVENT_COMPONENTS = [
+    ("BREAKOUT_A", "Breakout session A", 60),
+    ("BREAKOUT_B", "Breakout session B", 60),
+    ("WORKSHOP", "Hands-on workshop", 90),
+    ("POSTERS", "Poster session", 45),
+    ("DEMOS", "Product demos", 45),
+    ("FIRESIDE", "Fireside chat", 30)
+]
+
+EVENT_DAYS = {
+    "half-day": (1, 9 * 60, 13 * 60),
+    "one-day": (1, 9 * 60, 17 * 60),
+    "two-day": (2, 9 * 60, 17 * 60)
+}
+
+# (id, name, minimum cost, duration in weeks, crew) of project requirements
+PROJECT_REQUIREMENTS = {
+    "home renovation": [
+        ("ELECTRICAL", "electrical upgrade", 1500, 1, "electrician"),
+        ("KITCHEN", "kitchen update", 6000, 3, "contractor"),
+        ("BATHROOM", "bathroom remodel", 5000, 2, "contractor"),
+        ("PAINTING", "interior painting", 2000, 1, "painter"),
+        ("FLOORING", "living room flooring", 3000, 2, "contractor")
+    ],
+    "event organization": [
+        ("VENUE", "venue booking", 4000, 2, "planning team"),
+        ("SPEAKERS", "speaker recruitment", 2000, 3, "planning team"),
+        ("CATERING", "catering contract", 3000, 1, "vendor manager"),
+        ("AV", "decoration and AV setup", 2500, 2, "vendor manager"),
+        ("PROMOTION", "promotion campaign", 3500, 3, "marketing team")
+    ],
+    "product launch": [
+        ("RESEARCH", "market research", 4000, 2, "research team"),
+        ("DESIGN", "product design", 8000, 3, "design team"),
+        ("TESTING", "user testing", 3000, 2, "research team"),
+        ("CAMPAIGN", "marketing campaign", 6000, 3, "marketing team"),
+        ("EVENT", "launch event", 5000, 1, "marketing team")
+    ]
+}
+
+PROJECT_DEPENDENCIES = [
+    ("ELECTRICAL", "KITCHEN"), ("ELECTRICAL", "BATHROOM"), ("KITCHEN", "PAINTING"),
+    ("BATHROOM", "PAINTING"), ("PAINTING", "FLOORING"),
+    ("VENUE", "CATERING"), ("VENUE", "AV"), ("SPEAKERS", "PROMOTION"),
+    ("RESEARCH", "DESIGN"), ("DESIGN", "TESTING"), ("DESIGN", "CAMPAIGN"),
+    ("TESTING", "EVENT"), ("CAMPAIGN", "EVENT")
+]
+
+# Availability descriptions and the windows (minutes after midnight) they allow
+AVAILABILITY = [
+    ("only in the morning (9:00-12:00)", [[540, 720]]),
+    ("only after lunch (13:00-17:00)", [[780, 1020]]),
+    ("all day except lunch (9:00-12:00 and 13:00-17:00)", [[540, 720], [780, 1020]]),
+    ("from 10:00 to 15:00", [[600, 900]])
+]
+
+# Size of each scenario per complexity level
+SIZES = {
+    "simple": 0,
+    "moderate": 1,
+    "complex": 2
+}
+
+# Candidate plans tried while searching for a feasible reference plan
+MAX_SEARCH_ATTEMPTS = 200
+
+# Schedule entry format for each scenario unit
+PLAN_ENTRIES = {
+    "week": '{"id": "<option ID>", "start": <first week>, "end": <last week>, "cost": <dollars allocated>}',
+    "clock": '{"id": "<option ID>", "day": <day number>, "start": "HH:MM", "end": "HH:MM"}'
+}
+
+# Fixed instructions lead every prompt so providers can cache them across scenarios
+PLAN_INSTRUCTIONS = """
+    Create a plan for the scenario given below.
+    
+    Use only the listed options and follow every rule. Options with a fixed time must keep it;
+    flexible options must last exactly their stated duration. Options without a time need only their ID.
+    
+    Return your plan as JSON:
+    {
+        "schedule": [<entry>, ...],
+        "total_cost": <total cost in dollars>,
+        "explanation": "<how the plan satisfies the rules>"
+    }
+    """
+
+PLAN_PROMPTS = {
+    unit: PromptLayout(PLAN_INSTRUCTIONS.replace("<entry>", entry), "Scenario:\n{scenario}")
+    for unit, entry in PLAN_ENTRIES.items()
+}
+
+JUDGE_PROMPT = PromptLayout(
+    """
+    Rate the explanation accompanying a plan. Feasibility has already been checked
+    automatically; do not re-grade it. Judge only whether the explanation is accurate
+    about the plan, justifies its choices against the rules and is clear. The scenario,
+    plan, explanation and automatic check result are given after these instructions.
+    
+    Format your response as JSON:
+    {
+        "explanation_quality": float between 0 and 1,
+        "comment": "One sentence justifying the score"
+    }
+    """,
+    """
+    Scenario:
+    {scenario}
+    
+    Plan:
+    {schedule}
+    
+    Explanation:
+    {explanation}
+    
+    Automatic check: {check}
+    """
+)
+
+def _join(items: List[str]) -> str:
+    """Join items as an English list ("A, B, and C")."""
+    if len(items) <= 2:
+        return " and ".join(items)
+    return f"{', '.join(items[:-1])}, and {items[-1]}"
+
+def _round_up(value: float, step: int) -> int:
+    return int(math.ceil(value / step) * step)
+
+def _option(
+    option_id: str,
+    name: str,
+    group: Optional[str] = None,
+    cost: Optional[float] = 0,
+    slot: Optional[Dict[str, int]] = None,
+    duration: Optional[int] = None,
+    timed: bool = True,
+    participants: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    return {
+        "id": option_id,
+        "name": name,
+        "group": group or option_id,
+        "cost": cost,
+        "slot": slot,
+        "duration": duration,
+        "timed": timed,
+        "participants": participants or []
+    }
+
+def _slot_entry(option: Dict[str, Any], day: Optional[int] = None, start: Optional[int] = None) -> Dict[str, Any]:
+    """Schedule entry for an option, at its fixed slot or at (day, start)."""
+    entry = {"id": option["id"]}
+    if not option["timed"]:
+        return entry
+    if option["slot"] is not None:
+        day, start, end = option["slot"]["day"], option["slot"]["start"], option["slot"]["end"]
+    else:
+        end = start + option["duration"]
+    entry.update({"day": day, "start": format_clock(start), "end": format_clock(end)})
+    return entry
+
+class PlanningTask(BaseTask):
+    """
+    Implementation of the planning task.
+    
+    Scenarios are instantiated locally from the planning templates as a
+    catalog of options (flights, sessions, work packages, meetings) plus
+    constraints stored as data, and each one is checked to admit a feasible
+    plan. Models answer with a structured plan that a deterministic checker
+    verifies (budget sums, time-window overlaps, precedence, availability
+    and assignment rules); the LLM judge only scores the explanation.
+    """
+    
+    # The checker is cheap; the explanation judge call dominates
+    resource_profile = JUDGE_HEAVY
+    
+    def __init__(self, config: Dict[str, Any], clients: Optional[Mapping[str, Any]] = None):
+        super().__init__("planning", config, clients)
+        self.categories = config.get("categories", [])
+        self.complexity_levels = config.get("complexity_levels", [])
+        self.judge_model = config.get("evaluation", {}).get("judge_model", "gpt-4")
+        # Deterministic judging also lets identical concurrent judge calls be coalesced
+        self.judge_temperature = config.get("evaluation", {}).get("judge_temperature", 0.0)
+        self.openai_client = self.clients["openai"]
+        self.rng = random.Random(config.get("seed"))
+        
+        registry = get_registry(config.get("templates_dir", "data/templates"))
+        self.templates: Dict[str, Template] = {}
+        for category in self.categories:
+            try:
+                self.templates[category] = registry.get("planning", category)
+            except KeyError:
+                print(f"Warning: No template found for category {category}")
+    
+    async def generate_examples(self, num_examples: int) -> List[TaskExample]:
+        """Generate scenarios spread evenly over categories and complexity levels."""
+        categories = [c for c in self.categories if c in self.templates]
+        if not categories:
+            print("Warning: No templates available for any planning category")
+            return []
+        
+        cells = [(c, level) for c in categories for level in self.complexity_levels]
+        examples = []
+        for i in range(num_examples):
+            category, complexity = cells[i % len(cells)]
+            example = self._generate_example(category, complexity)
+            if example is None:
+                print(f"Skipping {complexity} {category} scenario: no feasible plan found")
+                continue
+            examples.append(example)
+        
+        self.rng.shuffle(examples)
+        return examples
+    
+    def _generate_example(self, category: str, complexity: str) -> Optional[TaskExample]:
+        """Instantiate a scenario and keep it only if a feasible plan exists."""
+        builder = getattr(self, f"_{category}", None)
+        if builder is None:
+            print(f"Warning: Unsupported planning category {category}")
+            return None
+        
+        for _ in range(5):
+            built = builder(self.templates[category], SIZES.get(complexity, 1))
+            if built is None:
+                continue
+            intro, scenario, reference = built
+            if PlanChecker(scenario).check(reference).feasible:
+                break
+        else:
+            return None
+        
+        return TaskExample(
+            id=str(uuid.uuid4()),
+            input=self._describe(intro, scenario),
+            expected_output=json.dumps(reference),
+            metadata={
+                "category": category,
+                "difficulty": complexity,
+                "template_id": self.templates[category].id,
+                "scenario": scenario
+            }
+        )
+    
+    def _describe(self, intro: str, scenario: Dict[str, Any]) -> str:
+        """Render a scenario as problem text: template sentence, options and rules."""
+        lines = [intro, "", "Options (refer to them by ID):"]
+        for option in scenario["options"]:
+            details = []
+            if option["slot"] is not None:
+                slot = option["slot"]
+                details.append(f"Day {slot['day']} {format_clock(slot['start'])}-{format_clock(slot['end'])}")
+            elif option["duration"] is not None:
+                unit = "week" if scenario["unit"] == "week" else "minute"
+                plural = "" if option["duration"] == 1 else "s"
+                details.append(f"{option['duration']} {unit}{plural}, flexible timing")
+            if option["participants"]:
+                details.append(f"participants: {', '.join(option['participants'])}")
+            if option["cost"]:
+                details.append(f"${option['cost']:,.0f}")
+            elif option["cost"] is None:
+                details.append("cost: your allocation")
+            lines.append(f"- {option['id']}: {option['name']}" + (f" ({'; '.join(details)})" if details else ""))
+        
+        lines.extend(["", "Rules:"])
+        lines.extend(f"{i}. {c['text']}" for i, c in enumerate(scenario["constraints"], 1))
+        return "\n".join(lines)
+    
+    def _search(
+        self,
+        scenario: Dict[str, Any],
+        candidates: List[List[Dict[str, Any]]]
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Check combinations of candidate entries (one from each list).
+        
+        Returns:
+            (cost, plan) for every combination that satisfies the scenario
+        """
+        checker = PlanChecker(scenario)
+        feasible = []
+        for combination in itertools.product(*candidates):
+            plan = {"schedule": [entry for entry in combination if entry is not None]}
+            report = checker.check(plan)
+            if report.feasible:
+                feasible.append((report.total_cost, plan))
+        return feasible
+    
+    def _business_trip(self, template: Template, size: int):
+        """Choose flights, lodging and an extra activity around a fixed meeting."""
+        rng = self.rng
+        origin, stop, destination = rng.choice(ROUTES)
+        days = 3 + size
+        choices = 2 if size == 0 else 3
+        activity = rng.choice(template.variables.get("mandatory_activity") or ["a mandatory meeting"])
+        extra = rng.choice(template.variables.get("additional_requirement") or ["a team dinner"])
+        activity_name = activity.split(" ", 1)[1]
+        
+        meeting_start = rng.choice([13, 14, 15]) * 60
+        meeting = _option(
+            "MEETING",
+            f"{activity_name[0].upper()}{activity_name[1:]} in {stop}",
+            slot={"day": 1, "start": meeting_start, "end": meeting_start + 90}
+        )
+        options = [meeting]
+        
+        for i in range(choices):
+            duration = rng.choice([90, 120, 150, 180])
+            # The first flight always makes the meeting; on harder trips one arrives too late
+            if i == choices - 1 and size > 0:
+                depart = meeting_start - 60
+            else:
+                depart = rng.randrange(6 * 60, meeting_start - duration - 30, 30)
+            options.append(_option(
+                f"OUT{i + 1}", f"Flight {origin} to {stop}", group="OUTBOUND",
+                cost=rng.randrange(150, 450, 10),
+                slot={"day": 1, "start": depart, "end": depart + duration}
+            ))
+        
+        for i in range(choices):
+            if i == choices - 1 and size > 0:
+                day, depart = 1, meeting_start - 150
+            elif i % 2 == 0:
+                day, depart = 1, meeting_start + rng.choice([150, 180, 240])
+            else:
+                day, depart = 2, rng.choice([7, 8]) * 60
+            options.append(_option(
+                f"TRANSFER{i + 1}", f"Train {stop} to {destination}", group="TRANSFER",
+                cost=rng.randrange(60, 250, 10),
+                slot={"day": day, "start": depart, "end": depart + rng.choice([90, 120, 180])}
+            ))
+        
+        nightly = rng.randrange(90, 160, 10)
+        for i, (kind, factor) in enumerate([("Budget", 1.0), ("Business", rng.choice([1.6, 1.8, 2.0]))]):
+            options.append(_option(
+                f"HOTEL{i + 1}", f"{kind} hotels for all {days - 1} nights", group="LODGING",
+                cost=_round_up(nightly * factor * (days - 1), 10), timed=False
+            ))
+        
+        for i in range(choices):
+            depart = rng.randrange(10 * 60, 19 * 60, 30)
+            options.append(_option(
+                f"RETURN{i + 1}", f"Flight {destination} to {origin}", group="RETURN",
+                cost=rng.randrange(150, 450, 10),
+                slot={"day": days, "start": depart, "end": depart + rng.choice([120, 180, 240])}
+            ))
+        
+        constraints = [
+            {"kind": "required", "id": "MEETING", "text": f"Attend the {activity_name} at its scheduled time."},
+            {"kind": "select_one", "group": "OUTBOUND", "text": "Take exactly one outbound flight (OUT options)."},
+            {"kind": "precedes", "first": ["OUTBOUND"], "second": ["MEETING"],
+             "text": f"Arrive in {stop} before the {activity_name} starts."},
+            {"kind": "select_one", "group": "TRANSFER", "text": "Take exactly one train to the destination (TRANSFER options)."},
+            {"kind": "precedes", "first": ["MEETING"], "second": ["TRANSFER"],
+             "text": f"Leave {stop} only after the {activity_name}."},
+            {"kind": "select_one", "group": "LODGING", "text": "Book exactly one lodging option (HOTEL options)."},
+            {"kind": "select_one", "group": "RETURN", "text": f"Take exactly one flight home on day {days} (RETURN options)."}
+        ]
+        
+        # The additional requirement is either a flexible block or a choice of fixed sessions
+        if "leisure" in extra:
+            options.append(_option("LEISURE", f"Full day of leisure in {destination}", duration=12 * 60))
+            extra_window = {"earliest": 9 * 60, "latest": 21 * 60}
+            extra_starts = [9 * 60]
+            extra_text = "The leisure day runs 09:00-21:00 with nothing else scheduled."
+        elif "networking" in extra:
+            options.append(_option("NETWORKING", f"Networking event in {destination}", cost=rng.randrange(20, 80, 10), duration=120))
+            extra_window = {"earliest": 18 * 60, "latest": 22 * 60}
+            extra_starts = [18 * 60, 19 * 60]
+            extra_text = "The networking event must fit between 18:00 and 22:00."
+        else:
+            options.append(_option("DINNER", f"Team dinner in {destination}", cost=rng.randrange(80, 160, 10), duration=120))
+            extra_window = {"earliest": 18 * 60, "latest": 22 * 60}
+            extra_starts = [18 * 60, 19 * 60, 20 * 60]
+            extra_text = "The team dinner must fit between 18:00 and 22:00."
+        extra_option = options[-1]
+        constraints.extend([
+            {"kind": "required", "id": extra_option["id"], "text": f"Include {extra_option['name'][0].lower()}{extra_option['name'][1:]}."},
+            {"kind": "within", "ids": [extra_option["id"]], **extra_window, "text": extra_text},
+            {"kind": "precedes", "first": ["TRANSFER"], "second": [extra_option["id"]],
+             "text": f"The {extra_option['name'].split(' in ')[0].lower()} happens after arriving in {destination}."},
+            {"kind": "precedes", "first": ["*"], "second": ["RETURN"], "text": "The flight home is the last item of the trip."},
+            {"kind": "no_overlap", "text": "No two scheduled items may overlap."}
+        ])
+        
+        scenario = {"unit": "clock", "options": options, "constraints": constraints}
+        groups = ["OUTBOUND", "TRANSFER", "LODGING", "RETURN"]
+        candidates = [[_slot_entry(meeting)]]
+        candidates.extend([_slot_entry(o) for o in options if o["group"] == group] for group in groups)
+        candidates.append([_slot_entry(extra_option, day, start) for day in range(1, days + 1) for start in extra_starts])
+        
+        feasible = self._search(scenario, candidates)
+        if not feasible:
+            return None
+        costs = sorted(cost for cost, _ in feasible)
+        # Leave room for the cheapest feasible plans only, so the budget binds
+        budget = max(_round_up(costs[0], 10), _round_up(costs[0] + (costs[-1] - costs[0]) * rng.uniform(0.1, 0.4), 10) - 10)
+        constraints.append({"kind": "budget", "limit": budget, "text": f"Total cost must not exceed ${budget:,}."})
+        
+        reference = min(feasible, key=lambda pair: pair[0])[1]
+        reference["total_cost"] = costs[0]
+        intro = template.skeleton.render(
+            origin=origin,
+            destination=destination,
+            budget=f"{budget:,}",
+            mandatory_activity=activity,
+            intermediate_city=stop,
+            additional_requirement=extra
+        )
+        return f"{intro} The trip lasts {days} days.", scenario, reference
+    
+    def _event_scheduling(self, template: Template, size: int):
+        """Schedule conference sessions with breaks, fixed first/last slots and a lunch window."""
+        rng = self.rng
+        duration = rng.choice(template.variables.get("duration") or list(EVENT_DAYS))
+        event_type = rng.choice(template.variables.get("event_type") or ["conference"])
+        days, day_start, day_end = EVENT_DAYS.get(duration, EVENT_DAYS["one-day"])
+        gap = 10 if size == 0 else 15
+        
+        count = min(len(EVENT_COMPONENTS), 1 + size + (days - 1) * 2 + (0 if duration == "half-day" else 1))
+        components = [("KEYNOTE", "Opening keynote", 60)]
+        components.extend(rng.sample(EVENT_COMPONENTS, count))
+        if duration != "half-day":
+            components.append(("LUNCH", "Networking lunch", 60))
+        components.append(("PANEL", "Closing panel discussion", 60))
+        
+        # Drop optional sessions until everything fits in the available time
+        capacity = days * (day_end - day_start)
+        while sum(c[2] for c in components) + gap * len(components) > capacity and len(components) > 3:
+            optional = [c for c in components if c[0] not in ("KEYNOTE", "LUNCH", "PANEL")]
+            if not optional:
+                break
+            components.remove(rng.choice(optional))
+        
+        options = [_option(cid, name, duration=minutes) for cid, name, minutes in components]
+        constraints = [
+            {"kind": "required", "id": cid, "text": f"Schedule the {name[0].lower()}{name[1:]}."}
+            for cid, name, _ in components
+        ]
+        constraints.extend([
+            {"kind": "within", "earliest": day_start, "latest": day_end, "days": list(range(1, days + 1)),
+             "text": f"Sessions run between {format_clock(day_start)} and {format_clock(day_end)}"
+                     + (f" on days 1-{days}." if days > 1 else " on day 1.")},
+            {"kind": "no_overlap", "gap": gap,
+             "text": f"Sessions must not overlap and need breaks of at least {gap} minutes between them."},
+            {"kind": "precedes", "first": ["KEYNOTE"], "second": ["*"], "text": "The keynote opens the event."},
+            {"kind": "precedes", "first": ["*"], "second": ["PANEL"], "text": "The panel discussion closes the event."}
+        ])
+        if duration != "half-day":
+            constraints.append({"kind": "within", "ids": ["LUNCH"], "earliest": 11 * 60 + 30, "latest": 13 * 60 + 30,
+                                "text": "Lunch must take place between 11:30 and 13:30."})
+        ids = [c[0] for c in components]
+        if size == 2 and "WORKSHOP" in ids and "BREAKOUT_A" in ids:
+            constraints.append({"kind": "precedes", "first": ["BREAKOUT_A"], "second": ["WORKSHOP"],
+                                "text": "The workshop builds on breakout session A, so it must come after it."})
+        
+        scenario = {"unit": "clock", "options": options, "constraints": constraints}
+        checker = PlanChecker(scenario)
+        middle = [c for c in components if c[0] not in ("KEYNOTE", "PANEL")]
+        for _ in range(MAX_SEARCH_ATTEMPTS):
+            rng.shuffle(middle)
+            plan = self._pack([components[0], *middle, components[-1]], days, day_start, day_end, gap)
+            if plan is not None and checker.check(plan).feasible:
+                break
+        else:
+            return None
+        
+        names = [c[1][0].lower() + c[1][1:] for c in components]
+        intro = template.skeleton.render(
+            duration=duration,
+            event_type=event_type,
+            components=_join(names),
+            constraints="Sessions should not overlap and there must be breaks between sessions."
+        )
+        return intro, scenario, plan
+    
+    @staticmethod
+    def _pack(components, days: int, day_start: int, day_end: int, gap: int) -> Optional[Dict[str, Any]]:
+        """Place sessions back to back in order, moving lunch into its window."""
+        schedule, day, cursor = [], 1, day_start
+        for cid, _, minutes in components:
+            start = max(cursor, 11 * 60 + 30) if cid == "LUNCH" else cursor
+            if start + minutes > day_end:
+                day, start = day + 1, day_start
+                if day > days:
+                    return None
+            schedule.append({"id": cid, "day": day, "start": format_clock(start), "end": format_clock(start + minutes)})
+            cursor = start + minutes + gap
+        return {"schedule": schedule}
+    
+    def _resource_allocation(self, template: Template, size: int):
+        """Allocate a budget across work packages with dependencies, shared crews and a deadline."""
+        rng = self.rng
+        project_type = rng.choice(template.variables.get("project_type") or list(PROJECT_REQUIREMENTS))
+        pool = PROJECT_REQUIREMENTS.get(project_type, PROJECT_REQUIREMENTS["home renovation"])
+        chosen = sorted(rng.sample(range(len(pool)), 3 + size))
+        requirements = [pool[i] for i in chosen]
+        ids = [r[0] for r in requirements]
+        dependencies = [(a, b) for a, b in PROJECT_DEPENDENCIES if a in ids and b in ids]
+        minimums = {r[0]: _round_up(r[2] * rng.uniform(0.8, 1.2), 100) for r in requirements}
+        
+        # List-schedule in pool order (which respects dependencies) to get the reference timeline
+        finish: Dict[str, int] = {}
+        crew_free: Dict[str, int] = {}
+        schedule = []
+        for rid, _, _, weeks, crew in requirements:
+            start = max([finish[a] for a, b in dependencies if b == rid] + [crew_free.get(crew, 0)])
+            finish[rid] = crew_free[crew] = start + weeks
+            schedule.append({"id": rid, "start": start + 1, "end": start + weeks, "cost": minimums[rid]})
+        deadline = max(finish.values()) + (1 if size == 0 else 0)
+        
+        total = sum(minimums.values())
+        budget = _round_up(total * (1 + (0.3, 0.15, 0.1)[size]), 500)
+        options = [
+            _option(rid, name[0].upper() + name[1:], cost=None, duration=weeks, participants=[crew])
+            for rid, name, _, weeks, crew in requirements
+        ]
+        constraints = [
+            {"kind": "min_cost", "id": rid, "amount": minimums[rid],
+             "text": f"Allocate at least ${minimums[rid]:,} to the {name}."}
+            for rid, name, _, _, _ in requirements
+        ]
+        constraints.append({"kind": "budget", "limit": budget, "text": f"Total allocation must not exceed ${budget:,}."})
+        if size == 2 and budget * 0.95 >= total:
+            limit = int(budget * 0.95)
+            constraints.append({"kind": "budget", "limit": limit,
+                                "text": f"Keep at least 5% of the budget in reserve (allocate at most ${limit:,})."})
+        constraints.append({"kind": "within", "latest": deadline, "text": f"All work must finish by the end of week {deadline}."})
+        names = {r[0]: r[1] for r in requirements}
+        for a, b in dependencies:
+            constraints.append({"kind": "precedes", "first": [a], "second": [b],
+                                "text": f"The {names[a]} must finish before the {names[b]} starts."})
+        crews = sorted({r[4] for r in requirements})
+        for crew in crews:
+            members = [r[0] for r in requirements if r[4] == crew]
+            if len(members) > 1:
+                constraints.append({"kind": "no_overlap", "participant": crew,
+                                    "text": f"The {crew} can only work on one item at a time."})
+        
+        scenario = {"unit": "week", "options": options, "constraints": constraints}
+        intro = template.skeleton.render(
+            project_type=project_type,
+            budget=f"{budget:,}",
+            duration=f"{deadline} weeks",
+            requirements=_join(list(names.values()))
+        )
+        return intro, scenario, {"schedule": schedule, "total_cost": total}
+    
+    def _team_coordination(self, template: Template, size: int):
+        """Schedule meetings for team members with limited availability."""
+        rng = self.rng
+        activity_type = rng.choice(template.variables.get("activity_type") or ["meetings"])
+        activity = activity_type[:-1] if activity_type.endswith("s") else activity_type
+        members = ["P", "Q", "R", "S", "T", "U"][:3 + size]
+        availability = {member: rng.choice(AVAILABILITY) for member in members}
+        
+        meetings = []
+        for i in range(2 + size):
+            participants = sorted(rng.sample(members, rng.choice([2, 2, 3])))
+            meetings.append(_option(
+                f"M{i + 1}", f"{activity[0].upper()}{activity[1:]} with {_join(participants)}",
+                duration=rng.choice([30, 60, 60, 90]), participants=participants
+            ))
+        
+        constraints = [
+            {"kind": "required", "id": m["id"], "text": f"Schedule {m['id']}."}
+            for m in meetings
+        ]
+        constraints.append({"kind": "within", "earliest": 9 * 60, "latest": 17 * 60, "days": [1],
+                            "text": "Everything happens on day 1 between 9:00 and 17:00."})
+        for member in members:
+            description, windows = availability[member]
+            constraints.append({"kind": "availability", "participant": member, "windows": windows,
+                                "text": f"{member} is available {description}."})
+            constraints.append({"kind": "no_overlap", "participant": member,
+                                "text": f"{member} can't attend two {activity_type} at once."})
+        
+        schedule = self._assign_slots(meetings, availability)
+        if schedule is None:
+            return None
+        if size == 2:
+            # Add an ordering rule that the found schedule already satisfies
+            ordered = [
+                (a["id"], b["id"]) for a, b in itertools.permutations(schedule, 2)
+                if parse_clock(a["end"]) <= parse_clock(b["start"])
+            ]
+            if ordered:
+                first, second = rng.choice(ordered)
+                constraints.append({"kind": "precedes", "first": [first], "second": [second],
+                                    "text": f"{first} must end before {second} starts."})
+        
+        scenario = {"unit": "clock", "options": meetings, "constraints": constraints}
+        intro = template.skeleton.render(
+            activity_type=activity_type,
+            team_size=len(members),
+            member_names=", ".join(members),
+            constraints="; ".join(
+                f"({i}) {member} is available {availability[member][0]}"
+                for i, member in enumerate(members, 1)
+            ),
+            goal="Plan the schedule for one day."
+        )
+        return intro, scenario, {"schedule": schedule}
+    
+    @staticmethod
+    def _assign_slots(
+        meetings: List[Dict[str, Any]],
+        availability: Dict[str, Tuple[str, List[List[int]]]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Backtracking search for half-hour start times that fit everyone's availability."""
+        placed: List[Tuple[Dict[str, Any], int]] = []
+        
+        def fits(meeting: Dict[str, Any], start: int) -> bool:
+            end = start + meeting["duration"]
+            for member in meeting["participants"]:
+                if not any(low <= start and end <= high for low, high in availability[member][1]):
+                    return False
+            for other, other_start in placed:
+                shared = set(other["participants"]) & set(meeting["participants"])
+                if shared and start < other_start + other["duration"] and other_start < end:
+                    return False
+            return True
+        
+        def place(index: int) -> bool:
+            if index == len(meetings):
+                return True
+            meeting = meetings[index]
+            for start in range(9 * 60, 17 * 60 - meeting["duration"] + 1, 30):
+                if fits(meeting, start):
+                    placed.append((meeting, start))
+                    if place(index + 1):
+                        return True
+                    placed.pop()
+            return False
+        
+        if not place(0):
+            return None
+        return [_slot_entry(meeting, 1, start) for meeting, start in placed]
+    
+    async def evaluate_response(
+        self,
+        example: TaskExample,
+        model_response: str,
+        model_name: str
+    ) -> TaskResult:
+        """Check the plan locally, then have the judge score only its explanation."""
+        scenario = (example.metadata or {})["scenario"]
+        try:
+            plan = extract_json(model_response, required=PLAN_FIELDS, name="plan")
+        except ValueError as e:
+            return TaskResult(
+                example_id=example.id,
+                model_name=model_name,
+                model_output=model_response,
+                is_correct=False,
+                reasoning_quality=0.0,
+                metrics={"plan_feasibility": 0.0, "constraint_satisfaction": 0.0},
+                metadata={"error": str(e)}
+            )
+        
+        report = await self.run_blocking(PlanChecker(scenario).check, plan)
+        metrics = {
+            "plan_feasibility": float(report.feasible),
+            "constraint_satisfaction": report.satisfaction
+        }
+        metadata = {
+            "plan_cost": report.total_cost,
+            "violations": report.violations
+        }
+        
+        judge_prompt = JUDGE_PROMPT.render(
+            scenario=example.input,
+            schedule=json.dumps(plan.get("schedule")),
+            explanation=plan.get("explanation", ""),
+            check="all rules satisfied" if report.feasible else "; ".join(report.violations)
+        )
+        
+        try:
+            judge_response = await self.openai_client.generate(
+                prompt=judge_prompt,
+                model=self.judge_model,
+                max_tokens=200,
+                temperature=self.judge_temperature,
+                json_mode=True
+            )
+            evaluation = extract_json(judge_response.text, required=JUDGE_FIELDS, name="planning_judge")
+            metrics["explanation_quality"] = float(evaluation["explanation_quality"])
+            metadata["judge_comment"] = evaluation.get("comment", "")
+        except Exception as e:
+            print(f"Error parsing judge response: {str(e)}")
+            metadata["error"] = str(e)
+        
+        return TaskResult(
+            example_id=example.id,
+            model_name=model_name,
+            model_output=model_response,
+            is_correct=report.feasible,
+            # Graded by the checker rather than a judge
+            reasoning_quality=report.satisfaction,
+            metrics=metrics,
+            metadata=metadata
+        )
+    
+    def normalize_answer(self, example: TaskExample, response: str) -> Optional[str]:
+        """
+        The plan's schedule and total as canonical JSON.
+        
+        Samples with the same plan share one check and one explanation
+        judgement.
+        """
+        try:
+            plan = extract_json(response, required=PLAN_FIELDS, name="plan_vote")
+        except ValueError:
+            return None
+        return json.dumps(
+            {"schedule": plan["schedule"], "total_cost": plan.get("total_cost")},
+            sort_keys=True,
+            default=str
+        )
+    
+    def get_prompt(self, example: TaskExample) -> str:
+        """Generate the prompt for a planning scenario."""
+        scenario = (example.metadata or {}).get("scenario", {})
+        unit = "week" if scenario.get("unit") == "week" else "clock"
+        return PLAN_PROMPTS[unit].render(scenario=example.input)
+    
+    def validate_example(self, example: TaskExample) -> Tuple[bool, Optional[str]]:
+        """Check that the stored reference plan is feasible."""
+        scenario = (example.metadata or {}).get("scenario")
+        if not scenario:
+            return False, "Missing scenario structure"
+        
+        report = PlanChecker(scenario).check(json.loads(example.expected_output))
+        if not report.feasible:
+            return False, f"Reference plan is infeasible: {'; '.join(report.violations)}"
+        
+        return True, None
\ No newline at end of file
@@ -0,0 +1,120 @@
+import importlib
+from importlib import metadata
+from typing import Any, Callable, Dict, List, Mapping, Optional, Type
+
+from .base import BaseTask, ResourceProfile
+
+# Entry point group third-party packages register tasks under
+ENTRY_POINT_GROUP = "reasoning_evals.tasks"
+
+# Tasks shipped with the package: name -> (module relative to this package, class name)
+BUILTIN_TASKS = {
+    "stem": (".stem", "STEMTask"),
+    "logical_puzzles": (".logical", "LogicalPuzzlesTask"),
+    "coding": (".coding", "CodingTask"),
+    "planning": (".planning", "PlanningTask")
+}
+
+def _entry_points(group: str) -> List[Any]:
+    points = metadata.entry_points()
+    if hasattr(points, "select"):
+        return list(points.select(group=group))
+    # Python < 3.10 returns a dict of group -> entry points
+    return list(points.get(group, []))
+
+class TaskRegistry:
+    """
+    Registry of evaluation tasks, discovered lazily.
+    
+    Built-in tasks and tasks registered by installed packages under the
+    `reasoning_evals.tasks` entry point group are known by name without
+    importing them; a task's module is only imported when the task is
+    first looked up or created. Built-in names take precedence over entry
+    points with the same name.
+    """
+    
+    def __init__(self, include_entry_points: bool = True):
+        """
+        Initialize the registry.
+        
+        Args:
+            include_entry_points: Whether to discover tasks from installed packages
+        """
+        self.include_entry_points = include_entry_points
+        self._loaders: Optional[Dict[str, Callable[[], Type[BaseTask]]]] = None
+        self._classes: Dict[str, Type[BaseTask]] = {}
+    
+    def _discover(self) -> Dict[str, Callable[[], Type[BaseTask]]]:
+        if self._loaders is not None:
+            return self._loaders
+        
+        loaders: Dict[str, Callable[[], Type[BaseTask]]] = {}
+        if self.include_entry_points:
+            try:
+                for point in _entry_points(ENTRY_POINT_GROUP):
+                    loaders[point.name] = point.load
+            except Exception as e:
+                print(f"Warning: Could not read task entry points: {str(e)}")
+        
+        for name, (module, class_name) in BUILTIN_TASKS.items():
+            loaders[name] = (
+                lambda module=module, class_name=class_name:
+                getattr(importlib.import_module(module, __package__), class_name)
+            )
+        
+        self._loaders = loaders
+        return loaders
+    
+    def register(self, name: str, task_class: Type[BaseTask]) -> None:
+        """Register a task class directly (e.g. from a script or notebook)."""
+        self._discover()[name] = lambda: task_class
+    
+    def names(self) -> List[str]:
+        """Names of every available task, without importing any of them."""
+        return sorted(self._discover())
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._discover()
+    
+    def get(self, name: str) -> Type[BaseTask]:
+        """
+        Look up a task class, importing its module on first use.
+        
+        Args:
+            name: Task name
+        
+        Returns:
+            The task class
+        
+        Raises:
+            KeyError: If no task with that name is registered
+        """
+        if name not in self._classes:
+            loaders = self._discover()
+            if name not in loaders:
+                raise KeyError(f"Unknown task: {name}")
+            self._classes[name] = loaders[name]()
+        return self._classes[name]
+    
+    def profile(self, name: str) -> ResourceProfile:
+        """Resource profile declared by a task."""
+        return self.get(name).resource_profile
+    
+    def create(
+        self,
+        name: str,
+        config: Dict[str, Any],
+        clients: Optional[Mapping[str, Any]] = None
+    ) -> BaseTask:
+        """
+        Create a task.
+        
+        Args:
+            name: Task name
+            config: Task configuration dictionary
+            clients: Shared client manager (or clients by provider), injected into the task
+        
+        Returns:
+            The task instance
+        """
+        return self.get(name)(config, clients=clients)
\ No newline at end of file
@@ -0,0 +1,616 @@
+import asyncio
+import contextlib
+import dis
+import errno
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import signal
+import site
+import sys
+import tempfile
+import time
+import types
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; limits are then wall-clock only
+    resource = None
+
+# Seconds the parent waits beyond a submission's own limits before killing the worker
+PARENT_GRACE_SECONDS = 5.0
+MAX_FAILURE_MESSAGES = 5
+
+# unshare(2) flags for a private user and network namespace
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+# Audit architecture, execve and execveat syscall numbers, for the seccomp filter
+EXEC_SYSCALLS = {
+    "x86_64": (0xC000003E, 59, 322),
+    "aarch64": (0xC00000B7, 221, 281)
+}
+
+# Environment variables a worker keeps; everything else (API keys, values
+# loaded from .env) is dropped before it runs any submission
+ENV_ALLOWLIST = {"PATH", "HOME", "LANG", "LANGUAGE", "TZ", "TMPDIR", "TEMP", "TMP", "PYTHONHASHSEED"}
+
+# Audit events refused outright: network, processes, native calls and
+# changes to files, their permissions or the working directory
+DENIED_EVENTS = (
+    "socket.",
+    "subprocess.",
+    "os.system",
+    "os.exec",
+    "os.spawn",
+    "os.posix_spawn",
+    "os.fork",
+    "os.forkpty",
+    "os.kill",
+    "os.killpg",
+    "ctypes.",
+    "os.remove",
+    "os.rename",
+    "os.rmdir",
+    "shutil.rmtree",
+    "os.chmod",
+    "os.chown",
+    "os.chflags",
+    "os.link",
+    "os.symlink",
+    "os.chdir"
+)
+
+# Function attributes whose replacement would change what the audit hook does
+HOOK_ATTRIBUTES = ("__defaults__", "__kwdefaults__")
+
+# os.open flags that write to or create a file
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+
+class SandboxTimeout(BaseException):
+    """
+    Raised inside a worker when a submission exceeds its time limit.
+    
+    Derives from BaseException so `except Exception` in submitted code
+    can't swallow it.
+    """
+    pass
+
+@dataclass
+class ExecutionResult:
+    """
+    Outcome of running a submission against hidden tests.
+    
+    Attributes:
+        passed: Number of tests passed
+        total: Number of tests
+        failures: Messages for the first few failing tests
+        error: Error that stopped the submission (e.g. a syntax error)
+        timed_out: Whether the submission hit a time limit
+        coverage: Fraction of the submission's lines executed by the tests
+        runtimes: Best runtime in seconds per benchmark input size
+    """
+    passed: int = 0
+    total: int = 0
+    failures: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    timed_out: bool = False
+    coverage: Optional[float] = None
+    runtimes: Dict[int, float] = field(default_factory=dict)
+    
+    @property
+    def pass_rate(self) -> float:
+        return self.passed / self.total if self.total else 0.0
+    
+    @property
+    def all_passed(self) -> bool:
+        return self.total > 0 and self.passed == self.total
+
+class _Discard(io.TextIOBase):
+    """Stdout replacement that drops whatever a submission prints."""
+    
+    def write(self, text: str) -> int:
+        return len(text)
+
+def _raise_timeout(signum, frame):
+    raise SandboxTimeout("Time limit exceeded")
+
+def _unshare_network() -> bool:
+    """
+    Move this process into a new network namespace, which has no interfaces.
+    
+    The isolation is enforced by the kernel, so it holds for C extensions
+    and raw `_socket` use alike. Needs Linux with unprivileged user
+    namespaces.
+    
+    Returns:
+        Whether the process is now isolated
+    """
+    if hasattr(os, "unshare"):
+        try:
+            os.unshare(CLONE_NEWUSER | CLONE_NEWNET)
+            return True
+        except OSError:
+            return False
+    if not sys.platform.startswith("linux"):
+        return False
+    # Python < 3.12 has no os.unshare; call libc directly
+    try:
+        import ctypes
+        return ctypes.CDLL(None, use_errno=True).unshare(CLONE_NEWUSER | CLONE_NEWNET) == 0
+    except (OSError, AttributeError):
+        return False
+
+def _deny_exec() -> bool:
+    """
+    Make execve fail in this process and any it forks, with a seccomp filter.
+    
+    `_posixsubprocess.fork_exec` raises no audit event, so the audit hook
+    alone can't stop a submission from running a program outside the
+    sandbox. Linux on x86_64 or aarch64 only.
+    
+    Returns:
+        Whether the filter is installed
+    """
+    arch = EXEC_SYSCALLS.get(platform.machine())
+    if arch is None or not sys.platform.startswith("linux"):
+        return False
+    audit_arch, execve, execveat = arch
+    allow, deny = 0x7FFF0000, 0x00050000 | errno.EPERM
+    # (code, jump if true, jump if false, k): check the architecture, then
+    # the syscall number; x32 syscalls (bit 30 set) are refused as well
+    program = [
+        (0x20, 0, 0, 4),
+        (0x15, 1, 0, audit_arch),
+        (0x06, 0, 0, allow),
+        (0x20, 0, 0, 0),
+        (0x35, 3, 0, 0x40000000),
+        (0x15, 2, 0, execve),
+        (0x15, 1, 0, execveat),
+        (0x06, 0, 0, allow),
+        (0x06, 0, 0, deny)
+    ]
+    try:
+        import ctypes
+        
+        class SockFilter(ctypes.Structure):
+            _fields_ = [("code", ctypes.c_ushort), ("jt", ctypes.c_ubyte), ("jf", ctypes.c_ubyte), ("k", ctypes.c_uint)]
+        
+        class SockFprog(ctypes.Structure):
+            _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.POINTER(SockFilter))]
+        
+        filters = (SockFilter * len(program))(*(SockFilter(*instruction) for instruction in program))
+        libc = ctypes.CDLL(None, use_errno=True)
+        # PR_SET_NO_NEW_PRIVS, then PR_SET_SECCOMP with SECCOMP_MODE_FILTER
+        if libc.prctl(38, 1, 0, 0, 0) != 0:
+            return False
+        return libc.prctl(22, 2, ctypes.byref(SockFprog(len(program), filters)), 0, 0) == 0
+    except (OSError, AttributeError):
+        return False
+
+def _make_audit_hook(scratch_dir: str) -> Any:
+    """
+    Build the hook that refuses a worker's network access, new processes,
+    native calls and file access outside its scratch directory.
+    
+    Files may be written only in `scratch_dir` (or by relative path, as the
+    working directory is pinned there) and read only there and in the
+    Python installation, so submissions can import the standard library
+    and installed packages but can't read the repository, `.env` or
+    another process's environment, nor change anything outside scratch.
+    
+    Audit hooks can't be removed once added. Everything the hook uses is
+    bound as a default argument when it is built, and replacing a
+    function's code, or the hook's defaults, is itself refused, so
+    submitted code can't rewrite what it checks by patching modules or
+    builtins.
+    """
+    scratch = tuple({os.path.realpath(scratch_dir).rstrip(os.sep) + os.sep, scratch_dir.rstrip(os.sep) + os.sep})
+    prefixes = {sys.prefix, sys.base_prefix, sys.exec_prefix, sys.base_exec_prefix, *site.getsitepackages()}
+    if site.ENABLE_USER_SITE:
+        prefixes.add(site.getusersitepackages())
+    readable = scratch + tuple(os.path.realpath(prefix).rstrip(os.sep) + os.sep for prefix in prefixes)
+    devices = ("/dev/null", "/dev/urandom", "/dev/random")
+    
+    def hook(
+        event: str,
+        args: Tuple[Any, ...],
+        scratch: Tuple[str, ...] = scratch,
+        readable: Tuple[str, ...] = readable,
+        devices: Tuple[str, ...] = devices,
+        denied: Tuple[str, ...] = DENIED_EVENTS,
+        hook_attributes: Tuple[str, ...] = HOOK_ATTRIBUTES,
+        hook_file: str = __file__,
+        write_flags: int = WRITE_FLAGS,
+        str_type: type = str,
+        bytes_type: type = bytes,
+        int_type: type = int,
+        function_type: type = types.FunctionType,
+        error: type = PermissionError
+    ) -> None:
+        if event.startswith(denied):
+            raise error(f"{event} is not allowed in the sandbox")
+        if event in ("object.__setattr__", "object.__delattr__"):
+            target, name = args[0], args[1]
+            if name == "__code__" or (
+                name in hook_attributes
+                and target.__class__ is function_type
+                and target.__code__.co_name == "hook"
+                and target.__code__.co_filename == hook_file
+            ):
+                raise error(f"{event} of {name} is not allowed in the sandbox")
+            return
+        if event not in ("open", "os.mkdir", "os.truncate"):
+            return
+        
+        path = args[0]
+        if path.__class__ is int_type:
+            # An already open descriptor, checked when it was opened
+            return
+        if path.__class__ is bytes_type:
+            path = path.decode("utf-8", "surrogateescape")
+        elif path.__class__ is not str_type:
+            # A path-like object could name a different file each time it is asked
+            raise error(f"{event} of a {path.__class__.__name__} is not allowed in the sandbox")
+        
+        if event == "open":
+            mode, flags = args[1], args[2]
+            # os.open passes no mode and may be relative to an arbitrary dir_fd
+            writing = bool(flags & write_flags) or (mode is not None and ("w" in mode or "a" in mode or "x" in mode or "+" in mode))
+            relative_ok = mode is not None or not writing
+        else:
+            # os.mkdir also passes its dir_fd (-1 for none)
+            writing = True
+            relative_ok = event == "os.truncate" or args[2] == -1
+        
+        if ".." in path.split("/"):
+            raise error(f"{event} of paths containing '..' is not allowed in the sandbox")
+        if path.startswith("/"):
+            allowed = scratch if writing else readable
+            if path.startswith(allowed) or path in devices:
+                return
+        elif relative_ok:
+            return
+        raise error(f"{event} of {path} is not allowed in the sandbox")
+    
+    return hook
+
+def _init_worker(memory_limit_mb: int, cpu_budget_seconds: int, file_size_limit_mb: int) -> Optional[str]:
+    """
+    Apply process-wide limits once when a worker interpreter starts.
+    
+    Returns:
+        An error if the worker can't be isolated and must not run
+        submissions, else None
+    """
+    # The worker starts with the parent's environment; drop the secrets in it
+    for name in list(os.environ):
+        if name not in ENV_ALLOWLIST and not name.startswith("LC_"):
+            del os.environ[name]
+    
+    scratch_dir = tempfile.mkdtemp(prefix="sandbox_")
+    os.chdir(scratch_dir)
+    # Imports by submissions must not try to write bytecode caches
+    sys.dont_write_bytecode = True
+    
+    _unshare_network()
+    # Before the audit hook, which refuses ctypes
+    _deny_exec()
+    if not hasattr(sys, "addaudithook"):
+        return "Sandbox audit hooks are unavailable; refusing to run untrusted code"
+    sys.addaudithook(_make_audit_hook(scratch_dir))
+    
+    if resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        # Hard CPU limit covers the worker's whole lifetime; each task moves the soft limit
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_budget_seconds, cpu_budget_seconds))
+        size = file_size_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_FSIZE, (size, size))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        # No child processes (not enforced for root; _deny_exec covers
+        # programs started through _posixsubprocess, which isn't audited)
+        if hasattr(resource, "RLIMIT_NPROC"):
+            with contextlib.suppress(ValueError, OSError):
+                resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+        signal.signal(signal.SIGXCPU, _raise_timeout)
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    return None
+
+def _worker_main(conn, memory_limit_mb: int, cpu_budget_seconds: int, file_size_limit_mb: int) -> None:
+    """Run submissions received over `conn` until the parent closes it."""
+    error = _init_worker(memory_limit_mb, cpu_budget_seconds, file_size_limit_mb)
+    while True:
+        try:
+            args = conn.recv()
+        except (EOFError, OSError):
+            return
+        if error is not None:
+            result = ExecutionResult(total=len(args[1]), error=error)
+        else:
+            try:
+                result = _run_submission(*args)
+            except BaseException as e:
+                result = ExecutionResult(total=len(args[1]), error=f"Sandbox error: {type(e).__name__}: {str(e)[:200]}")
+        conn.send(result)
+
+@contextlib.contextmanager
+def _time_limit(seconds: float):
+    """Limit the enclosed block's wall-clock and CPU time."""
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (min(soft, hard), hard))
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if resource is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+def _normalize(value: Any) -> Any:
+    """Convert a result to plain JSON types (tuples become lists, sets sorted lists)."""
+    if isinstance(value, (set, frozenset)):
+        value = sorted(value, key=repr)
+    return json.loads(json.dumps(value, default=repr))
+
+def _matches(actual: Any, expected: Any) -> bool:
+    if isinstance(expected, float) or isinstance(actual, float):
+        try:
+            return math.isclose(float(actual), float(expected), rel_tol=1e-6, abs_tol=1e-9)
+        except (TypeError, ValueError):
+            return False
+    if isinstance(expected, list) and isinstance(actual, list):
+        return len(actual) == len(expected) and all(map(_matches, actual, expected))
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return actual.keys() == expected.keys() and all(_matches(actual[k], expected[k]) for k in expected)
+    return actual == expected
+
+def _executable_lines(code_object) -> set:
+    lines = {line for _, line in dis.findlinestarts(code_object) if line}
+    for const in code_object.co_consts:
+        if isinstance(const, types.CodeType):
+            lines |= _executable_lines(const)
+    return lines
+
+def _run_submission(
+    code: str,
+    tests: List[Dict[str, Any]],
+    benchmark: Optional[Dict[str, Any]],
+    time_limit: float,
+    benchmark_time_limit: float
+) -> ExecutionResult:
+    """Run a submission and its hidden tests inside a sandbox worker."""
+    import sys
+    
+    result = ExecutionResult(total=len(tests))
+    namespace: Dict[str, Any] = {"__name__": "__submission__"}
+    executed = set()
+    
+    def trace(frame, event, arg):
+        if frame.f_code.co_filename == "<submission>":
+            if event == "line":
+                executed.add(frame.f_lineno)
+            return trace
+        return None
+    
+    try:
+        compiled = compile(code, "<submission>", "exec")
+    except SyntaxError as e:
+        result.error = f"SyntaxError: {e.msg} (line {e.lineno})"
+        return result
+    
+    try:
+        with _time_limit(time_limit), contextlib.redirect_stdout(_Discard()):
+            sys.settrace(trace)
+            try:
+                exec(compiled, namespace)
+                for i, test in enumerate(tests):
+                    try:
+                        actual = _normalize(eval(test["call"], namespace))
+                    except SandboxTimeout:
+                        raise
+                    except BaseException as e:
+                        if len(result.failures) < MAX_FAILURE_MESSAGES:
+                            result.failures.append(f"Test {i}: {type(e).__name__}: {str(e)[:200]}")
+                        continue
+                    if _matches(actual, test.get("expected")):
+                        result.passed += 1
+                    elif len(result.failures) < MAX_FAILURE_MESSAGES:
+                        result.failures.append(
+                            f"Test {i}: {test['call']} returned {str(actual)[:100]}, "
+                            f"expected {str(test.get('expected'))[:100]}"
+                        )
+            finally:
+                sys.settrace(None)
+    except SandboxTimeout:
+        result.timed_out = True
+        result.error = "Time limit exceeded"
+        return result
+    except BaseException as e:
+        result.error = f"{type(e).__name__}: {str(e)[:200]}"
+        return result
+    
+    lines = _executable_lines(compiled)
+    result.coverage = len(executed & lines) / len(lines) if lines else None
+    
+    # Only time solutions that are correct; timings of wrong code mean nothing
+    if benchmark and result.all_passed:
+        try:
+            with _time_limit(benchmark_time_limit), contextlib.redirect_stdout(_Discard()):
+                call = compile(benchmark["call"], "<benchmark>", "eval")
+                for n in benchmark.get("sizes", []):
+                    best = math.inf
+                    for _ in range(benchmark.get("repeats", 3)):
+                        start = time.perf_counter()
+                        eval(call, {**namespace, "n": n})
+                        best = min(best, time.perf_counter() - start)
+                    result.runtimes[n] = best
+        except SandboxTimeout:
+            result.timed_out = True
+        except BaseException as e:
+            result.error = f"Benchmark failed: {type(e).__name__}: {str(e)[:200]}"
+    
+    return result
+
+class _Worker:
+    """A sandbox worker process and the parent's end of its pipe."""
+    
+    def __init__(self, ctx, initargs: Tuple[int, int, int]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, *initargs), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.submissions = 0
+    
+    def kill(self) -> None:
+        """Stop the worker, whatever it is doing."""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class CodeSandbox:
+    """
+    Pool of warm, resource-limited interpreters for running untrusted code.
+    
+    Workers are spawned on demand and reused across submissions; each one
+    is replaced after `max_tasks_per_child` submissions so leaked state and
+    its lifetime CPU budget don't accumulate. Inside a worker, submissions
+    run with an address-space limit, a CPU and wall-clock time limit, no
+    network access, no child processes, no secrets in their environment,
+    and write access only to a private scratch directory.
+    Time limits are enforced in the worker where Python code can be
+    interrupted; if a worker still hasn't answered after the limits plus
+    a grace period (e.g. stuck in a long C call), the parent kills it and
+    starts a replacement for the next submission.
+    
+    One sandbox is meant to be shared by a whole process: the pipeline
+    creates it for tasks with the SANDBOX resource profile and closes it
+    on shutdown.
+    """
+    
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        memory_limit_mb: int = 512,
+        time_limit: float = 10.0,
+        benchmark_time_limit: float = 10.0,
+        max_tasks_per_child: int = 50,
+        file_size_limit_mb: int = 16
+    ):
+        """
+        Initialize the sandbox; worker processes start on first use.
+        
+        Args:
+            processes: Number of worker processes (default: CPU count)
+            memory_limit_mb: Address-space limit per worker
+            time_limit: Seconds allowed for loading a submission and running its tests
+            benchmark_time_limit: Seconds allowed for the efficiency benchmark
+            max_tasks_per_child: Submissions a worker runs before it is replaced
+            file_size_limit_mb: Largest file a submission may write
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.memory_limit_mb = memory_limit_mb
+        self.time_limit = time_limit
+        self.benchmark_time_limit = benchmark_time_limit
+        self.max_tasks_per_child = max_tasks_per_child
+        self.file_size_limit_mb = file_size_limit_mb
+        self._ctx = multiprocessing.get_context("spawn")
+        # Idle workers; None stands for a slot whose worker hasn't started yet
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_Worker] = []
+    
+    @classmethod
+    def from_config(cls, settings: Dict[str, Any], processes: Optional[int] = None) -> "CodeSandbox":
+        """
+        Create a sandbox from a task's `sandbox` config section.
+        
+        Args:
+            settings: Limits; a `processes` entry overrides `processes`
+            processes: Number of worker processes when the config sets none
+        """
+        return cls(
+            processes=settings.get("processes") or processes,
+            memory_limit_mb=settings.get("memory_limit_mb", 512),
+            time_limit=settings.get("time_limit", 10.0),
+            benchmark_time_limit=settings.get("benchmark_time_limit", 10.0),
+            max_tasks_per_child=settings.get("max_tasks_per_child", 50),
+            file_size_limit_mb=settings.get("file_size_limit_mb", 16)
+        )
+    
+    def _start_worker(self) -> _Worker:
+        cpu_budget = int((self.time_limit + self.benchmark_time_limit + 1) * self.max_tasks_per_child) + 10
+        worker = _Worker(self._ctx, (self.memory_limit_mb, cpu_budget, self.file_size_limit_mb))
+        self._workers.append(worker)
+        return worker
+    
+    def _retire(self, worker: _Worker) -> None:
+        worker.kill()
+        if worker in self._workers:
+            self._workers.remove(worker)
+    
+    async def _acquire(self) -> _Worker:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.processes):
+                self._idle.put_nowait(None)
+        worker = await self._idle.get()
+        if worker is not None and not worker.process.is_alive():
+            self._retire(worker)
+            worker = None
+        return worker or self._start_worker()
+    
+    async def run(
+        self,
+        code: str,
+        tests: List[Dict[str, Any]],
+        benchmark: Optional[Dict[str, Any]] = None
+    ) -> ExecutionResult:
+        """
+        Run a submission against hidden tests in a sandbox worker.
+        
+        Args:
+            code: Python source defining the solution
+            tests: Hidden tests as {"call": expression, "expected": JSON value}
+            benchmark: Optional {"call": expression using n, "sizes": [...]}
+                used to time the solution on scaled inputs
+        
+        Returns:
+            ExecutionResult for the submission
+        """
+        loop = asyncio.get_running_loop()
+        worker = await self._acquire()
+        answered = False
+        try:
+            worker.conn.send((code, tests, benchmark, self.time_limit, self.benchmark_time_limit))
+            timeout = self.time_limit + (self.benchmark_time_limit if benchmark else 0) + PARENT_GRACE_SECONDS
+            if not await loop.run_in_executor(None, worker.conn.poll, timeout):
+                return ExecutionResult(total=len(tests), timed_out=True, error="Sandbox worker did not respond")
+            result = worker.conn.recv()
+            answered = True
+            return result
+        except (EOFError, OSError) as e:
+            # The worker died, e.g. killed by the kernel at its CPU limit
+            return ExecutionResult(total=len(tests), error=f"Sandbox worker died: {str(e) or type(e).__name__}")
+        finally:
+            worker.submissions += 1
+            # A worker that didn't answer may still be running the submission
+            if not answered or worker.submissions >= self.max_tasks_per_child:
+                self._retire(worker)
+                worker = None
+            if self._idle is not None:
+                self._idle.put_nowait(worker)
+    
+    def close(self) -> None:
+        """Stop the worker processes."""
+        for worker in self._workers:
+            worker.kill()
+        self._workers.clear()
+        self._idle = None
\ No newline at end of file
@@ -1,111 +1,249 @@
-import json
 import random
 import uuid
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
-from ..api.openai_client import OpenAIClient
-from .base import BaseTask, TaskExample, TaskResult
+from ..utils.parsing import extract_json
+from ..utils.prompts import PromptLayout
+from ..utils.templates import Template, get_registry
+from .base import JUDGE_HEAVY, BaseTask, TaskExample, TaskResult
+from .example_pool import ExamplePool
+
+# Fields the judge must return for a verdict to be usable
+JUDGE_FIELDS = {
+    "is_correct": bool,
+    "reasoning_quality": (int, float),
+    "step_clarity": (int, float)
+}
+
+# Fixed instructions lead every prompt so providers can cache them across examples
+SOLVE_PROMPT = PromptLayout(
+    """
+    Solve the STEM problem below. Show your work step by step.
+    
+    Format your response:
+    1. First, explain your approach
+    2. Show each step of your solution
+    3. Clearly state your final answer on the last line as "Answer: <final answer>"
+    """,
+    """
+    Category: {category}
+    
+    Problem:
+    {problem}
+    """
+)
+
+JUDGE_PROMPT = PromptLayout(
+    """
+    Evaluate a model's response to a STEM problem. The problem, its expected
+    answer and the model's response are given after these instructions.
+    
+    Evaluate the following aspects:
+    1. Correctness (Is the final answer correct?)
+    2. Reasoning Quality (Scale 0-1, how clear and logical is the reasoning?)
+    3. Step-by-Step Clarity (Scale 0-1, how well are the steps explained?)
+    
+    Format your response as JSON:
+    {
+        "is_correct": true/false,
+        "reasoning_quality": float,
+        "step_clarity": float,
+        "explanation": "Brief explanation of the evaluation"
+    }
+    """,
+    """
+    Problem:
+    {problem}
+    
+    Expected Answer:
+    {expected}
+    
+    Model's Response:
+    {response}
+    """
+)
+
+GENERATION_PROMPT = PromptLayout(
+    """
+    Generate a STEM problem based on the template given below, at the
+    requested difficulty and category.
+    
+    The problem should:
+    1. Be clearly stated
+    2. Have a unique correct answer
+    3. Require multi-step reasoning
+    4. Include all necessary information
+    
+    Format:
+    Problem: [problem text]
+    Solution: [detailed step-by-step solution]
+    Answer: [final numerical or symbolic answer]
+    """,
+    """
+    Difficulty: {difficulty}
+    Category: {category}
+    
+    Template:
+    {template}
+    """
+)
 
 class STEMTask(BaseTask):
     """Implementation of STEM problem-solving task."""
     
-    def __init__(self, config: Dict[str, Any]):
-        super().__init__("stem", config)
+    resource_profile = JUDGE_HEAVY
+    
+    def __init__(self, config: Dict[str, Any], clients: Optional[Mapping[str, Any]] = None):
+        super().__init__("stem", config, clients)
         self.categories = config.get("categories", [])
         self.difficulty_levels = config.get("difficulty_levels", [])
         self.judge_model = config.get("evaluation", {}).get("judge_model", "gpt-4")
-        self.openai_client = OpenAIClient()
+        # Deterministic judging also lets identical concurrent judge calls be coalesced
+        self.judge_temperature = config.get("evaluation", {}).get("judge_temperature", 0.0)
+        self.openai_client = self.clients["openai"]
+        self.rng = random.Random(config.get("seed"))
         
         # Load templates
-        self.templates = self._load_templates()
+        self.templates = self._load_templates(config.get("templates_dir", "data/templates"))
+        
+        # Persistent pool of previously generated examples
+        pool_config = config.get("example_pool", {})
+        self.example_pool = ExamplePool(
+            task_name=self.task_name,
+            pool_dir=pool_config.get("dir", "data/pools"),
+            near_duplicate_threshold=pool_config.get("near_duplicate_threshold", 0.8),
+            seed=config.get("seed")
+        ) if pool_config.get("enabled", True) else None
     
-    def _load_templates(self) -> Dict[str, List[Dict[str, Any]]]:
-        """Load problem templates from JSON files."""
+    def _load_templates(self, templates_dir: str) -> Dict[str, List[Template]]:
+        """Look up each category's problem templates in the shared registry."""
+        registry = get_registry(templates_dir)
         templates = {}
         for category in self.categories:
-            try:
-                with open(f"data/templates/stem/{category}.json", "r") as f:
-                    templates[category] = json.load(f)
-            except FileNotFoundError:
+            templates[category] = registry.templates("stem", category)
+            if not templates[category]:
                 print(f"Warning: No templates found for category {category}")
-                templates[category] = []
         return templates
     
     async def generate_examples(self, num_examples: int) -> List[TaskExample]:
-        """Generate synthetic STEM problems."""
+        """
+        Generate a stratified sample of STEM problems.
+        
+        The sample is split evenly across (category, difficulty) cells. Each
+        cell is filled from the example pool first, and only the shortfall is
+        generated; new problems that duplicate pooled ones are discarded.
+        """
+        categories = [c for c in self.categories if self.templates.get(c)]
+        if not categories:
+            print("Warning: No templates available for any STEM category")
+            return []
+        
+        if self.example_pool is None:
+            plan = {}
+            cells = [(c, d) for c in categories for d in self.difficulty_levels]
+            for i in range(num_examples):
+                cell = cells[i % len(cells)]
+                plan[cell] = plan.get(cell, 0) + 1
+        else:
+            plan = self.example_pool.plan_cells(num_examples, categories, self.difficulty_levels)
+        
         examples = []
-        for _ in range(num_examples):
-            category = random.choice(self.categories)
-            difficulty = random.choice(self.difficulty_levels)
-            
-            # Get template
-            template = random.choice(self.templates[category])
-            
-            # Generate problem using GPT-4
-            prompt = f"""
-            Generate a {difficulty} {category} problem based on this template:
-            {template['structure']}
-            
-            The problem should:
-            1. Be clearly stated
-            2. Have a unique correct answer
-            3. Require multi-step reasoning
-            4. Include all necessary information
-            
-            Format:
-            Problem: [problem text]
-            Solution: [detailed step-by-step solution]
-            Answer: [final numerical or symbolic answer]
-            """
-            
-            response = await self.openai_client.generate(
-                prompt=prompt,
-                model="gpt-4",
-                max_tokens=500
-            )
-            
-            # Parse response
-            lines = response.text.strip().split("\n")
-            problem = ""
-            solution = ""
-            answer = ""
+        for (category, difficulty), count in plan.items():
+            if self.example_pool is not None:
+                cell_examples = self.example_pool.sample(category, difficulty, count)
+            else:
+                cell_examples = []
             
-            current_section = None
-            for line in lines:
-                if line.startswith("Problem:"):
-                    current_section = "problem"
-                elif line.startswith("Solution:"):
-                    current_section = "solution"
-                elif line.startswith("Answer:"):
-                    current_section = "answer"
-                elif current_section == "problem":
-                    problem += line + "\n"
-                elif current_section == "solution":
-                    solution += line + "\n"
-                elif current_section == "answer":
-                    answer += line + "\n"
+            failed_attempts = 0
+            while len(cell_examples) < count and failed_attempts < count * 2:
+                template = self._next_template(category, difficulty)
+                example = await self._generate_example(category, difficulty, template)
+                
+                # Validate example
+                is_valid, error = self.validate_example(example)
+                if not is_valid:
+                    failed_attempts += 1
+                    print(f"Skipping invalid example: {error}")
+                    continue
+                
+                if self.example_pool is not None and not self.example_pool.add(example):
+                    failed_attempts += 1
+                    print(f"Skipping duplicate {difficulty} {category} example")
+                    continue
+                
+                cell_examples.append(example)
             
-            example = TaskExample(
-                id=str(uuid.uuid4()),
-                input=problem.strip(),
-                expected_output=answer.strip(),
-                metadata={
-                    "category": category,
-                    "difficulty": difficulty,
-                    "solution": solution.strip(),
-                    "template_id": template.get("id")
-                }
-            )
-            
-            # Validate example
-            is_valid, error = self.validate_example(example)
-            if is_valid:
-                examples.append(example)
-            else:
-                print(f"Skipping invalid example: {error}")
+            examples.extend(cell_examples)
         
+        self.rng.shuffle(examples)
         return examples
     
+    def _next_template(self, category: str, difficulty: str) -> Template:
+        """Pick the template with the fewest pooled examples in a cell."""
+        templates = self.templates[category]
+        if self.example_pool is None:
+            return self.rng.choice(templates)
+        
+        counts = [
+            self.example_pool.count(category, difficulty, template.id)
+            for template in templates
+        ]
+        least = min(counts)
+        return self.rng.choice([t for t, n in zip(templates, counts) if n == least])
+    
+    async def _generate_example(
+        self,
+        category: str,
+        difficulty: str,
+        template: Template
+    ) -> TaskExample:
+        """Generate a single STEM problem from a template."""
+        # Generate problem using GPT-4
+        prompt = GENERATION_PROMPT.render(
+            difficulty=difficulty,
+            category=category,
+            template=template.structure_json
+        )
+        
+        response = await self.openai_client.generate(
+            prompt=prompt,
+            model="gpt-4",
+            max_tokens=500
+        )
+        
+        # Parse response
+        lines = response.text.strip().split("\n")
+        problem = ""
+        solution = ""
+        answer = ""
+        
+        current_section = None
+        for line in lines:
+            if line.startswith("Problem:"):
+                current_section = "problem"
+            elif line.startswith("Solution:"):
+                current_section = "solution"
+            elif line.startswith("Answer:"):
+                current_section = "answer"
+            elif current_section == "problem":
+                problem += line + "\n"
+            elif current_section == "solution":
+                solution += line + "\n"
+            elif current_section == "answer":
+                answer += line + "\n"
+        
+        return TaskExample(
+            id=str(uuid.uuid4()),
+            input=problem.strip(),
+            expected_output=answer.strip(),
+            metadata={
+                "category": category,
+                "difficulty": difficulty,
+                "solution": solution.strip(),
+                "template_id": template.id
+            }
+        )
+    
     async def evaluate_response(
         self,
         example: TaskExample,
@@ -114,40 +252,26 @@ class STEMTask(BaseTask):
     ) -> TaskResult:
         """Evaluate a model's response to a STEM problem."""
         # Use GPT-4 as a judge
-        judge_prompt = f"""
-        Evaluate this response to a STEM problem.
-        
-        Problem:
-        {example.input}
-        
-        Expected Answer:
-        {example.expected_output}
-        
-        Model's Response:
-        {model_response}
-        
-        Evaluate the following aspects:
-        1. Correctness (Is the final answer correct?)
-        2. Reasoning Quality (Scale 0-1, how clear and logical is the reasoning?)
-        3. Step-by-Step Clarity (Scale 0-1, how well are the steps explained?)
-        
-        Format your response as JSON:
-        {{
-            "is_correct": true/false,
-            "reasoning_quality": float,
-            "step_clarity": float,
-            "explanation": "Brief explanation of the evaluation"
-        }}
-        """
+        judge_prompt = JUDGE_PROMPT.render(
+            problem=example.input,
+            expected=example.expected_output,
+            response=model_response
+        )
         
         judge_response = await self.openai_client.generate(
             prompt=judge_prompt,
             model=self.judge_model,
-            max_tokens=300
+            max_tokens=300,
+            temperature=self.judge_temperature,
+            json_mode=True
         )
         
         try:
-            evaluation = json.loads(judge_response.text)
+            evaluation = extract_json(
+                judge_response.text,
+                required=JUDGE_FIELDS,
+                name="stem_judge"
+            )
             
             return TaskResult(
                 example_id=example.id,
@@ -159,7 +283,7 @@ class STEMTask(BaseTask):
                     "step_clarity": evaluation["step_clarity"]
                 },
                 metadata={
-                    "judge_explanation": evaluation["explanation"]
+                    "judge_explanation": evaluation.get("explanation", "")
                 }
             )
         except Exception as e:
@@ -176,17 +300,10 @@ class STEMTask(BaseTask):
     
     def get_prompt(self, example: TaskExample) -> str:
         """Generate the prompt for a STEM problem."""
-        return f"""
-        Solve this {example.metadata['category']} problem. Show your work step by step.
-        
-        Problem:
-        {example.input}
-        
-        Format your response:
-        1. First, explain your approach
-        2. Show each step of your solution
-        3. Clearly state your final answer
-        """
+        return SOLVE_PROMPT.render(
+            category=example.metadata["category"],
+            problem=example.input
+        )
     
     def validate_example(self, example: TaskExample) -> Tuple[bool, Optional[str]]:
         """Validate a STEM problem example."""
@@ -0,0 +1,19 @@
+import importlib.util
+import os
+import sys
+import tempfile
+
+# The checkout is the `reasoning_evals` package (see setup.py's entry points)
+# but its directory may be named anything. Expose it under that name on
+# sys.path, which spawned worker processes inherit, so tests and workers
+# import modules the way the package's relative imports resolve them.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if importlib.util.find_spec("reasoning_evals") is None:
+    link_dir = tempfile.mkdtemp(prefix="reasoning_evals_")
+    os.symlink(ROOT, os.path.join(link_dir, "reasoning_evals"))
+    sys.path.insert(0, link_dir)
+
+# The config refuses to load without provider keys; tests never call a provider
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("DEEPSEEK_API_KEY", "test-key")
\ No newline at end of file
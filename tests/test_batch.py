@@ -0,0 +1,135 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from reasoning_evals.api.batch import BatchExecutor, BatchRequest, BatchStillRunning, LocalBatchEndpoint
+from reasoning_evals.evaluation.pipeline import EvaluationPipeline
+from reasoning_evals.tasks.base import BaseTask, TaskExample, TaskResult
+from reasoning_evals.utils.config import config
+
+MODELS = [{"provider": "openai", "name": "gpt-4", "alias": "o1"}]
+
+class SumTask(BaseTask):
+    """Adds two numbers; example IDs are random, like generated examples."""
+    
+    async def generate_examples(self, num_examples):
+        return [
+            TaskExample(id=uuid.uuid4().hex, input=f"What is {i} + {i}?", expected_output=str(2 * i), metadata={})
+            for i in range(num_examples)
+        ]
+    
+    async def evaluate_response(self, example, model_response, model_name):
+        correct = model_response.strip() == example.expected_output
+        return TaskResult(example.id, model_name, model_response, correct, float(correct), {"accuracy": float(correct)})
+    
+    def get_prompt(self, example):
+        return example.input
+    
+    def validate_example(self, example):
+        return True, None
+
+class Responder:
+    """Answers sum prompts, counting calls; `fail_once` prompts fail on their first call."""
+    
+    def __init__(self, fail_once=()):
+        self.calls = 0
+        self.fail_once = set(fail_once)
+    
+    def __call__(self, body):
+        self.calls += 1
+        prompt = body["messages"][0]["content"]
+        if prompt in self.fail_once:
+            self.fail_once.discard(prompt)
+            raise RuntimeError("server error")
+        a = int(prompt.split()[2])
+        return str(2 * a)
+
+class CountingEndpoint(LocalBatchEndpoint):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submitted = []
+    
+    async def submit(self, lines):
+        self.submitted.append([line["custom_id"] for line in lines])
+        return await super().submit(lines)
+
+class UncancellableEndpoint(CountingEndpoint):
+    async def cancel(self, batch_id):
+        raise ConnectionError("cancel endpoint unavailable")
+
+@pytest.fixture
+def batch_config(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.config["evaluation"], "results_dir", str(tmp_path / "results"))
+    monkeypatch.setitem(config.config["evaluation"], "batch", {
+        "state_dir": str(tmp_path / "state"),
+        "poll_interval": 0.01,
+        "max_resubmits": 1
+    })
+    return tmp_path
+
+def evaluate(endpoint, num_examples=3):
+    async def go():
+        pipeline = EvaluationPipeline(batch_endpoints={"openai": endpoint})
+        try:
+            task = SumTask("sum", {}, clients=pipeline.clients)
+            return await pipeline.evaluate_task(task, models=MODELS, num_examples=num_examples, mode="batch")
+        finally:
+            await pipeline.aclose()
+    return asyncio.run(go())
+
+def test_expired_batch_recovers_partial_results(batch_config):
+    endpoint = CountingEndpoint(Responder(), str(batch_config / "endpoint"), expire_after=2)
+    df = evaluate(endpoint)
+    
+    assert df["is_correct"].all()
+    assert [len(batch) for batch in endpoint.submitted] == [3, 1]
+
+def test_retryable_item_errors_are_resubmitted(batch_config):
+    responder = Responder(fail_once={"What is 1 + 1?"})
+    endpoint = CountingEndpoint(responder, str(batch_config / "endpoint"))
+    df = evaluate(endpoint)
+    
+    assert df["is_correct"].all()
+    assert [len(batch) for batch in endpoint.submitted] == [3, 1]
+
+def test_interrupted_run_resumes_from_state_file(batch_config):
+    responder = Responder()
+    endpoint = CountingEndpoint(responder, str(batch_config / "endpoint"))
+    collect = endpoint.results
+    
+    async def unreachable(batch_id):
+        raise ConnectionError("network down")
+    
+    endpoint.results = unreachable
+    df = evaluate(endpoint)
+    assert not df["is_correct"].any()
+    assert len(os.listdir(batch_config / "state")) == 2  # batch IDs and the examples
+    
+    endpoint.results = collect
+    calls = responder.calls
+    df = evaluate(endpoint)
+    
+    assert df["is_correct"].all()
+    assert responder.calls == calls
+    assert len(endpoint.submitted) == 1
+    assert not (batch_config / "state" / "sum_examples.json").exists()
+
+def test_uncancellable_batch_is_not_resubmitted(tmp_path):
+    endpoint = UncancellableEndpoint(Responder(), str(tmp_path / "endpoint"), processing_delay=60)
+    executor = BatchExecutor(endpoint, str(tmp_path / "state"), poll_interval=0.01, max_wait=0.1)
+    requests = [BatchRequest(custom_id=f"q{i}", model="gpt-4", prompt=f"What is {i} + {i}?", max_tokens=10) for i in range(3)]
+    
+    with pytest.raises(BatchStillRunning):
+        asyncio.run(executor.run(requests, name="sum"))
+    assert len(endpoint.submitted) == 1
+
+def test_uncancellable_batch_keeps_run_resumable(batch_config, monkeypatch):
+    monkeypatch.setitem(config.config["evaluation"]["batch"], "max_wait", 0.1)
+    endpoint = UncancellableEndpoint(Responder(), str(batch_config / "endpoint"), processing_delay=60)
+    df = evaluate(endpoint)
+    
+    assert not df["is_correct"].any()
+    assert len(endpoint.submitted) == 1
+    assert (batch_config / "state" / "sum_examples.json").exists()
\ No newline at end of file
@@ -0,0 +1,42 @@
+import random
+
+from reasoning_evals.tasks.csp import Constraint, CSPSolver, build_unique_puzzle
+
+PEOPLE = ["A", "B", "C"]
+
+def test_solver_finds_every_ordering():
+    assert CSPSolver(PEOPLE, range(3), [], all_different=True).count_solutions() == 6
+
+def test_solver_respects_constraints():
+    constraints = [Constraint("before", ["A", "B"]), Constraint("before", ["B", "C"])]
+    assert CSPSolver(PEOPLE, range(3), constraints, all_different=True).solve() == [{"A": 0, "B": 1, "C": 2}]
+
+def test_truth_teller_statements():
+    # A: "B is a liar"; B: "A and I are the same type"
+    constraints = [
+        Constraint("statement", ["A", "B"], ["is_liar"]),
+        Constraint("statement", ["B", "A", "B"], ["same_type"])
+    ]
+    assert CSPSolver(["A", "B"], [True, False], constraints).solve() == [{"A": True, "B": False}]
+
+def test_constraint_round_trips_through_dict():
+    constraint = Constraint("not_in", ["A"], [[0, 2]])
+    assert Constraint.from_dict(constraint.to_dict()) == constraint
+    assert constraint.is_satisfied({"A": 1})
+    assert not constraint.is_satisfied({})
+
+def test_build_unique_puzzle_has_no_redundant_clues():
+    solution = {"A": 2, "B": 0, "C": 1}
+    candidates = [
+        Constraint("equals", [v], [solution[v]]) for v in PEOPLE
+    ] + [Constraint("before", ["B", "C"]), Constraint("before", ["C", "A"]), Constraint("not_at_end", ["C"], [3])]
+    puzzle = build_unique_puzzle(PEOPLE, range(3), candidates, random.Random(0), all_different=True)
+    
+    assert CSPSolver(PEOPLE, range(3), puzzle, all_different=True).solve() == [solution]
+    for constraint in puzzle:
+        rest = [c for c in puzzle if c is not constraint]
+        assert CSPSolver(PEOPLE, range(3), rest, all_different=True).count_solutions(limit=2) == 2
+
+def test_build_unique_puzzle_gives_up_on_ambiguous_candidates():
+    candidates = [Constraint("not_equals", ["A"], [1])]
+    assert build_unique_puzzle(PEOPLE, range(3), candidates, random.Random(0), all_different=True) is None
\ No newline at end of file
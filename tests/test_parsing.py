@@ -0,0 +1,21 @@
+import pytest
+
+from reasoning_evals.utils.parsing import JSONParseError, extract_json, parse_stats
+
+def test_parses_plain_and_fenced_json():
+    assert extract_json('{"score": 0.5}') == {"score": 0.5}
+    assert extract_json('Here you go:\n```json\n{"score": 1}\n```\nDone.') == {"score": 1}
+
+def test_required_fields_skip_stray_objects():
+    text = 'For example {"note": "format"} is wrong. Answer: {"score": 0.8, "feedback": "ok"}'
+    assert extract_json(text, required={"score": (int, float)}) == {"score": 0.8, "feedback": "ok"}
+
+def test_booleans_are_not_numbers():
+    with pytest.raises(JSONParseError, match="score"):
+        extract_json('{"score": true}', required={"score": (int, float)})
+
+def test_failures_are_counted():
+    with pytest.raises(JSONParseError):
+        extract_json("no json here", name="test_failures")
+    extract_json("[1, 2]", name="test_failures")
+    assert parse_stats.failure_rate("test_failures") == 0.5
\ No newline at end of file
@@ -0,0 +1,59 @@
+from reasoning_evals.tasks.plan_checker import PlanChecker, parse_clock
+
+SCENARIO = {
+    "unit": "clock",
+    "options": [
+        {"id": "talk", "group": "session", "cost": 100, "duration": 60},
+        {"id": "lunch", "cost": 20, "slot": {"day": 1, "start": 720, "end": 780}}
+    ],
+    "constraints": [
+        {"kind": "required", "id": "lunch"},
+        {"kind": "select_one", "group": "session"},
+        {"kind": "budget", "limit": 150},
+        {"kind": "no_overlap"},
+        {"kind": "within", "earliest": 540, "latest": 1020}
+    ]
+}
+
+def plan(talk_start, talk_end, total_cost=120):
+    return {
+        "schedule": [
+            {"id": "talk", "day": 1, "start": talk_start, "end": talk_end},
+            {"id": "lunch", "day": 1, "start": "12:00", "end": "1:00 PM"}
+        ],
+        "total_cost": total_cost
+    }
+
+def test_parse_clock():
+    assert parse_clock("9:30") == 570
+    assert parse_clock("1:25 PM") == 805
+    assert parse_clock("12 am") == 0
+    assert parse_clock("25:00") is None
+    assert parse_clock(930) is None
+
+def test_feasible_plan_passes_every_check():
+    report = PlanChecker(SCENARIO).check(plan("9:00", "10:00"))
+    assert report.feasible
+    assert report.total_cost == 120
+    assert report.satisfaction == 1.0
+
+def test_violations_are_reported_per_check():
+    report = PlanChecker(SCENARIO).check(plan("11:30", "12:30", total_cost="$50"))
+    assert not report.feasible
+    assert [v.split(":")[0] for v in report.violations] == ["no_overlap", "reported_total"]
+    assert 0 < report.satisfaction < 1
+
+def test_entries_must_match_their_options():
+    report = PlanChecker(SCENARIO).check({"schedule": [
+        {"id": "talk", "day": 1, "start": "9:00", "end": "9:30"},
+        {"id": "dinner", "day": 1, "start": "18:00", "end": "19:00"}
+    ]})
+    valid = next(check for check in report.checks if check.name == "valid_entries")
+    assert not valid.passed
+    assert "TALK must last 60 minutes" in valid.detail
+    assert "unknown option DINNER" in valid.detail
+
+def test_missing_schedule_is_infeasible():
+    report = PlanChecker(SCENARIO).check({"plan": "go to the talk"})
+    assert not report.feasible
+    assert report.satisfaction == 0.0
\ No newline at end of file
@@ -0,0 +1,80 @@
+import asyncio
+import os
+
+from reasoning_evals.tasks.sandbox import CodeSandbox
+
+TESTS = [{"call": "f()", "expected": 1}]
+
+def run(code, tests=TESTS):
+    async def go():
+        sandbox = CodeSandbox(processes=1, time_limit=5)
+        try:
+            return await sandbox.run(code, tests)
+        finally:
+            sandbox.close()
+    return asyncio.run(go())
+
+def test_runs_correct_submission():
+    code = "def f():\n    open('scratch.txt', 'w').write('1')\n    return int(open('scratch.txt').read())\n"
+    result = run(code)
+    assert result.all_passed
+    assert result.coverage == 1.0
+
+def test_hostile_submission_cannot_read_secrets_or_write_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-secret-123")
+    target = tmp_path / "pwned.txt"
+    victim = tmp_path / "victim.txt"
+    victim.write_text("keep")
+    code = (
+        "import os, shutil\n"
+        "def f():\n"
+        f"    open({str(target)!r}, 'w').write('x')\n"
+        "    return os.environ['OPENAI_API_KEY']\n"
+        "def env():\n"
+        "    return os.environ.get('OPENAI_API_KEY')\n"
+        "def proc_env():\n"
+        "    return open('/proc/self/environ', 'rb').read().decode(errors='replace')\n"
+        "def remove():\n"
+        f"    os.remove({str(victim)!r})\n"
+        "def rmtree():\n"
+        f"    shutil.rmtree({str(tmp_path)!r})\n"
+        "def chmod():\n"
+        f"    os.chmod({str(victim)!r}, 0o777)\n"
+        "def spawn():\n"
+        f"    os.system('touch {target}')\n"
+    )
+    calls = ["f()", "env()", "proc_env()", "remove()", "rmtree()", "chmod()", "spawn()"]
+    result = run(code, [{"call": call, "expected": None} for call in calls])
+    
+    assert not target.exists()
+    assert victim.read_text() == "keep"
+    assert victim.stat().st_mode & 0o777 != 0o777
+    assert "sk-secret-123" not in repr(result)
+    # Only env() succeeds, and it sees no key
+    assert result.passed == 1
+    assert all("PermissionError" in failure for failure in result.failures)
+
+def test_subprocess_escape_is_blocked(tmp_path):
+    target = tmp_path / "forked.txt"
+    code = (
+        "import os, subprocess\n"
+        "def f():\n"
+        "    subprocess.run(['touch', %r])\n"
+        "    return 1\n"
+    ) % str(target)
+    result = run(code)
+    assert result.passed == 0
+    assert not target.exists()
+
+def test_time_limit_kills_runaway_submission():
+    async def go():
+        sandbox = CodeSandbox(processes=1, time_limit=0.5)
+        try:
+            stuck = await sandbox.run("def f():\n    while True:\n        pass\n", TESTS)
+            after = await sandbox.run("def f():\n    return 1\n", TESTS)
+        finally:
+            sandbox.close()
+        return stuck, after
+    stuck, after = asyncio.run(go())
+    assert stuck.timed_out
+    assert after.all_passed
\ No newline at end of file
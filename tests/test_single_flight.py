@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from reasoning_evals.utils.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    calls = 0
+    
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+    
+    async def go():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)))
+        return results, len(flight)
+    
+    results, pending = asyncio.run(go())
+    assert calls == 1
+    assert results == [("result", False), ("result", True), ("result", True)]
+    assert pending == 0
+
+def test_sequential_calls_are_not_cached():
+    async def go():
+        flight = SingleFlight()
+        first = await flight.do("key", lambda: asyncio.sleep(0, result=1))
+        second = await flight.do("key", lambda: asyncio.sleep(0, result=2))
+        return first, second
+    
+    assert asyncio.run(go()) == ((1, False), (2, False))
+
+def test_errors_reach_every_waiter():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+    
+    async def go():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(2)), return_exceptions=True)
+    
+    assert [type(e) for e in asyncio.run(go())] == [RuntimeError, RuntimeError]
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+    
+    async def go():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("key", slow))
+        second = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+    
+    assert asyncio.run(go()) == ("done", True)
\ No newline at end of file
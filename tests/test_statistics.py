@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from reasoning_evals.evaluation.statistics import bootstrap_means, compute_statistics, mcnemar_test, paired_matrix
+
+def results_frame(correct_by_model):
+    return pd.DataFrame([
+        {"example_id": f"e{i}", "model_name": model, "is_correct": value}
+        for model, values in correct_by_model.items()
+        for i, value in enumerate(values)
+    ])
+
+def test_paired_matrix_keeps_examples_answered_by_every_model():
+    results = results_frame({"a": [True, False, True], "b": [True, True]})
+    models, matrix = paired_matrix(results)
+    assert models == ["a", "b"]
+    assert matrix.tolist() == [[1.0, 1.0], [0.0, 1.0]]
+
+def test_bootstrap_means_is_seeded_and_paired():
+    values = np.array([[1.0, 1.0], [0.0, 0.0], [1.0, 0.0]] * 10)
+    first = bootstrap_means(values, num_resamples=200, seed=7)
+    assert first.shape == (200, 2)
+    assert np.array_equal(first, bootstrap_means(values, num_resamples=200, seed=7))
+    # Rows are resampled jointly, so column a never falls below column b
+    assert (first[:, 0] >= first[:, 1]).all()
+
+def test_bootstrap_means_of_distinct_rows_matches_the_mean():
+    values = np.arange(100, dtype=float)
+    means = bootstrap_means(values, num_resamples=2000, seed=0)
+    assert abs(means.mean() - values.mean()) < 1.0
+
+def test_mcnemar_test():
+    same = np.array([True, False, True])
+    assert mcnemar_test(same, same) == (0, 0, 1.0)
+    
+    only_a, only_b, p_value = mcnemar_test(np.ones(10, bool), np.zeros(10, bool))
+    assert (only_a, only_b) == (10, 0)
+    assert p_value == 2 / 2 ** 10
+    
+    # Large discordant counts use the chi-square approximation
+    correct_a = np.r_[np.ones(30, bool), np.zeros(10, bool)]
+    _, _, p_value = mcnemar_test(correct_a, ~correct_a)
+    assert p_value == pytest.approx(math.erfc(math.sqrt((20 - 1) ** 2 / 40 / 2)))
+
+def test_compute_statistics():
+    results = results_frame({"a": [True] * 40, "b": [True, False] * 20})
+    summary = compute_statistics(results, num_resamples=500, seed=1)
+    
+    assert summary.num_paired_examples == 40
+    assert summary.accuracy.loc["b", "accuracy"] == 0.5
+    assert summary.accuracy.loc["b", "ci_low"] < 0.5 < summary.accuracy.loc["b", "ci_high"]
+    comparison = summary.comparisons.iloc[0]
+    assert (comparison["model_a"], comparison["model_b"]) == ("a", "b")
+    assert comparison["difference"] == 0.5
+    assert comparison["only_a_correct"] == 20
+    assert comparison["p_value"] < 0.001
\ No newline at end of file
@@ -0,0 +1,73 @@
+import sqlite3
+import time
+
+import pytest
+
+from reasoning_evals.evaluation.work_queue import LeaseQueue
+
+def make_queue(tmp_path, **kwargs):
+    return LeaseQueue(str(tmp_path / "queue.sqlite"), **kwargs)
+
+def journal_mode(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_claim_complete_and_drain(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.put("run-0", {"n": 0})
+    assert not queue.put("run-0", {"n": 1})
+    
+    lease = queue.claim("w1")
+    assert lease.payload == {"n": 0}
+    assert queue.claim("w2") is None
+    assert queue.heartbeat(lease)
+    assert queue.complete(lease, "ok")
+    
+    assert queue.is_drained()
+    assert queue.results() == {"run-0": "ok"}
+
+def test_expired_lease_is_reclaimed_and_stale_worker_rejected(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05)
+    queue.put("run-0", {})
+    stale = queue.claim("w1")
+    time.sleep(0.1)
+    
+    fresh = queue.claim("w2")
+    assert fresh.worker_id == "w2"
+    assert fresh.attempts == 2
+    assert not queue.complete(stale, "late")
+    assert queue.complete(fresh, "ok")
+
+def test_failures_retry_until_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    queue.put("run-0", {})
+    queue.fail(queue.claim("w1"), "boom")
+    assert queue.counts()[LeaseQueue.PENDING] == 1
+    queue.fail(queue.claim("w1"), "boom")
+    
+    assert queue.counts()[LeaseQueue.FAILED] == 1
+    assert queue.claim("w1") is None
+    assert queue.is_drained()
+
+def test_run_id_scopes_claims_and_counts(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    LeaseQueue(path).put("aaa-0", {})
+    LeaseQueue(path).put("bbb-0", {})
+    queue = LeaseQueue(path, run_id="bbb")
+    
+    assert queue.counts()[LeaseQueue.PENDING] == 1
+    assert queue.claim("w1").shard_id == "bbb-0"
+    assert queue.claim("w1") is None
+
+def test_journal_mode_defaults_to_rollback_journal(tmp_path):
+    make_queue(tmp_path)
+    assert journal_mode(str(tmp_path / "queue.sqlite")) == "delete"
+
+def test_journal_mode_is_configurable(tmp_path):
+    make_queue(tmp_path, journal_mode="wal")
+    assert journal_mode(str(tmp_path / "queue.sqlite")) == "wal"
+    with pytest.raises(ValueError):
+        make_queue(tmp_path, journal_mode="memory")
\ No newline at end of file
@@ -0,0 +1,62 @@
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+_ANSWER_RE = re.compile(r"(?:final\s+answer|answer)\s*(?:is)?\s*[:=]\s*(.+)", re.IGNORECASE)
+_BOXED_RE = re.compile(r"\\boxed\{((?:[^{}]|\{[^{}]*\})*)\}")
+_NUMBER_RE = re.compile(r"^[-+]?\$?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?%?$")
+_WRAPPERS = "*`$ \t\"'"
+
+def extract_final_answer(response: str) -> str:
+    """
+    Find the final answer in a model response.
+    
+    Looks for the last "Answer:" (or "Final answer:") line, then the last
+    \\boxed{...}, and otherwise falls back to the last non-empty line.
+    
+    Returns:
+        The answer text, or "" for an empty response
+    """
+    if not response:
+        return ""
+    matches = _ANSWER_RE.findall(response)
+    if matches:
+        return matches[-1].strip()
+    boxed = _BOXED_RE.findall(response)
+    if boxed:
+        return boxed[-1].strip()
+    lines = [line.strip() for line in response.strip().splitlines() if line.strip()]
+    return lines[-1] if lines else ""
+
+def _canonical_number(text: str) -> Optional[str]:
+    if not _NUMBER_RE.match(text):
+        return None
+    percent = text.endswith("%")
+    try:
+        value = Decimal(text.replace("$", "").replace(",", "").rstrip("%"))
+    except InvalidOperation:
+        return None
+    # 3.50 -> 3.5, 3.0 -> 3
+    number = format(value.normalize(), "f")
+    if "." in number:
+        number = number.rstrip("0").rstrip(".")
+    return number + ("%" if percent else "")
+
+def normalize_answer(response: str) -> Optional[str]:
+    """
+    Reduce a response's final answer to a canonical form for voting.
+    
+    Answers that differ only in case, whitespace, markdown emphasis,
+    trailing punctuation or number formatting ("1,000.0" vs "1000")
+    normalize to the same string.
+    
+    Returns:
+        The normalized answer, or None if the response has no answer
+    """
+    answer = extract_final_answer(response).strip(_WRAPPERS).rstrip(".").strip(_WRAPPERS)
+    if not answer:
+        return None
+    number = _canonical_number(answer)
+    if number is not None:
+        return number
+    return re.sub(r"\s+", " ", answer).lower()
\ No newline at end of file
@@ -0,0 +1,459 @@
+import glob
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import config
+from .tracing import Span, tracer
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Spans that are provider requests
+CALL_STAGES = ("model_call", "judge_call")
+
+LabelValues = Tuple[str, ...]
+
+# Values of every family by name, as written by another process
+Snapshot = Dict[str, Dict[LabelValues, Any]]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+def _add(kind: str, value: Any, other: Any) -> Any:
+    """Sum two values of a family (histograms add bucket by bucket)."""
+    if kind != "histogram":
+        return value + other
+    return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1], value[2] + other[2]]
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class MetricFamily:
+    """
+    A counter, gauge or histogram with a fixed set of label names.
+    
+    Values are either recorded as they happen (`inc`, `set`, `observe`) or,
+    for families created with a callback, read from the callback at scrape
+    time, which suits values another object already keeps (in-flight
+    calls, queue depths).
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.callback = callback
+        self.values: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Add to a counter (or gauge)."""
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+    
+    def set(self, value: float, *labels: str) -> None:
+        """Set a gauge."""
+        with self._lock:
+            self.values[labels] = value
+    
+    def observe(self, value: float, *labels: str) -> None:
+        """Record a histogram observation."""
+        with self._lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+    
+    def collect(self) -> Dict[LabelValues, Any]:
+        """Current values by label values (a copy)."""
+        if self.callback is not None:
+            return self.callback()
+        with self._lock:
+            return {
+                labels: [list(value[0]), value[1], value[2]] if self.kind == "histogram" else value
+                for labels, value in self.values.items()
+            }
+    
+    def render(self, extra: Sequence[Dict[LabelValues, Any]] = ()) -> List[str]:
+        """
+        The family's lines in the text exposition format.
+        
+        Args:
+            extra: Values recorded by other processes, added to this one's
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        values = self.collect()
+        for other in extra:
+            for labels, value in other.items():
+                values[labels] = _add(self.kind, values[labels], value) if labels in values else value
+        
+        for labels, value in sorted(values.items()):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts + [count - sum(counts)]):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labels + ("le",), labels + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """The metric families exposed by one endpoint."""
+    
+    def __init__(self):
+        self.families: Dict[str, MetricFamily] = {}
+        # Callables returning other processes' snapshots to add in at scrape time
+        self.sources: List[Callable[[], List[Snapshot]]] = []
+    
+    def _add(self, family: MetricFamily) -> MetricFamily:
+        if family.name in self.families:
+            raise ValueError(f"Metric {family.name} is already registered")
+        self.families[family.name] = family
+        return family
+    
+    def counter(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ) -> MetricFamily:
+        return self._add(MetricFamily(name, documentation, "counter", labels, callback=callback))
+    
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ) -> MetricFamily:
+        return self._add(MetricFamily(name, documentation, "gauge", labels, callback=callback))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> MetricFamily:
+        return self._add(MetricFamily(name, documentation, "histogram", labels, buckets=buckets))
+    
+    def snapshot(self) -> Snapshot:
+        """Every family's current values, for another process to add to its own."""
+        return {name: family.collect() for name, family in self.families.items()}
+    
+    def render(self) -> str:
+        """Every family in the text exposition format."""
+        snapshots: List[Snapshot] = []
+        for source in self.sources:
+            try:
+                snapshots.extend(source())
+            except Exception as e:
+                print(f"Warning: Could not collect metrics from other processes: {str(e)}")
+        
+        lines = []
+        for family in self.families.values():
+            try:
+                lines.extend(family.render([
+                    snapshot[family.name] for snapshot in snapshots if family.name in snapshot
+                ]))
+            except Exception as e:
+                # One broken callback must not take the whole endpoint down
+                print(f"Warning: Could not collect metric {family.name}: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+class RunMetrics:
+    """
+    Live metrics for an evaluation or generation run.
+    
+    Request, error, token, cost and latency metrics are fed by the tracer:
+    once serving, every finished span is observed, so the latency of each
+    stage is labelled by provider and model where the span has them. Queue
+    depths and in-flight calls are read from the watched pipeline and
+    client manager when scraped.
+    
+    Sharded workers are separate processes, so each `export`s its values
+    to a file in the run's worker directory and the coordinator, which
+    `watch_workers` that directory, adds them in when scraped.
+    """
+    
+    def __init__(self, prefix: str = "reasoning_evals"):
+        self.registry = MetricsRegistry()
+        self.pricing: Dict[str, Dict[str, float]] = config.get("metrics.pricing", {}) or {}
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._pipelines: List[Any] = []
+        self._queues: List[Any] = []
+        self._worker_dirs: List[str] = []
+        self._observing = False
+        self._export_path: Optional[str] = None
+        self._export_stop = threading.Event()
+        self._export_thread: Optional[threading.Thread] = None
+        
+        registry = self.registry
+        registry.sources.append(self._worker_snapshots)
+        self.requests = registry.counter(
+            f"{prefix}_requests_total", "Provider requests made", ("provider", "model", "stage")
+        )
+        self.errors = registry.counter(
+            f"{prefix}_errors_total", "Failed provider requests by error class",
+            ("provider", "model", "stage", "error")
+        )
+        self.retries = registry.counter(
+            f"{prefix}_retries_total", "Retried requests (HTTP retries, batch resubmissions)",
+            ("provider", "kind")
+        )
+        self.tokens = registry.counter(
+            f"{prefix}_tokens_total", "Tokens sent (in) and generated (out)", ("provider", "model", "direction")
+        )
+        self.cached_tokens = registry.counter(
+            f"{prefix}_cached_prompt_tokens_total", "Prompt tokens served from the provider's prompt cache",
+            ("provider", "model")
+        )
+        self.cost = registry.counter(
+            f"{prefix}_cost_dollars_total", "Estimated spend from metrics.pricing", ("provider", "model")
+        )
+        self.deduplicated = registry.counter(
+            f"{prefix}_deduplicated_requests_total", "Calls answered by an identical call already in flight",
+            ("provider",), callback=lambda: self._client_stat("deduplicated")
+        )
+        self.in_flight = registry.gauge(
+            f"{prefix}_in_flight_requests", "Provider requests currently being made",
+            ("provider",), callback=lambda: self._client_stat("in_flight")
+        )
+        self.queue_depth = registry.gauge(
+            f"{prefix}_queue_depth", "Work waiting for a pipeline slot, a client slot or a shard worker",
+            ("queue",), callback=self._queue_depths
+        )
+        self.stage_latency = registry.histogram(
+            f"{prefix}_stage_latency_seconds", "Latency of each traced stage",
+            ("stage", "provider", "model"),
+            buckets=config.get("metrics.buckets") or DEFAULT_BUCKETS
+        )
+    
+    def watch_pipeline(self, pipeline: Any) -> None:
+        """Report a pipeline's slot queue and its clients' in-flight and queued calls."""
+        self._pipelines.append(pipeline)
+    
+    def watch_shards(self, queue: Any) -> None:
+        """Report a sharded run's pending and leased shards."""
+        self._queues.append(queue)
+    
+    def watch_workers(self, directory: str) -> None:
+        """Add in the values exported by worker processes to `directory`."""
+        self._worker_dirs.append(directory)
+    
+    def _worker_snapshots(self) -> List[Snapshot]:
+        snapshots = []
+        for directory in self._worker_dirs:
+            for path in sorted(glob.glob(os.path.join(directory, "*.metrics.json"))):
+                try:
+                    with open(path, "r") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    # Removed or replaced between listing and reading; picked up on the next scrape
+                    continue
+                snapshots.append({
+                    name: {tuple(labels): value for labels, value in values}
+                    for name, values in data.items()
+                })
+        return snapshots
+    
+    def _managers(self) -> List[Any]:
+        managers = []
+        for pipeline in self._pipelines:
+            if all(pipeline.clients is not manager for manager in managers):
+                managers.append(pipeline.clients)
+        return managers
+    
+    def _client_stat(self, key: str) -> Dict[LabelValues, float]:
+        values: Dict[LabelValues, float] = {}
+        for manager in self._managers():
+            for provider, stats in list(manager.provider_stats.items()):
+                values[(provider,)] = values.get((provider,), 0) + getattr(stats, key)
+        return values
+    
+    def _queue_depths(self) -> Dict[LabelValues, float]:
+        values: Dict[LabelValues, float] = {}
+        if self._pipelines:
+            values[("pipeline",)] = sum(pipeline.waiting for pipeline in self._pipelines)
+        for (provider,), queued in self._client_stat("queued").items():
+            values[(f"client:{provider}",)] = queued
+        for queue in self._queues:
+            counts = queue.counts()
+            values[("shards_pending",)] = values.get(("shards_pending",), 0) + counts.get("pending", 0)
+            values[("shards_leased",)] = values.get(("shards_leased",), 0) + counts.get("leased", 0)
+        return values
+    
+    def cost_of(self, model: str, prompt_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+        """
+        Estimated cost of a request in dollars.
+        
+        Prices are per million tokens, from metrics.pricing.<model> (input,
+        output, and optionally cached_input); unpriced models cost 0.
+        """
+        price = self.pricing.get(model)
+        if not price:
+            return 0.0
+        cached_price = price.get("cached_input", price.get("input", 0.0))
+        return (
+            (prompt_tokens - cached_tokens) * price.get("input", 0.0)
+            + cached_tokens * cached_price
+            + output_tokens * price.get("output", 0.0)
+        ) / 1e6
+    
+    def observe_span(self, span: Span) -> None:
+        """Record a finished span (registered as a tracer listener)."""
+        attributes = span.attributes
+        provider = str(attributes.get("provider", ""))
+        model = str(attributes.get("model", ""))
+        self.stage_latency.observe(span.duration, span.name, provider, model)
+        if span.name not in CALL_STAGES:
+            return
+        
+        self.requests.inc(provider, model, span.name)
+        if "error" in attributes:
+            self.errors.inc(provider, model, span.name, str(attributes["error"]))
+            return
+        prompt_tokens = attributes.get("prompt_tokens", 0)
+        cached_tokens = attributes.get("cached_tokens", 0)
+        output_tokens = max(0, attributes.get("tokens", 0) - prompt_tokens)
+        self.tokens.inc(provider, model, "in", amount=prompt_tokens)
+        self.tokens.inc(provider, model, "out", amount=output_tokens)
+        self.cached_tokens.inc(provider, model, amount=cached_tokens)
+        self.cost.inc(provider, model, amount=self.cost_of(model, prompt_tokens, cached_tokens, output_tokens))
+    
+    def record_retry(self, provider: str, kind: str) -> None:
+        self.retries.inc(provider, kind)
+    
+    def _observe(self) -> None:
+        """Feed finished spans into the metrics (once per process)."""
+        if self._observing:
+            return
+        self._observing = True
+        tracer.add_listener(self.observe_span)
+        if not tracer.enabled:
+            tracer.enable(max_events=0)
+    
+    def _write_snapshot(self) -> None:
+        snapshot = {
+            name: [[list(labels), value] for labels, value in values.items()]
+            for name, values in self.registry.snapshot().items()
+        }
+        tmp_path = f"{self._export_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self._export_path)
+    
+    def export(self, path: str, interval: Optional[float] = None) -> None:
+        """
+        Record metrics without serving them, writing them to `path` periodically.
+        
+        Used by sharded workers; the coordinator serving /metrics reads the
+        file (see `watch_workers`). The last values are written on `close`.
+        
+        Args:
+            path: Snapshot file, named `<worker>.metrics.json`
+            interval: Seconds between writes (default: metrics.export_interval)
+        """
+        interval = interval or config.get("metrics.export_interval", 5.0)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._export_path = path
+        self._export_stop.clear()
+        self._observe()
+        
+        def run() -> None:
+            while not self._export_stop.wait(interval):
+                try:
+                    self._write_snapshot()
+                except Exception as e:
+                    print(f"Warning: Could not write metrics to {path}: {str(e)}")
+        
+        self._export_thread = threading.Thread(target=run, name="metrics-export", daemon=True)
+        self._export_thread.start()
+    
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Start serving /metrics from a background thread.
+        
+        Tracing is switched on (without keeping spans for export unless
+        profiling already asked for them) so stage latencies flow in.
+        
+        Args:
+            port: Port to listen on
+            host: Interface to bind (default: localhost only)
+        
+        Returns:
+            The running server
+        """
+        registry = self.registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+        
+        self._observe()
+        print(f"Serving metrics on http://{host}:{port}/metrics")
+        return self.server
+    
+    def close(self) -> None:
+        """Stop the server, or stop exporting after writing the final values."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self._export_thread is not None:
+            self._export_stop.set()
+            self._export_thread.join()
+            self._export_thread = None
+            self._write_snapshot()
+
+# Process-wide metrics; nothing is served until `serve` is called (main.py --metrics-port)
+metrics = RunMetrics()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import json
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Optional, Tuple, Type, Union
+
+from .tracing import tracer
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup
+    orjson = None
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)```", re.DOTALL)
+_DECODER = json.JSONDecoder()
+
+# Maximum number of candidate start positions tried by the object scan
+MAX_SCAN_STARTS = 50
+
+FieldTypes = Dict[str, Union[Type, Tuple[Type, ...]]]
+
+class JSONParseError(ValueError):
+    """Raised when no acceptable JSON value can be extracted from a response."""
+    pass
+
+class ParseStats:
+    """Counts how each kind of response was parsed, and how often parsing failed."""
+    
+    def __init__(self):
+        self.counts: Dict[str, Counter] = defaultdict(Counter)
+    
+    def record(self, name: str, outcome: str) -> None:
+        self.counts[name][outcome] += 1
+    
+    def failure_rate(self, name: str) -> float:
+        counts = self.counts[name]
+        total = sum(counts.values())
+        return counts["failed"] / total if total else 0.0
+    
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """Outcome counts per response kind."""
+        return {name: dict(counts) for name, counts in self.counts.items()}
+    
+    def reset(self) -> None:
+        self.counts.clear()
+
+parse_stats = ParseStats()
+
+def _loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+def _check_fields(value: Any, required: Optional[FieldTypes]) -> Optional[str]:
+    """Return why `value` doesn't have the required fields, or None if it does."""
+    if not required:
+        return None
+    if not isinstance(value, dict):
+        return f"expected a JSON object, got {type(value).__name__}"
+    for key, expected in required.items():
+        if key not in value:
+            return f"missing field '{key}'"
+        types = expected if isinstance(expected, tuple) else (expected,)
+        # bool is an int subclass, but a boolean is never an acceptable number
+        wrong_bool = isinstance(value[key], bool) and bool not in types
+        if wrong_bool or not isinstance(value[key], types):
+            return f"field '{key}' should be {' or '.join(t.__name__ for t in types)}"
+    return None
+
+def _candidates(text: str):
+    """Yield (method, value) for each JSON value found in the text, most likely first."""
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            yield "direct", _loads(stripped)
+        except ValueError:
+            pass
+    
+    for block in _FENCE_RE.findall(text):
+        try:
+            yield "fenced", _loads(block.strip())
+        except ValueError:
+            pass
+    
+    # Scan for the first position where a complete object or array decodes
+    starts = 0
+    for match in re.finditer(r"[{\[]", text):
+        if starts >= MAX_SCAN_STARTS:
+            break
+        starts += 1
+        try:
+            value, _ = _DECODER.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        yield "scanned", value
+
+def extract_json(
+    text: Optional[str],
+    required: Optional[FieldTypes] = None,
+    name: str = "response"
+) -> Any:
+    """
+    Extract a JSON value from a model response.
+    
+    Tries, in order: the whole response, fenced ```json blocks, and a scan
+    for the first embedded object or array. When `required` is given, the
+    first candidate that is an object with those fields (of those types)
+    wins, so a stray example object in a preamble doesn't shadow the answer.
+    
+    Args:
+        text: Response text
+        required: Optional mapping of required field names to types
+        name: Response kind used for parse statistics
+    
+    Returns:
+        The parsed JSON value
+    
+    Raises:
+        JSONParseError: If no acceptable JSON value is found
+    """
+    with tracer.span("parse", kind=name) as span:
+        reason = "no JSON found"
+        if text:
+            for method, value in _candidates(text):
+                problem = _check_fields(value, required)
+                if problem is None:
+                    parse_stats.record(name, method)
+                    span.set(method=method)
+                    return value
+                reason = problem
+        
+        parse_stats.record(name, "failed")
+        span.set(method="failed")
+        preview = (text or "").strip()[:80]
+        raise JSONParseError(f"Could not parse {name} ({reason}): {preview!r}")
\ No newline at end of file
@@ -0,0 +1,435 @@
+import asyncio
+import asyncio.events
+import gc
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import config
+from .tracing import LatencyHistogram
+
+_STDLIB = sysconfig.get_paths()["stdlib"]
+_PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Innermost Python frames of a thread that is blocked rather than working
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("socketserver.py", "serve_forever"),
+    # Executor worker waiting on its (C-level) work queue
+    ("thread.py", "_worker")
+}
+
+Frame = Tuple[str, str, int]
+
+def _package(filename: str) -> str:
+    """What a source file belongs to: a third-party package, a stdlib module or this project."""
+    parts = filename.replace("\\", "/").split("/")
+    if "site-packages" in parts:
+        return parts[parts.index("site-packages") + 1].split(".")[0]
+    if filename.startswith(_PROJECT):
+        return "reasoning_evals"
+    if filename.startswith(_STDLIB):
+        return parts[len(_STDLIB.replace("\\", "/").rstrip("/").split("/"))].removesuffix(".py")
+    return os.path.basename(filename)
+
+def _format_frame(frame: Frame) -> str:
+    filename, name, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+class SamplingProfiler:
+    """
+    Statistical CPU profiler that samples every thread's Python stack.
+    
+    A background thread reads `sys._current_frames()` every `interval`
+    seconds, so the cost is independent of how much code runs and nothing
+    needs to be instrumented. Threads blocked in a wait (idle pool workers,
+    an idle event loop in select) are counted as idle rather than profiled.
+    Only Python frames are seen: time in C code (the JSON scanner,
+    tiktoken's encoder, pandas internals) is attributed to the Python
+    function that called it.
+    """
+    
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.idle: Counter = Counter()
+        self.samples = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+    
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack: List[Frame] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                    frame = frame.f_back
+                thread_name = names.get(ident, str(ident))
+                if stack and (os.path.basename(stack[0][0]), stack[0][1]) in _IDLE_FRAMES:
+                    self.idle[thread_name] += 1
+                    continue
+                self.stacks[(thread_name, tuple(reversed(stack)))] += 1
+    
+    def folded(self) -> str:
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope."""
+        return "\n".join(
+            ";".join([thread] + [_format_frame(frame) for frame in stack]) + f" {count}"
+            for (thread, stack), count in self.stacks.most_common()
+        )
+    
+    def report(self, top: int = 25) -> List[str]:
+        busy = sum(self.stacks.values())
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        packages: Counter = Counter()
+        threads: Counter = Counter()
+        for (thread, stack), count in self.stacks.items():
+            threads[thread] += count
+            own[stack[-1]] += count
+            packages[_package(stack[-1][0])] += count
+            for frame in set(stack):
+                inclusive[frame] += count
+        
+        lines = [f"{self.samples} samples every {self.interval * 1000:.1f} ms, {busy} busy thread samples"]
+        for thread in sorted(set(threads) | set(self.idle)):
+            total = threads[thread] + self.idle[thread]
+            lines.append(f"  {thread}: {threads[thread] / total:.1%} busy" if total else f"  {thread}: idle")
+        for title, counter in (("Self time by package", packages), ("Self time", own), ("Inclusive time", inclusive)):
+            lines.append(f"\n{title}:")
+            for key, count in counter.most_common(top):
+                label = key if isinstance(key, str) else _format_frame(key)
+                lines.append(f"  {count / busy if busy else 0.0:6.1%}  {label}")
+        return lines
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping task.
+    
+    Lag is the time a ready callback waits because something else is
+    holding the loop (a blocking call, a long synchronous parse), which
+    delays every in-flight request at once.
+    """
+    
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lag = LatencyHistogram()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._task = loop.create_task(self._run(loop))
+    
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    async def _run(self, loop: asyncio.AbstractEventLoop) -> None:
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag.record(max(0.0, loop.time() - start - self.interval))
+    
+    def report(self) -> List[str]:
+        lag = self.lag
+        return [
+            f"{lag.count} checks every {self.interval * 1000:.0f} ms: "
+            f"mean {lag.mean * 1000:.1f} ms, p50 {lag.percentile(0.5) * 1000:.1f} ms, "
+            f"p99 {lag.percentile(0.99) * 1000:.1f} ms, max {lag.max * 1000:.1f} ms"
+        ]
+
+class SlowCallbackDetector:
+    """
+    Records event loop callbacks that run longer than a threshold.
+    
+    Like asyncio's debug mode (`loop.slow_callback_duration`), but without
+    debug mode's other checks and overhead: handle execution is timed
+    while the detector is installed, and each slow callback is attributed
+    to the coroutine of the task it stepped.
+    """
+    
+    def __init__(self, threshold: float = 0.1):
+        self.threshold = threshold
+        self.slow: Dict[str, List[float]] = {}
+        self._original = None
+    
+    def start(self) -> None:
+        if self._original is not None:
+            return
+        original = self._original = asyncio.events.Handle._run
+        detector = self
+        
+        def _run(handle: asyncio.Handle) -> None:
+            start = time.perf_counter()
+            try:
+                original(handle)
+            finally:
+                elapsed = time.perf_counter() - start
+                if elapsed >= detector.threshold:
+                    detector._record(handle, elapsed)
+        
+        asyncio.events.Handle._run = _run
+    
+    def stop(self) -> None:
+        if self._original is not None:
+            asyncio.events.Handle._run = self._original
+            self._original = None
+    
+    def _record(self, handle: asyncio.Handle, elapsed: float) -> None:
+        callback = getattr(handle, "_callback", None)
+        owner = getattr(callback, "__self__", None)
+        if isinstance(owner, asyncio.Task):
+            name = f"task {getattr(owner.get_coro(), '__qualname__', owner.get_name())}"
+        else:
+            name = getattr(callback, "__qualname__", repr(callback))
+        self.slow.setdefault(name, []).append(elapsed)
+    
+    def report(self, top: int = 25) -> List[str]:
+        if not self.slow:
+            return [f"No callbacks over {self.threshold * 1000:.0f} ms"]
+        lines = [f"Callbacks over {self.threshold * 1000:.0f} ms (count, total, max):"]
+        ranked = sorted(self.slow.items(), key=lambda item: sum(item[1]), reverse=True)
+        for name, durations in ranked[:top]:
+            lines.append(f"  {len(durations):5d}  {sum(durations):8.2f} s  {max(durations) * 1000:8.1f} ms  {name}")
+        return lines
+
+class GCMonitor:
+    """Times garbage collector pauses per generation."""
+    
+    def __init__(self):
+        self.pauses = {generation: LatencyHistogram() for generation in range(3)}
+        self._started: Optional[float] = None
+    
+    def start(self) -> None:
+        if self._callback not in gc.callbacks:
+            gc.callbacks.append(self._callback)
+    
+    def stop(self) -> None:
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+    
+    def _callback(self, phase: str, info: Dict[str, Any]) -> None:
+        if phase == "start":
+            self._started = time.perf_counter()
+        elif self._started is not None:
+            self.pauses[info["generation"]].record(time.perf_counter() - self._started)
+            self._started = None
+    
+    def report(self) -> List[str]:
+        return [
+            f"  gen {generation}: {pauses.count} collections, {pauses.total * 1000:.1f} ms total, "
+            f"max {pauses.max * 1000:.1f} ms"
+            for generation, pauses in self.pauses.items()
+        ]
+
+class MemoryTracker:
+    """
+    tracemalloc snapshots taken at stage boundaries.
+    
+    Each checkpoint records current and peak traced memory and the source
+    lines whose allocations grew most since the previous checkpoint.
+    Checkpoints only take the snapshot; filtering and comparing them is
+    pure Python over every live allocation, so it is left to `report`
+    rather than run on the event loop mid-evaluation.
+    """
+    
+    def __init__(self, frames: int = 1, top: int = 10):
+        self.frames = frames
+        self.top = top
+        self.checkpoints: List[Tuple[str, int, int, tracemalloc.Snapshot]] = []
+        self._started_tracing = False
+    
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self.checkpoints = []
+        self.checkpoint("start")
+    
+    def stop(self) -> None:
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+    
+    def checkpoint(self, label: str) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        self.checkpoints.append((label, current, peak, tracemalloc.take_snapshot()))
+    
+    @staticmethod
+    def _filter(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+    
+    def report(self) -> List[str]:
+        lines = []
+        previous: Optional[tracemalloc.Snapshot] = None
+        for label, current, peak, snapshot in self.checkpoints:
+            lines.append(f"[{label}] current {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB")
+            snapshot = self._filter(snapshot)
+            if previous is not None:
+                lines.extend(
+                    f"  {stat.size_diff / 1024:+10.1f} KiB  {stat.traceback}"
+                    for stat in snapshot.compare_to(previous, "lineno")[:self.top]
+                    if stat.size_diff > 0
+                )
+            previous = snapshot
+        return lines or ["No checkpoints recorded"]
+
+class RunProfiler:
+    """
+    CPU and memory profiling for an evaluation or generation run.
+    
+    While running it samples the CPU, watches event loop lag, slow
+    callbacks and GC pauses, and (if enabled) traces allocations. The
+    pipeline and generators call `checkpoint` at stage boundaries, which
+    snapshots memory; checkpoints are free while the profiler is stopped.
+    `stop` writes `cpu.folded` (collapsed stacks for a flame graph) and
+    `report.txt` to the profile directory next to the run's results.
+    Profiles written by other processes (sharded workers) can be added
+    with `add_worker`: their stacks join the flame graph under the
+    worker's name and the report links to theirs.
+    """
+    
+    def __init__(self):
+        self.output_dir: Optional[str] = None
+        self.cpu: Optional[SamplingProfiler] = None
+        self.loop_lag: Optional[LoopLagMonitor] = None
+        self.slow_callbacks: Optional[SlowCallbackDetector] = None
+        self.gc: Optional[GCMonitor] = None
+        self.memory: Optional[MemoryTracker] = None
+        self.workers: List[Tuple[str, str]] = []
+        self._started: Optional[float] = None
+    
+    @property
+    def running(self) -> bool:
+        return self.output_dir is not None
+    
+    def start(self, output_dir: str) -> None:
+        """
+        Start profiling; call from the event loop's thread.
+        
+        Args:
+            output_dir: Results directory; profiles go to its
+                profiling.dir subdirectory
+        """
+        if self.running:
+            return
+        settings = config.get("profiling", {}) or {}
+        self.output_dir = os.path.join(output_dir, settings.get("dir", "profile"))
+        self.workers = []
+        self._started = time.perf_counter()
+        
+        self.cpu = SamplingProfiler(settings.get("cpu_interval", 0.005))
+        self.loop_lag = LoopLagMonitor(settings.get("loop_lag_interval", 0.1))
+        self.slow_callbacks = SlowCallbackDetector(settings.get("slow_callback", 0.1))
+        self.gc = GCMonitor()
+        self.memory = MemoryTracker(settings.get("memory_frames", 1)) if settings.get("memory", True) else None
+        
+        self.cpu.start()
+        self.slow_callbacks.start()
+        self.gc.start()
+        if self.memory is not None:
+            self.memory.start()
+        try:
+            self.loop_lag.start(asyncio.get_running_loop())
+        except RuntimeError:
+            # Not inside an event loop; there is no loop lag to measure
+            self.loop_lag = None
+    
+    def checkpoint(self, label: str) -> None:
+        """Mark a stage boundary (snapshots memory while profiling)."""
+        if self.running and self.memory is not None:
+            self.memory.checkpoint(label)
+    
+    def add_worker(self, name: str, profile_dir: str) -> None:
+        """
+        Include another process's profile in this one's output.
+        
+        Args:
+            name: Worker name, the root frame of its stacks in the flame graph
+            profile_dir: Directory the worker's profiler wrote to
+        """
+        self.workers.append((name, profile_dir))
+    
+    def _worker_profiles(self) -> Tuple[List[str], List[str]]:
+        """The workers' folded stacks (prefixed with their names) and report lines."""
+        stacks, lines = [], []
+        for name, profile_dir in self.workers:
+            report_path = os.path.join(profile_dir, "report.txt")
+            try:
+                with open(os.path.join(profile_dir, "cpu.folded"), "r") as f:
+                    stacks.extend(f"{name};{line}" for line in f.read().splitlines() if line)
+                with open(report_path, "r") as f:
+                    summary = f.readline().strip()
+            except OSError:
+                lines.append(f"  {name}: no profile written (worker crashed or was killed)")
+                continue
+            lines.append(f"  {name}: {summary}, {report_path}")
+        return stacks, lines
+    
+    def stop(self) -> Optional[str]:
+        """
+        Stop profiling and write the profiles.
+        
+        Returns:
+            Path of the report, or None if the profiler wasn't running
+        """
+        if not self.running:
+            return None
+        self.checkpoint("end")
+        for part in (self.cpu, self.loop_lag, self.slow_callbacks, self.gc, self.memory):
+            if part is not None:
+                part.stop()
+        
+        top = config.get("profiling.top", 25)
+        worker_stacks, worker_lines = self._worker_profiles()
+        sections = [
+            ("CPU", self.cpu.report(top)),
+            ("Event loop lag", self.loop_lag.report() if self.loop_lag else ["Not measured"]),
+            ("Slow callbacks", self.slow_callbacks.report(top)),
+            ("GC pauses", self.gc.report()),
+            ("Memory", self.memory.report() if self.memory else ["Not traced (profiling.memory is off)"])
+        ]
+        if self.workers:
+            sections.append(("Workers (stacks included in cpu.folded)", worker_lines))
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, "cpu.folded"), "w") as f:
+            f.write("\n".join(filter(None, [self.cpu.folded()] + worker_stacks)))
+        report_path = os.path.join(self.output_dir, "report.txt")
+        with open(report_path, "w") as f:
+            f.write(f"Profiled {time.perf_counter() - self._started:.1f} s\n")
+            for title, lines in sections:
+                f.write(f"\n## {title}\n\n" + "\n".join(lines) + "\n")
+        
+        self.output_dir = None
+        return report_path
+
+# Process-wide profiler; stopped until started (main.py --profile)
+profiler = RunProfiler()
\ No newline at end of file
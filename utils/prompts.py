@@ -0,0 +1,28 @@
+import textwrap
+from typing import Any
+
+class PromptLayout:
+    """
+    A prompt split into a fixed prefix and a per-request suffix.
+    
+    Providers cache the longest prompt prefix they have recently seen
+    (OpenAI from 1024 tokens, DeepSeek on any repeated prefix), and a
+    cached prefix is billed at a discount and processed faster. Keeping
+    every instruction in the prefix and everything that varies (the
+    problem, the response being judged) in the suffix makes the prefix
+    byte-identical across requests. Both parts are dedented once when the
+    layout is defined, so source indentation never reaches the model.
+    """
+    
+    def __init__(self, prefix: str, suffix: str):
+        """
+        Args:
+            prefix: Instructions shared by every request; used verbatim
+            suffix: Per-request part, a str.format template
+        """
+        self.prefix = textwrap.dedent(prefix).strip() + "\n\n"
+        self.suffix = textwrap.dedent(suffix).strip()
+    
+    def render(self, **fields: Any) -> str:
+        """Fill in the suffix and append it to the prefix."""
+        return self.prefix + self.suffix.format(**fields)
\ No newline at end of file
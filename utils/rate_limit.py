@@ -0,0 +1,42 @@
+import asyncio
+import time
+from typing import Optional
+
+class AsyncRateLimiter:
+    """Token-bucket rate limiter shared by concurrent coroutines."""
+    
+    def __init__(self, requests_per_minute: float, burst: Optional[int] = None):
+        """
+        Initialize the limiter.
+        
+        Args:
+            requests_per_minute: Sustained request rate
+            burst: Maximum number of requests allowed back to back
+                (defaults to one second's worth, at least 1)
+        """
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(self.rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
\ No newline at end of file
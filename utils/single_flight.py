@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one execution.
+    
+    The first caller for a key starts the call; callers arriving while it
+    is still running wait for the same result (or exception) instead of
+    starting their own. Keys are forgotten as soon as the call finishes,
+    so this only merges calls that overlap in time, it is not a cache.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run `fn`, or join an identical call already in flight.
+        
+        Args:
+            key: Identity of the call
+            fn: Coroutine function making the call
+        
+        Returns:
+            The call's result, and whether it was shared with an earlier caller
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda _: self._calls.pop(key, None))
+        # A cancelled waiter must not cancel the call the others are waiting on
+        return await asyncio.shield(call), shared
+    
+    def __len__(self) -> int:
+        return len(self._calls)
\ No newline at end of file
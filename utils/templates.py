@@ -0,0 +1,285 @@
+import json
+import os
+import pickle
+import string
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+CACHE_VERSION = 1
+
+# (literal text, field name or None) pairs produced by string.Formatter.parse
+SkeletonParts = Tuple[Tuple[str, Optional[str]], ...]
+
+# (family, category, raw template, skeleton parts, structure JSON); plain data
+# only, so the cache doesn't depend on how this module was imported
+CacheEntry = Tuple[str, str, Dict[str, Any], SkeletonParts, str]
+
+class PromptSkeleton:
+    """
+    A `{name}`-style text pattern parsed once and rendered by concatenation.
+    
+    Unlike `str.format`, fields without a value are left in place, so
+    template patterns can be partially filled.
+    """
+    
+    def __init__(self, text: str, parts: Optional[SkeletonParts] = None):
+        """
+        Compile a pattern.
+        
+        Args:
+            text: Pattern text
+            parts: Pre-parsed parts, e.g. from the registry cache
+        """
+        self.text = text
+        self.parts = parts if parts is not None else self.parse(text)
+        self.fields = [name for _, name in self.parts if name is not None]
+    
+    @staticmethod
+    def parse(text: str) -> SkeletonParts:
+        """Split a pattern into literal and field parts."""
+        try:
+            parsed = list(string.Formatter().parse(text))
+        except ValueError:
+            # Unbalanced braces: treat the whole pattern as literal text
+            return ((text, None),)
+        
+        parts = []
+        for literal, name, format_spec, conversion in parsed:
+            if literal:
+                parts.append((literal, None))
+            if name is not None:
+                if format_spec or conversion:
+                    # Keep anything beyond a bare field verbatim
+                    suffix = (f"!{conversion}" if conversion else "") + (f":{format_spec}" if format_spec else "")
+                    parts.append((f"{{{name}{suffix}}}", None))
+                else:
+                    parts.append(("", name))
+        return tuple(parts)
+    
+    def render(self, **values: Any) -> str:
+        """
+        Fill in the pattern.
+        
+        Args:
+            **values: Field values
+        
+        Returns:
+            Rendered text
+        """
+        return "".join(
+            literal if name is None else str(values[name]) if name in values else f"{{{name}}}"
+            for literal, name in self.parts
+        )
+
+@dataclass
+class Template:
+    """
+    A problem template from `data/templates`.
+    
+    Attributes:
+        id: Template ID, unique within its family
+        family: Top-level template directory (e.g. "stem")
+        category: Template file name without extension (e.g. "algebra")
+        structure: Pattern, variables and constraints
+        example: Worked example, if any
+        skeleton: Compiled structure pattern
+        structure_json: Structure pre-serialized for prompts
+    """
+    id: str
+    family: str
+    category: str
+    structure: Dict[str, Any]
+    example: Dict[str, Any] = field(default_factory=dict)
+    skeleton: PromptSkeleton = field(default=None, repr=False)
+    structure_json: str = field(default="", repr=False)
+    
+    @property
+    def pattern(self) -> str:
+        return self.structure.get("pattern", "")
+    
+    @property
+    def variables(self) -> Dict[str, Any]:
+        return self.structure.get("variables", {})
+    
+    @property
+    def constraints(self) -> List[str]:
+        return self.structure.get("constraints", [])
+
+class TemplateRegistry:
+    """
+    In-memory store of every template under a templates directory.
+    
+    Templates are loaded once and indexed by family, category and ID.
+    The parsed templates are cached in a binary file keyed by the source
+    files' modification times and sizes, so later loads skip JSON parsing
+    unless a template file changed.
+    """
+    
+    def __init__(self, root: str = "data/templates", cache_path: Optional[str] = None):
+        """
+        Load the registry.
+        
+        Args:
+            root: Templates directory; each subdirectory is a family and each
+                JSON file in it a category
+            cache_path: Binary cache file (default: <root>/.cache/templates.pkl);
+                pass an empty string to disable caching
+        """
+        self.root = root
+        self.cache_path = os.path.join(root, ".cache", "templates.pkl") if cache_path is None else cache_path
+        
+        self._by_category: Dict[Tuple[str, str], List[Template]] = {}
+        self._by_id: Dict[Tuple[str, str], Template] = {}
+        self._load()
+    
+    def _fingerprint(self) -> List[Tuple[str, int, int]]:
+        files = []
+        if not os.path.isdir(self.root):
+            return files
+        for family in sorted(os.listdir(self.root)):
+            family_dir = os.path.join(self.root, family)
+            if family.startswith(".") or not os.path.isdir(family_dir):
+                continue
+            for name in sorted(os.listdir(family_dir)):
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(family_dir, name))
+                    files.append((f"{family}/{name}", stat.st_mtime_ns, stat.st_size))
+        return files
+    
+    def _load(self) -> None:
+        fingerprint = self._fingerprint()
+        entries = self._read_cache(fingerprint)
+        if entries is None:
+            entries = self._parse(fingerprint)
+            self._write_cache(fingerprint, entries)
+        
+        for family, category, raw, parts, structure_json in entries:
+            structure = raw.get("structure", {})
+            template = Template(
+                id=raw["id"],
+                family=family,
+                category=category,
+                structure=structure,
+                example=raw.get("example", {}),
+                skeleton=PromptSkeleton(structure.get("pattern", ""), parts),
+                structure_json=structure_json
+            )
+            self._by_category.setdefault((family, category), []).append(template)
+            self._by_id.setdefault((family, template.id), template)
+    
+    def _parse(self, fingerprint: List[Tuple[str, int, int]]) -> List[CacheEntry]:
+        """Parse and pre-compile every template file."""
+        entries = []
+        for relative_path, _, _ in fingerprint:
+            family, name = relative_path.split("/")
+            try:
+                with open(os.path.join(self.root, family, name), "r") as f:
+                    templates = json.load(f).get("templates", [])
+            except (OSError, ValueError) as e:
+                print(f"Warning: Skipping unreadable template file {relative_path}: {str(e)}")
+                continue
+            for raw in templates:
+                if "id" not in raw:
+                    continue
+                structure = raw.get("structure", {})
+                entries.append((
+                    family,
+                    os.path.splitext(name)[0],
+                    raw,
+                    PromptSkeleton.parse(structure.get("pattern", "")),
+                    json.dumps(structure, indent=2)
+                ))
+        return entries
+    
+    def _read_cache(self, fingerprint: List[Tuple[str, int, int]]) -> Optional[List[CacheEntry]]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "rb") as f:
+                cached = pickle.load(f)
+        except Exception:
+            return None
+        if cached.get("version") != CACHE_VERSION or cached.get("fingerprint") != fingerprint:
+            return None
+        return cached["entries"]
+    
+    def _write_cache(self, fingerprint: List[Tuple[str, int, int]], entries: List[CacheEntry]) -> None:
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(
+                    {"version": CACHE_VERSION, "fingerprint": fingerprint, "entries": entries},
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: Could not write template cache: {str(e)}")
+    
+    @property
+    def families(self) -> List[str]:
+        return sorted({family for family, _ in self._by_category})
+    
+    def categories(self, family: str) -> List[str]:
+        """Categories available in a family."""
+        return sorted(category for f, category in self._by_category if f == family)
+    
+    def templates(self, family: str, category: Optional[str] = None) -> List[Template]:
+        """
+        Templates of a family, optionally restricted to one category.
+        
+        Args:
+            family: Template family
+            category: Optional category
+        
+        Returns:
+            Templates in file order
+        """
+        if category is not None:
+            return list(self._by_category.get((family, category), []))
+        return [
+            template
+            for (f, _), templates in sorted(self._by_category.items())
+            if f == family
+            for template in templates
+        ]
+    
+    def get(self, family: str, template_id: str) -> Template:
+        """
+        Look up a template by ID.
+        
+        Args:
+            family: Template family
+            template_id: Template ID
+        
+        Returns:
+            The template
+        
+        Raises:
+            KeyError: If no such template exists
+        """
+        try:
+            return self._by_id[(family, template_id)]
+        except KeyError:
+            raise KeyError(f"No {family} template with id: {template_id}")
+
+_registries: Dict[Tuple[str, Optional[str]], TemplateRegistry] = {}
+
+def get_registry(root: str = "data/templates", cache_path: Optional[str] = None) -> TemplateRegistry:
+    """
+    Shared registry for a templates directory, loaded on first use.
+    
+    Args:
+        root: Templates directory
+        cache_path: Optional binary cache file
+    
+    Returns:
+        The process-wide registry for `root`
+    """
+    key = (os.path.abspath(root), cache_path)
+    if key not in _registries:
+        _registries[key] = TemplateRegistry(root, cache_path)
+    return _registries[key]
\ No newline at end of file
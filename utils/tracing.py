@@ -0,0 +1,370 @@
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+class LatencyHistogram:
+    """
+    Latency distribution with bounded relative error, like HdrHistogram.
+    
+    Values are recorded in microseconds into log-linear buckets: values
+    below 256us get a bucket each, and every power of two above that is
+    split into 128 buckets, so any percentile is within 1% of the true
+    value while memory stays proportional to the range of values seen.
+    """
+    
+    SUB_BUCKETS = 128
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+    
+    @classmethod
+    def _index(cls, micros: int) -> int:
+        shift = max(0, micros.bit_length() - 8)
+        return shift * cls.SUB_BUCKETS + (micros >> shift)
+    
+    @classmethod
+    def _value(cls, index: int) -> float:
+        """Midpoint of a bucket, in seconds."""
+        shift = max(0, index // cls.SUB_BUCKETS - 1)
+        mantissa = index - shift * cls.SUB_BUCKETS
+        low = mantissa << shift
+        return (low + ((1 << shift) - 1) / 2) / 1e6
+    
+    def record(self, seconds: float) -> None:
+        """Record one latency."""
+        index = self._index(max(0, int(seconds * 1e6)))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+    
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add another histogram's values to this one."""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """The histogram as JSON-serializable data (see `from_dict`)."""
+        return {
+            "counts": [[index, count] for index, count in self.counts.items()],
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = {int(index): int(count) for index, count in data["counts"]}
+        histogram.count = sum(histogram.counts.values())
+        histogram.total = data["total"]
+        histogram.min = data["min"] if data["min"] is not None else float("inf")
+        histogram.max = data["max"]
+        return histogram
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+    
+    def percentile(self, q: float) -> float:
+        """
+        Latency below which a fraction `q` of the recorded values fall.
+        
+        Args:
+            q: Quantile between 0 and 1
+        
+        Returns:
+            The latency in seconds (0.0 if nothing was recorded)
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, q * self.count)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+class Span:
+    """A timed stage of work, with attributes such as task, model and tokens."""
+    
+    __slots__ = ("name", "span_id", "parent", "attributes", "start", "end")
+    
+    def __init__(self, name: str, span_id: int, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = span_id
+        self.parent = parent
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+    
+    def set(self, **attributes: Any) -> None:
+        """Add attributes, e.g. token counts once a response arrives."""
+        self.attributes.update(attributes)
+    
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+    
+    @property
+    def root(self) -> "Span":
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+class _NoopSpan:
+    """Stands in for a span while tracing is disabled."""
+    
+    def set(self, **attributes: Any) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    """
+    Records spans for each stage of work and a latency histogram per stage.
+    
+    Spans nest through a context variable, so concurrent asyncio tasks
+    each get their own tree. Finished spans are kept (up to `max_events`)
+    for export in Chrome's trace event format, which chrome://tracing and
+    Perfetto open directly; the per-stage histograms are kept for every
+    span regardless. While disabled, `span` does no work beyond a flag check.
+    """
+    
+    def __init__(self, enabled: bool = False, max_events: int = 200000):
+        self.enabled = enabled
+        self.max_events = max_events
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.listeners: List[Callable[[Span], None]] = []
+        self._current: contextvars.ContextVar = contextvars.ContextVar("span", default=None)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        # Wall-clock time of the origin, to line up traces from other processes
+        self._origin_time = time.time()
+    
+    def enable(self, max_events: Optional[int] = None) -> None:
+        """Start recording spans."""
+        if max_events is not None:
+            self.max_events = max_events
+        self.enabled = True
+    
+    def add_listener(self, listener: Callable[[Span], None]) -> None:
+        """Call `listener` with every span as it finishes (e.g. to export metrics)."""
+        self.listeners.append(listener)
+    
+    def reset(self) -> None:
+        """Forget recorded spans and histograms."""
+        with self._lock:
+            self.histograms.clear()
+            self.events.clear()
+            self.dropped = 0
+            self._origin = time.perf_counter()
+            self._origin_time = time.time()
+    
+    def current(self) -> Optional[Span]:
+        """The innermost open span in this context."""
+        return self._current.get()
+    
+    def within(self, name: str) -> bool:
+        """Whether this context is inside an open span called `name`."""
+        span = self._current.get()
+        while span is not None:
+            if span.name == name:
+                return True
+            span = span.parent
+        return False
+    
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """
+        Time a stage of work.
+        
+        Args:
+            name: Stage name; spans with the same name share a histogram
+            **attributes: Attributes recorded with the span
+        
+        Yields:
+            The span, whose `set` adds attributes
+        """
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+        
+        span = Span(name, next(self._ids), self._current.get(), attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            self._current.reset(token)
+            self._finish(span)
+    
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = LatencyHistogram()
+            histogram.record(span.end - span.start)
+            
+            if len(self.events) >= self.max_events:
+                self.dropped += 1
+            else:
+                self.events.append(self._event(span))
+        
+        for listener in self.listeners:
+            try:
+                listener(span)
+            except Exception as e:
+                print(f"Warning: Span listener failed: {str(e)}")
+    
+    def _event(self, span: Span) -> Dict[str, Any]:
+        """A span as a Chrome trace "complete" event."""
+        return {
+            "name": span.name,
+            "cat": span.name,
+            "ph": "X",
+            "ts": (span.start - self._origin) * 1e6,
+            "dur": (span.end - span.start) * 1e6,
+            "pid": os.getpid(),
+            # One row per work item: spans of a tree nest, concurrent trees don't overlap
+            "tid": span.root.span_id,
+            "args": {
+                "span_id": span.span_id,
+                "parent_id": span.parent.span_id if span.parent else None,
+                **span.attributes
+            }
+        }
+    
+    def export_chrome(self, path: str) -> None:
+        """
+        Write the recorded spans as a Chrome trace event JSON file.
+        
+        The stage histograms and the trace's start time go in `otherData`,
+        so `merge_chrome` can fold the file into another process's tracer.
+        
+        Args:
+            path: Output file path
+        """
+        with self._lock:
+            events = list(self.events)
+            dropped = self.dropped
+            histograms = {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {
+                        "dropped_spans": dropped,
+                        "origin_time": self._origin_time,
+                        "histograms": histograms
+                    }
+                },
+                f,
+                default=str
+            )
+    
+    def merge_chrome(self, path: str, process_name: Optional[str] = None) -> None:
+        """
+        Add the spans and stage histograms of a trace written by `export_chrome`.
+        
+        Used to combine sharded workers' traces with the coordinator's: span
+        timestamps are shifted onto this tracer's clock, and each process
+        keeps its own row group (by PID) in the viewer.
+        
+        Args:
+            path: Trace file written by another process
+            process_name: Label for that process's spans in the viewer
+        """
+        with open(path, "r") as f:
+            trace = json.load(f)
+        other = trace.get("otherData", {})
+        offset = (other.get("origin_time", self._origin_time) - self._origin_time) * 1e6
+        events = trace.get("traceEvents", [])
+        
+        with self._lock:
+            for name, data in other.get("histograms", {}).items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = LatencyHistogram()
+                histogram.merge(LatencyHistogram.from_dict(data))
+            
+            self.dropped += other.get("dropped_spans", 0)
+            if process_name and events:
+                self.events.append({
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": events[0]["pid"],
+                    "args": {"name": process_name}
+                })
+            for event in events:
+                if len(self.events) >= self.max_events:
+                    self.dropped += 1
+                    continue
+                self.events.append({**event, "ts": event["ts"] + offset})
+    
+    def breakdown(self) -> List[Dict[str, Any]]:
+        """
+        Latency statistics per stage, slowest total first.
+        
+        Returns:
+            One dict per stage with count, total, mean, p50, p90, p99 and max
+            (seconds)
+        """
+        with self._lock:
+            histograms = dict(self.histograms)
+        rows = [
+            {
+                "stage": name,
+                "count": histogram.count,
+                "total": histogram.total,
+                "mean": histogram.mean,
+                "p50": histogram.percentile(0.5),
+                "p90": histogram.percentile(0.9),
+                "p99": histogram.percentile(0.99),
+                "max": histogram.max
+            }
+            for name, histogram in histograms.items()
+        ]
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+    
+    def format_breakdown(self) -> str:
+        """The per-stage breakdown as a text table (milliseconds)."""
+        lines = [
+            f"{'Stage':<14} {'Count':>8} {'Total s':>10} {'Mean ms':>10} "
+            f"{'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'Max ms':>10}"
+        ]
+        for row in self.breakdown():
+            lines.append(
+                f"{row['stage']:<14} {row['count']:>8} {row['total']:>10.2f} "
+                + " ".join(f"{row[key] * 1000:>10.1f}" for key in ("mean", "p50", "p90", "p99", "max"))
+            )
+        return "\n".join(lines)
+
+# Process-wide tracer; disabled until enabled (e.g. by main.py --profile)
+tracer = Tracer()
\ No newline at end of file